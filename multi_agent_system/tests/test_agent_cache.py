@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+from multi_agent_system.utils.agent_cache import AgentCacheMiss, CachedAgent
+
+
+class Disease(BaseModel):
+    disease_name: str
+
+
+@dataclass
+class FakeModel:
+    model_name: str = "deepseek-chat"
+
+
+@dataclass
+class FakeUsage:
+    total_tokens: int = 42
+
+
+@dataclass
+class FakeResult:
+    output: List[Disease]
+
+    def usage(self):
+        return FakeUsage()
+
+
+class FakeAgent:
+    output_type = List[Disease]
+    model = FakeModel()
+    model_settings = {"temperature": 0.2}
+
+    def __init__(self):
+        self.calls = 0
+
+    async def run(self, user_input):
+        self.calls += 1
+        return FakeResult(output=[Disease(disease_name=f"{user_input} syndrome")])
+
+
+@pytest.mark.asyncio
+async def test_read_through_records_then_replays(tmp_path):
+    agent = FakeAgent()
+    cached = CachedAgent(agent, "grounding", "system prompt", tmp_path, mode="read_through")
+
+    first = await cached.run("Bardet-Biedl")
+    second = await cached.run("Bardet-Biedl")
+
+    assert agent.calls == 1
+    assert second.output == first.output == [Disease(disease_name="Bardet-Biedl syndrome")]
+    assert second.usage().total_tokens == 0
+
+
+@pytest.mark.asyncio
+async def test_replay_miss_is_an_error(tmp_path):
+    agent = FakeAgent()
+    recorder = CachedAgent(agent, "grounding", "system prompt", tmp_path, mode="record")
+    await recorder.run("RERE")
+
+    replay = CachedAgent(agent, "grounding", "system prompt", tmp_path, mode="replay")
+    assert (await replay.run("RERE")).output[0].disease_name == "RERE syndrome"
+    with pytest.raises(AgentCacheMiss):
+        await replay.run("GCDH")
+    assert agent.calls == 1
+
+
+def test_key_depends_on_prompt_and_model_settings(tmp_path):
+    agent = FakeAgent()
+    key = CachedAgent(agent, "grounding", "system prompt", tmp_path).cache_key("RERE")
+    assert key != CachedAgent(agent, "grounding", "other prompt", tmp_path).cache_key("RERE")
+
+    warmer = FakeAgent()
+    warmer.model_settings = {"temperature": 0.7}
+    assert key != CachedAgent(warmer, "grounding", "system prompt", tmp_path).cache_key("RERE")
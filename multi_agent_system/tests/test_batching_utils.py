@@ -0,0 +1,37 @@
+from multi_agent_system.utils.batching_utils import pack_batches, serialize_item
+
+
+def char_count(text):
+    return len(text)
+
+
+def test_packs_into_fewest_batches_under_budget():
+    items = ["a" * 60, "b" * 10, "c" * 50, "d" * 40, "e" * 30]
+    batches = pack_batches(items, max_tokens=100, token_counter=char_count)
+
+    # first-fit decreasing: {60, 40}, {50, 30, 10}
+    assert batches == [["a" * 60, "d" * 40], ["b" * 10, "c" * 50, "e" * 30]]
+    assert all(sum(map(len, batch)) <= 100 for batch in batches)
+    assert sorted(item for batch in batches for item in batch) == sorted(items)
+
+
+def test_max_items_and_overhead():
+    items = [f"label {i}" for i in range(12)]
+    batches = pack_batches(items, max_tokens=10_000, per_item_overhead=80, max_items=5, token_counter=char_count)
+    assert [len(batch) for batch in batches] == [5, 5, 2]
+
+    # the overhead counts towards the budget: only two 7-character labels fit in 180 tokens
+    assert max(map(len, pack_batches(items, max_tokens=180, per_item_overhead=80, token_counter=char_count))) == 2
+
+
+def test_oversized_item_gets_its_own_batch():
+    items = [{"disease_name": "x", "phenotypes": ["HP:0000001"] * 50}, {"disease_name": "y", "phenotypes": []}]
+    batches = pack_batches(items, max_tokens=100, token_counter=char_count)
+    assert batches == [[items[0]], [items[1]]]
+    assert pack_batches([], max_tokens=100) == []
+
+
+def test_items_are_measured_as_compact_json():
+    assert serialize_item({"disease_name": "RERE", "phenotypes": ["HP:0001250"]}) == \
+        '{"disease_name":"RERE","phenotypes":["HP:0001250"]}'
+    assert serialize_item("Bardet-Biedl syndrome") == "Bardet-Biedl syndrome"
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import pytest
+
+from multi_agent_system.utils.executors import get_executor, per_thread, run_in_executor, shutdown_executors
+
+
+@pytest.fixture(autouse=True)
+def fresh_executors():
+    shutdown_executors()
+    yield
+    shutdown_executors()
+
+
+@pytest.mark.asyncio
+async def test_blocking_calls_do_not_stall_the_event_loop():
+    release = threading.Event()
+    executor = get_executor("sqlite", 2)
+
+    blocked = asyncio.ensure_future(run_in_executor(executor, release.wait, 5))
+    # the loop keeps running other work while the executor thread is blocked
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    release.set()
+    assert await blocked is True
+
+
+def test_get_executor_is_shared_per_workload():
+    assert get_executor("http", 4) is get_executor("http", 8)
+    assert get_executor("http", 4) is not get_executor("embedding", 1)
+    with pytest.raises(ValueError):
+        get_executor("gpu", 1)
+
+
+@pytest.mark.asyncio
+async def test_per_thread_creates_one_instance_per_thread():
+    created = []
+
+    @per_thread
+    def resource():
+        created.append(threading.get_ident())
+        return object()
+
+    executor = get_executor("sqlite", 2)
+    barrier = threading.Barrier(2)
+
+    def use():
+        first = resource()
+        barrier.wait(timeout=5)
+        assert resource() is first
+        return first
+
+    a, b = await asyncio.gather(run_in_executor(executor, use), run_in_executor(executor, use))
+    assert a is not b
+    assert len(created) == 2
+    assert resource() is resource()
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from multi_agent_system.agents.grounding import grounding_tools
+from multi_agent_system.agents.grounding.grounding_tools import GroundedDiseaseResult
+from multi_agent_system.utils.hpo_annotations import HpoAnnotationIndex, read_mondo_mappings
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+@pytest.mark.asyncio
+async def test_knowledge_is_retrieved_concurrently_once_per_mondo_id(monkeypatch):
+    labels = ["Bardet-Biedl syndrome", "BBS", "Alstrom syndrome", "unknown disease"]
+    mondo_ids = ["MONDO:0015229", "MONDO:0015229", "MONDO:0008763", None]
+    calls, in_flight, max_in_flight = [], 0, 0
+
+    async def ground_diseases(labels):
+        return [GroundedDiseaseResult(disease_name=label, mondo_id=mondo_id)
+                for label, mondo_id in zip(labels, mondo_ids)]
+
+    async def find_disease_knowledge(mondo_id):
+        nonlocal in_flight, max_in_flight
+        calls.append(mondo_id)
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [f"HP:{mondo_id[-7:]}", "MONDO:0000001"]
+
+    monkeypatch.setattr(grounding_tools, "ground_diseases", ground_diseases)
+    monkeypatch.setattr(grounding_tools, "find_disease_knowledge", find_disease_knowledge)
+
+    results = await grounding_tools.ground_and_retrieve_knowledge(labels)
+
+    assert sorted(calls) == ["MONDO:0008763", "MONDO:0015229"]
+    assert max_in_flight == 2
+    assert [r.phenotypes for r in results] == [["HP:0015229"], ["HP:0015229"], ["HP:0008763"], []]
+
+
+def test_catalogue_candidates_are_grounded_through_mondo_mappings(monkeypatch):
+    index = HpoAnnotationIndex.from_hpoa(DATA_DIR / "phenotype.hpoa", read_mondo_mappings(DATA_DIR / "mondo.sssom.tsv"))
+    monkeypatch.setattr(grounding_tools, "get_hpo_annotation_index", lambda: index)
+
+    results = grounding_tools.retrieve_catalogue_candidates(["HP:0001250", "HP:0001263"], top_k=3)
+
+    # ORPHA:25 and OMIM:231670 are both MONDO:0009281, which is returned once
+    assert [r.mondo_id for r in results] == ["MONDO:0014842", "MONDO:0009281"]
+    assert results[1].disease_name == "Glutaryl-CoA dehydrogenase deficiency"
+    assert results[1].phenotypes == ["HP:0000256", "HP:0001250", "HP:0001257", "HP:0002353"]
+
+
+def test_annotation_index_is_loaded_once_by_concurrent_threads(monkeypatch):
+    loads = []
+    index = HpoAnnotationIndex.from_hpoa(DATA_DIR / "phenotype.hpoa")
+
+    def from_hpoa(hpoa_path, mondo_mappings):
+        loads.append(hpoa_path)
+        time.sleep(0.05)
+        return index
+
+    monkeypatch.setattr(grounding_tools.HpoAnnotationIndex, "from_hpoa", from_hpoa)
+    monkeypatch.setattr(grounding_tools, "read_mondo_mappings", lambda path: {})
+    grounding_tools._load_hpo_annotation_index.cache_clear()
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            indexes = list(executor.map(lambda _: grounding_tools.get_hpo_annotation_index(), range(4)))
+    finally:
+        grounding_tools._load_hpo_annotation_index.cache_clear()
+
+    assert len(loads) == 1
+    assert all(index is indexes[0] for index in indexes)
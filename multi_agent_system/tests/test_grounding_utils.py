@@ -0,0 +1,159 @@
+import json
+import sys
+
+import faiss
+import numpy as np
+import pytest
+
+from multi_agent_system.utils import grounding_utils
+
+
+class FakeModel:
+    """Deterministic stand-in for the embedding model: one axis per known label."""
+
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+        self.calls = 0
+
+    def encode(self, prompts):
+        self.calls += 1
+        vectors = np.zeros((len(prompts), len(self.vocabulary)), dtype="float32")
+        for row, prompt in enumerate(prompts):
+            text = prompt.removeprefix("search_query: ")
+            for column, word in enumerate(self.vocabulary):
+                if word in text:
+                    vectors[row, column] = 1.0
+            if not vectors[row].any():
+                vectors[row, -1] = 1.0
+        return vectors
+
+
+@pytest.fixture
+def mondo_index(tmp_path, monkeypatch):
+    vocabulary = ["glutaric", "bardet", "rere", "other"]
+    labels = ["glutaric aciduria type 1", "Bardet-Biedl syndrome", "RERE disorder"]
+    ids = ["MONDO:0009281", "MONDO:0015229", "OMIM:616975"]
+
+    index = faiss.IndexFlatIP(len(vocabulary))
+    index.add(np.eye(len(vocabulary), dtype="float32")[:3])
+    faiss.write_index(index, str(tmp_path / "mondo_faiss.index"))
+    (tmp_path / "mondo_labels.json").write_text(json.dumps(labels))
+    (tmp_path / "mondo_ids.json").write_text(json.dumps(ids))
+
+    monkeypatch.setattr(grounding_utils, "INDEX_PATH", tmp_path / "mondo_faiss.index")
+    monkeypatch.setattr(grounding_utils, "LABELS_PATH", tmp_path / "mondo_labels.json")
+    monkeypatch.setattr(grounding_utils, "IDS_PATH", tmp_path / "mondo_ids.json")
+    monkeypatch.setattr(grounding_utils, "_index_handle", None)
+    (tmp_path / "mondo_label_index.json").write_text(json.dumps({"bardet biedl syndrome": "MONDO:0015229"}))
+    monkeypatch.setattr(grounding_utils, "LABEL_INDEX_PATH", tmp_path / "mondo_label_index.json")
+    monkeypatch.setattr(grounding_utils, "_label_index", None)
+    monkeypatch.setattr(grounding_utils, "INDEX_META_PATH", tmp_path / "mondo_index_meta.json")
+    model = FakeModel(vocabulary)
+    monkeypatch.setattr(grounding_utils, "_model", model)
+    return model
+
+
+def test_import_does_not_load_embedding_model():
+    assert grounding_utils._model is None
+    assert "sentence_transformers" not in sys.modules
+
+
+def test_faiss_index_loaded_once(mondo_index):
+    first = grounding_utils.get_faiss_index()
+    second = grounding_utils.get_faiss_index()
+    assert first is second
+
+
+def test_batch_matches_single_lookups(mondo_index):
+    queries = ["glutaric aciduria", "Bardet-Biedl", "RERE", "unknown disease"]
+    batch = grounding_utils.batch_cosine_similarity(queries)
+    assert mondo_index.calls == 1
+    assert batch == [grounding_utils.cosine_similarity(q) for q in queries]
+    assert batch[0]["id"] == "MONDO:0009281"
+    assert batch[2]["id"] is None  # best hit is not a MONDO ID
+    assert batch[3]["id"] is None  # below threshold
+
+
+def test_batch_of_no_labels(mondo_index):
+    assert grounding_utils.batch_cosine_similarity([]) == []
+    assert mondo_index.calls == 0
+
+
+@pytest.mark.parametrize("label, expected", [
+    ("Bardet-Biedl syndrome (BBS)", "bardet biedl syndrome"),
+    ("Cornelia de Lange syndrome (CdLS)", "cornelia de lange syndrome"),
+    ("  Glutaric   aciduria, TYPE 1 ", "glutaric aciduria type 1"),
+    ("Charcot-Marie-Tooth disease (X-linked)", "charcot marie tooth disease x linked"),
+])
+def test_normalize_label(label, expected):
+    assert grounding_utils.normalize_label(label) == expected
+
+
+def test_lookup_normalized_label(mondo_index):
+    assert grounding_utils.lookup_normalized_label("Bardet-Biedl Syndrome (BBS)") == "MONDO:0015229"
+    assert grounding_utils.lookup_normalized_label("Bardet-Biedl syndrome 2") is None
+
+
+def test_hnsw_index_search_parameters_from_metadata(mondo_index, tmp_path):
+    from multi_agent_system.scripts import mondo_index as builder
+
+    embeddings = np.eye(4, dtype="float32")[:3]
+    index = builder.build_index(embeddings, builder.index_factory_string("hnsw", hnsw_m=8))
+    builder.write_index(index, tmp_path / "mondo_faiss.index")
+    builder.write_json({"factory": "HNSW8,Flat", "search_parameters": {"efSearch": 77}},
+                       tmp_path / "mondo_index_meta.json")
+
+    loaded, _, _ = grounding_utils.get_faiss_index()
+    assert faiss.downcast_index(loaded).hnsw.efSearch == 77
+    _, exact_scores = builder.exact_top1(iter([embeddings]), embeddings)
+    _, hits = loaded.search(embeddings, 1)
+    assert builder.recall_at_1(hits[:, 0], exact_scores, lambda rows: (embeddings * embeddings[rows]).sum(axis=1)) == 1.0
+    assert grounding_utils.cosine_similarity("glutaric aciduria")["id"] == "MONDO:0009281"
+
+
+def test_compressed_index_with_truncated_queries(mondo_index, tmp_path):
+    from multi_agent_system.scripts import mondo_index as builder
+
+    rng = np.random.default_rng(0)
+    full = builder.normalise(rng.normal(size=(300, 8)))
+    truncated = builder.normalise(full, dim=4)
+    exact_rows, exact_scores = builder.exact_top1(iter([full[:150], full[150:]]), full)
+    assert (exact_rows == np.arange(300)).all()
+    for encoding in builder.ENCODINGS:
+        index = builder.build_index(truncated, builder.index_factory_string("flat", encoding, pq_m=2), chunk_size=64)
+        assert index.d == 4 and index.ntotal == 300
+        _, hits = index.search(truncated, 1)
+        assert 0.0 <= builder.recall_at_1(hits[:, 0], exact_scores, lambda rows: (full * full[rows]).sum(axis=1)) <= 1.0
+    assert builder.index_size(builder.build_index(truncated, "SQfp16")) < builder.index_size(
+        builder.build_index(truncated, "Flat"))
+
+    # queries are truncated to the dimension of the loaded index
+    builder.write_index(builder.build_index(np.eye(4, dtype="float32")[:3, :2].copy(), "Flat"),
+                        tmp_path / "mondo_faiss.index")
+    assert grounding_utils.get_embeddings(["glutaric aciduria"]).shape == (1, 2)
+
+
+def test_labels_and_ids_from_string_tables(mondo_index, tmp_path):
+    from multi_agent_system.utils.knowledge_bundle import write_string_table
+
+    write_string_table(["glutaric aciduria type 1", "Bardet-Biedl syndrome", "RERE disorder"],
+                       tmp_path / "mondo_labels.json")
+    write_string_table(["MONDO:0009281", "MONDO:0015229", "OMIM:616975"], tmp_path / "mondo_ids.json")
+    (tmp_path / "mondo_labels.json").unlink()
+    (tmp_path / "mondo_ids.json").unlink()
+
+    result = grounding_utils.cosine_similarity("glutaric aciduria")
+    assert (result["label"], result["id"]) == ("glutaric aciduria type 1", "MONDO:0009281")
+
+
+def test_corrupted_bundle_file_is_rejected_at_load(mondo_index, tmp_path):
+    from multi_agent_system.utils.knowledge_bundle import write_manifest
+
+    files = [tmp_path / "mondo_faiss.index", tmp_path / "mondo_labels.json", tmp_path / "mondo_ids.json"]
+    write_manifest(tmp_path, files, mondo_version="2025-06-03", model=grounding_utils.EMBEDDING_MODEL_NAME)
+    assert grounding_utils.get_faiss_index()[2][0] == "MONDO:0009281"
+
+    # e.g. a partial copy
+    (tmp_path / "mondo_ids.json").write_text(json.dumps(["MONDO:0009281", "MONDO:0015229"]))
+    with pytest.raises(ValueError, match="mondo_ids.json"):
+        grounding_utils.get_faiss_index()
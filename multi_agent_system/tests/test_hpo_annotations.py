@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import pytest
+
+from multi_agent_system.utils.hpo_annotations import HpoAnnotationIndex, read_mondo_mappings
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+@pytest.fixture(scope="module")
+def hpo_index():
+    mappings = read_mondo_mappings(DATA_DIR / "mondo.sssom.tsv")
+    return HpoAnnotationIndex.from_hpoa(DATA_DIR / "phenotype.hpoa", mappings)
+
+
+def test_read_mondo_mappings():
+    mappings = read_mondo_mappings(DATA_DIR / "mondo.sssom.tsv")
+    assert mappings["MONDO:0009281"] == ["OMIM:231670", "ORPHA:25"]
+    assert "MONDO:0000001" not in mappings  # broad matches are ignored
+
+
+def test_phenotypes_by_annotated_id(hpo_index):
+    # the NOT annotation and the inheritance (aspect I) row are excluded
+    assert hpo_index.phenotypes("OMIM:231670") == ["HP:0000256", "HP:0001250", "HP:0001257"]
+    assert hpo_index.disease_name("ORPHA:25") == "Glutaryl-CoA dehydrogenase deficiency"
+
+
+def test_mondo_id_combines_all_exact_matches(hpo_index):
+    assert hpo_index.phenotypes("MONDO:0009281") == ["HP:0000256", "HP:0001250", "HP:0001257", "HP:0002353"]
+    assert hpo_index.phenotypes("MONDO:0014842") == ["HP:0000252", "HP:0001250", "HP:0001263"]
+
+
+def test_unknown_disease_has_no_phenotypes(hpo_index):
+    assert hpo_index.phenotypes("MONDO:9999999") == []
+    assert hpo_index.phenotypes("OMIM:000000") == []
+    assert len(hpo_index) == 3
+
+
+def test_rank_diseases_over_catalogue(hpo_index):
+    # HP:9999999 is not annotated anywhere but still counts towards the union
+    ranked = hpo_index.rank_diseases(["HP:0001250", "HP:0001263", "HP:9999999"], k=2)
+    assert ranked == [("OMIM:616975", 0.5), ("ORPHA:25", 0.25)]
+
+    # ties are broken by catalogue order
+    assert [disease for disease, _ in hpo_index.rank_diseases(["HP:0001250"], k=3)] == [
+        "ORPHA:25", "OMIM:231670", "OMIM:616975"]
+    assert hpo_index.rank_diseases(["HP:9999999"], k=3) == []
+    assert hpo_index.rank_diseases([], k=3) == []
+
+
+def test_annotated_ids_resolve_back_to_mondo(hpo_index):
+    assert hpo_index.mondo_ids("ORPHA:25") == ["MONDO:0009281"]
+    assert hpo_index.mondo_ids("OMIM:616975") == ["MONDO:0014842"]  # the broad match is ignored
+    assert hpo_index.mondo_ids("MONDO:0009281") == ["MONDO:0009281"]
+    assert hpo_index.mondo_ids("OMIM:000000") == []
@@ -0,0 +1,51 @@
+import json
+
+from multi_agent_system.utils.knowledge_bundle import (
+    StringTable,
+    read_manifest,
+    read_strings,
+    string_table_paths,
+    verify_bundle,
+    write_manifest,
+    write_string_table,
+)
+
+
+def test_string_table_round_trip(tmp_path):
+    strings = ["glutaric aciduria type 1", "", "Sjögren syndrome", "MONDO:0009281"]
+    write_string_table(strings, tmp_path / "mondo_labels.json")
+
+    table = read_strings(tmp_path / "mondo_labels.json")
+    assert isinstance(table, StringTable)
+    assert len(table) == 4
+    assert list(table) == strings
+    assert table[-2] == "Sjögren syndrome"
+    assert table[1:3] == strings[1:3]
+
+
+def test_empty_string_table(tmp_path):
+    write_string_table([], tmp_path / "mondo_ids.json")
+    assert list(read_strings(tmp_path / "mondo_ids.json")) == []
+
+
+def test_json_list_is_read_when_there_is_no_table(tmp_path):
+    (tmp_path / "mondo_ids.json").write_text(json.dumps(["MONDO:0009281"]))
+    assert read_strings(tmp_path / "mondo_ids.json") == ["MONDO:0009281"]
+
+
+def test_manifest_checksums(tmp_path):
+    files = write_string_table(["RERE disorder"], tmp_path / "mondo_labels.json")
+    write_manifest(tmp_path, files, mondo_version="2025-06-03", model="nomic-ai/nomic-embed-text-v1")
+
+    manifest = read_manifest(tmp_path)
+    assert manifest["mondo_version"] == "2025-06-03"
+    assert sorted(manifest["files"]) == ["mondo_labels.offsets.npy", "mondo_labels.utf8"]
+    assert verify_bundle(tmp_path) == []
+
+    # same size: only the checksum tells them apart
+    string_table_paths(tmp_path / "mondo_labels.json")[1].write_bytes(b"RERE Disorder")
+    assert verify_bundle(tmp_path) == []
+    assert verify_bundle(tmp_path, checksums=True) == ["mondo_labels.utf8"]
+
+    string_table_paths(tmp_path / "mondo_labels.json")[1].write_bytes(b"RERE disorders")
+    assert verify_bundle(tmp_path) == ["mondo_labels.utf8"]
@@ -0,0 +1,42 @@
+from pheval.utils.utils import get_resource_timestamp
+
+from multi_agent_system.utils.knowledge_cache import DiseaseKnowledgeCache, resolve_mondo_version
+
+
+def test_resolve_mondo_version():
+    assert resolve_mondo_version("2025-06-03") == "2025-06-03"
+    # the mondo_download_date PhEval writes to results.yml
+    assert resolve_mondo_version() == get_resource_timestamp("mondo.sssom.tsv")
+
+
+def test_cache_persists_across_instances(tmp_path):
+    cache = DiseaseKnowledgeCache(tmp_path / "knowledge.sqlite", version="v1")
+    assert cache.get("MONDO:0009281", limit=80) is None
+    cache.put("MONDO:0009281", ["HP:0001250", "HP:0001263"], limit=80)
+    cache.close()
+
+    reopened = DiseaseKnowledgeCache(tmp_path / "knowledge.sqlite", version="v1")
+    assert reopened.get("MONDO:0009281", limit=80) == ["HP:0001250", "HP:0001263"]
+    assert reopened.get("MONDO:0009281", limit=1) == ["HP:0001250"]
+
+
+def test_new_mondo_version_invalidates_entries(tmp_path):
+    cache = DiseaseKnowledgeCache(tmp_path / "knowledge.sqlite", version="v1")
+    cache.put("MONDO:0009281", ["HP:0001250"], limit=80)
+    cache.close()
+
+    assert DiseaseKnowledgeCache(tmp_path / "knowledge.sqlite", version="v2").get("MONDO:0009281", 80) is None
+
+
+def test_truncated_entry_is_not_reused_for_a_larger_limit(tmp_path):
+    cache = DiseaseKnowledgeCache(tmp_path / "knowledge.sqlite")
+    cache.put("MONDO:1", ["HP:1", "HP:2"], limit=2)
+    cache.put("MONDO:2", ["HP:1"], limit=2)
+    assert cache.get("MONDO:1", limit=80) is None
+    assert cache.get("MONDO:2", limit=80) == ["HP:1"]
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = DiseaseKnowledgeCache(tmp_path / "knowledge.sqlite", ttl_seconds=-1)
+    cache.put("MONDO:1", ["HP:1"], limit=80)
+    assert cache.get("MONDO:1", limit=80) is None
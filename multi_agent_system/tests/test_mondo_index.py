@@ -0,0 +1,65 @@
+import numpy as np
+
+from multi_agent_system.scripts.mondo_index import (
+    EmbeddingStore,
+    assemble_embeddings,
+    embed_labels,
+    exact_top1,
+    label_key,
+    recall_at_1,
+)
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, labels):
+        self.encoded.extend(labels)
+        return np.array([[len(label), 1.0, 0.0] for label in labels], dtype="float32")
+
+
+def test_embeddings_are_checkpointed_and_reused(tmp_path):
+    encoder = CountingEncoder()
+    labels = ["glutaric aciduria type 1", "Bardet-Biedl syndrome", "RERE disorder", "Bardet-Biedl syndrome"]
+    keys = embed_labels(labels, EmbeddingStore(tmp_path), encoder, chunk_size=2)
+    assert encoder.encoded == labels[:3]
+    assert len(list(tmp_path.glob("chunk-*.keys.npy"))) == 2
+
+    # a new release: one label changed, one added; only those are embedded
+    release = ["glutaric aciduria type I", "Bardet-Biedl syndrome", "RERE disorder", "GCDH deficiency"]
+    encoder = CountingEncoder()
+    store = EmbeddingStore(tmp_path)
+    new_keys = embed_labels(release, store, encoder, chunk_size=2)
+    assert encoder.encoded == ["glutaric aciduria type I", "GCDH deficiency"]
+    assert new_keys[1:3] == keys[1:3] and new_keys[0] == label_key("glutaric aciduria type I")
+    assert store.vectors(new_keys)[:, 0].tolist() == [len(label) for label in release]
+
+    embeddings = assemble_embeddings(store, new_keys, tmp_path / "embeddings.npy", dim=2)
+    assert embeddings.shape == (4, 2)
+    assert np.allclose(np.linalg.norm(embeddings, axis=1), 1.0)
+
+
+def test_interrupted_chunk_is_ignored(tmp_path):
+    store = EmbeddingStore(tmp_path)
+    store.add_chunk([label_key("RERE disorder")], np.ones((1, 3), dtype="float32"))
+    (tmp_path / "chunk-00001.npy").write_bytes(b"partial")  # keys file never written
+
+    assert len(EmbeddingStore(tmp_path)) == 1
+    assert EmbeddingStore(tmp_path).prune(set()) == 1
+    assert not list(tmp_path.glob("chunk-00000*"))
+
+
+def test_recall_counts_duplicate_labels_as_hits():
+    # rows 0 and 1 are the same label (e.g. a synonym of two MONDO terms), so they have the same vector
+    embeddings = np.array([[1, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype="float32")
+    queries = np.array([[0.9, 0.1, 0], [0, 0.2, 0.9]], dtype="float32")
+    exact_rows, exact_scores = exact_top1(iter([embeddings[:2], embeddings[2:]]), queries)
+    assert exact_rows.tolist() == [0, 3]
+
+    def row_scores(rows):
+        return np.einsum("ij,ij->i", queries, embeddings[rows])
+
+    # an approximate index returning the duplicate row found the same label
+    assert recall_at_1(np.array([1, 3]), exact_scores, row_scores) == 1.0
+    assert recall_at_1(np.array([2, -1]), exact_scores, row_scores) == 0.0
@@ -0,0 +1,96 @@
+import asyncio
+import os
+from dataclasses import dataclass
+
+import pytest
+
+# the agents build their provider at import
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+
+from multi_agent_system import pipeline
+from multi_agent_system.agents.grounding.grounding_tools import GroundedDiseaseResult
+from multi_agent_system.pipeline_config import PipelineConfig
+
+
+@dataclass
+class FakeUsage:
+    total_tokens: int = 0
+
+
+@dataclass
+class FakeResult:
+    output: list
+
+    def usage(self):
+        return FakeUsage()
+
+
+class FakeGroundingAgent:
+    """Echoes each batch back; earlier batches take longer, so they finish last."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def run(self, batch):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01 / (int(batch[0].split()[-1]) + 1))
+        self.in_flight -= 1
+        return FakeResult(output=list(batch))
+
+
+@pytest.fixture
+def labels():
+    return [f"disease {i}" for i in range(23)]
+
+
+@pytest.mark.asyncio
+async def test_max_concurrent_batches_is_respected(labels):
+    agent = FakeGroundingAgent()
+    agents = pipeline.PipelineAgents(breakdown=None, grounding=agent, similarity=None)
+    config = PipelineConfig(max_concurrent_batches=2)
+
+    await pipeline.run_grounding_agent("PMID_1", labels, config, agents)
+    assert agent.max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_output_order_is_preserved(labels):
+    agents = pipeline.PipelineAgents(breakdown=None, grounding=FakeGroundingAgent(), similarity=None)
+    config = PipelineConfig(max_concurrent_batches=8)
+
+    assert await pipeline.run_grounding_agent("PMID_1", labels, config, agents) == labels
+
+
+@pytest.mark.asyncio
+async def test_failing_case_does_not_cancel_the_others(tmp_path, monkeypatch):
+    completed = []
+
+    async def process_phenopacket(phenopacket_path, output_dir, config, agents):
+        if phenopacket_path.stem == "PMID_1":
+            raise RuntimeError("breakdown agent failed")
+        await asyncio.sleep(0.01)
+        completed.append(phenopacket_path.stem)
+        return tmp_path / f"{phenopacket_path.stem}-agents.parquet"
+
+    monkeypatch.setattr(pipeline, "process_phenopacket", process_phenopacket)
+    paths = [tmp_path / f"PMID_{i}.json" for i in range(5)]
+
+    failures = await pipeline.run_pipeline(paths, tmp_path, PipelineConfig(max_concurrent_cases=2))
+
+    assert list(failures) == ["PMID_1"]
+    assert isinstance(failures["PMID_1"], RuntimeError)
+    assert sorted(completed) == ["PMID_0", "PMID_2", "PMID_3", "PMID_4"]
+
+
+def test_grounded_results_are_merged_by_mondo_id():
+    llm = [GroundedDiseaseResult(disease_name="GA1", mondo_id="MONDO:0009281", phenotypes=["HP:0001250"]),
+           GroundedDiseaseResult(disease_name="unknown disease")]
+    catalogue = [GroundedDiseaseResult(disease_name="Glutaryl-CoA dehydrogenase deficiency", mondo_id="MONDO:0009281"),
+                 GroundedDiseaseResult(disease_name="NEDBEH", mondo_id="MONDO:0014842")]
+
+    merged = pipeline.merge_grounded_results(llm, catalogue)
+
+    assert [(r.disease_name, r.mondo_id) for r in merged] == [
+        ("GA1", "MONDO:0009281"), ("unknown disease", None), ("NEDBEH", "MONDO:0014842")]
@@ -0,0 +1,87 @@
+import json
+
+import polars as pl
+import pytest
+from pheval.post_processing import post_processing
+
+from multi_agent_system.post_process.post_process import post_process_format
+from multi_agent_system.utils.result_tables import agent_result_path, write_agent_result, write_cohort_table
+
+RESULTS = [
+    {"disease_name": "Bardet-Biedl syndrome", "mondo_id": "MONDO:0015229", "score": 0.5},
+    {"disease_name": "unknown syndrome", "mondo_id": None, "score": 0.4},
+    {"disease_name": "Alstrom syndrome", "mondo_id": "MONDO:0008763", "score": 0.1},
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_empty_results(monkeypatch):
+    # PhEval only writes the empty (false negative) results once per process
+    monkeypatch.setattr(post_processing, "executed_results", set())
+
+
+def write_phenopacket(directory, phenopacket_id, disease_id):
+    directory.mkdir(parents=True, exist_ok=True)
+    phenopacket = {
+        "id": phenopacket_id,
+        "subject": {"id": "patient", "sex": "FEMALE"},
+        "phenotypicFeatures": [{"type": {"id": "HP:0000510", "label": "Rod-cone dystrophy"}}],
+        "diseases": [{"term": {"id": disease_id, "label": "disease"}}],
+        "metaData": {"created": "2024-01-01T00:00:00Z", "createdBy": "test", "phenopacketSchemaVersion": "2.0"},
+    }
+    (directory / f"{phenopacket_id}.json").write_text(json.dumps(phenopacket))
+
+
+def make_corpus(tmp_path, cases):
+    phenopacket_dir = tmp_path / "phenopackets"
+    raw_results_dir = tmp_path / "raw_results"
+    for i in range(cases):
+        write_phenopacket(phenopacket_dir, f"PMID_{i}", "MONDO:0008763" if i % 2 else "MONDO:0015229")
+        write_agent_result(RESULTS[i % 2:], agent_result_path(raw_results_dir, f"PMID_{i}"))
+    return phenopacket_dir, raw_results_dir
+
+
+def test_post_process_ranks_parquet_results(tmp_path):
+    phenopacket_dir = tmp_path / "phenopackets"
+    raw_results_dir = tmp_path / "raw_results"
+    output_dir = tmp_path / "output"
+    write_phenopacket(phenopacket_dir, "PMID_1", "MONDO:0008763")
+    write_agent_result(RESULTS, agent_result_path(raw_results_dir, "PMID_1"))
+    write_cohort_table(list(raw_results_dir.glob("*-agents.parquet")), raw_results_dir / "cohort_results.parquet")
+
+    post_process_format(raw_results_dir=raw_results_dir, output_dir=output_dir, phenopacket_dir=phenopacket_dir,
+                        workers=1)
+
+    result = pl.read_parquet(output_dir / "pheval_disease_results" / "PMID_1-disease_result.parquet")
+    assert result["disease_identifier"].to_list() == ["MONDO:0015229", "MONDO:0008763"]
+    assert result["rank"].to_list() == [1, 2]
+    assert result["true_positive"].to_list() == [False, True]
+
+
+def test_parallel_output_is_identical_to_serial(tmp_path):
+    phenopacket_dir, raw_results_dir = make_corpus(tmp_path, 6)
+
+    assert post_process_format(raw_results_dir, tmp_path / "serial", phenopacket_dir, workers=1) == {}
+    post_processing.executed_results.clear()
+    assert post_process_format(raw_results_dir, tmp_path / "parallel", phenopacket_dir, workers=3) == {}
+
+    serial = sorted((tmp_path / "serial" / "pheval_disease_results").iterdir())
+    parallel = sorted((tmp_path / "parallel" / "pheval_disease_results").iterdir())
+    assert [p.name for p in serial] == [p.name for p in parallel]
+    assert len(serial) == 6
+    for a, b in zip(serial, parallel):
+        assert a.read_bytes() == b.read_bytes()
+
+
+def test_failures_are_reported_per_file(tmp_path):
+    phenopacket_dir, raw_results_dir = make_corpus(tmp_path, 3)
+    (raw_results_dir / "PMID_1-agents.parquet").write_text("not parquet")
+    write_agent_result(RESULTS, agent_result_path(raw_results_dir, "PMID_missing"))
+
+    failures = post_process_format(raw_results_dir, tmp_path / "output", phenopacket_dir, workers=2)
+
+    assert sorted(failures) == ["PMID_1-agents.parquet", "PMID_missing-agents.parquet"]
+    output = tmp_path / "output" / "pheval_disease_results"
+    assert pl.read_parquet(output / "PMID_2-disease_result.parquet")["rank"].to_list() == [1, 2]
+    # the failed case keeps PhEval's empty result, so it still counts as a false negative
+    assert pl.read_parquet(output / "PMID_1-disease_result.parquet")["rank"].to_list() == [0]
@@ -0,0 +1,55 @@
+import importlib
+import os
+
+import pytest
+
+# the agents build their provider at import
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+
+from multi_agent_system.agents import provider
+from multi_agent_system.agents.breakdown import breakdown_agent
+from multi_agent_system.agents.grounding import grounding_agent
+from multi_agent_system.agents.similarity_scoring import similarity_agent
+
+AGENTS = [
+    (breakdown_agent, "breakdown_agent", "MODEL_NAME", "TEMPERATURE"),
+    (grounding_agent, "grounding_agent", "GROUNDING_MODEL_NAME", "GROUNDING_TEMPERATURE"),
+    (similarity_agent, "similarity_agent", "SIMILARITY_MODEL_NAME", "SIMILARITY_TEMPERATURE"),
+]
+
+
+def test_agents_share_one_http_client():
+    client = provider.get_http_client()
+    for module, agent_name, _, _ in AGENTS:
+        model = getattr(module, agent_name).model
+        assert model.client._client is client, agent_name
+
+
+def test_http_client_applies_pool_settings(monkeypatch):
+    monkeypatch.setenv("LLM_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "3")
+    monkeypatch.setenv("LLM_KEEPALIVE_EXPIRY", "12.5")
+    monkeypatch.setenv("LLM_TIMEOUT", "30")
+    monkeypatch.setenv("LLM_CONNECT_TIMEOUT", "2")
+
+    # a fresh client, so the one the agents hold stays cached
+    client = provider.get_http_client.__wrapped__()
+
+    pool = client._transport._pool
+    assert (pool._max_connections, pool._max_keepalive_connections, pool._keepalive_expiry) == (7, 3, 12.5)
+    assert (client.timeout.read, client.timeout.connect) == (30.0, 2.0)
+
+
+@pytest.mark.parametrize("module, agent_name, model_env, temperature_env", AGENTS)
+def test_agent_config_reaches_model(monkeypatch, module, agent_name, model_env, temperature_env):
+    monkeypatch.setenv(model_env, "deepseek-reasoner")
+    monkeypatch.setenv(temperature_env, "0.7")
+    try:
+        agent = getattr(importlib.reload(module), agent_name)
+
+        assert agent.model.model_name == "deepseek-reasoner"
+        assert agent.model_settings == {"temperature": 0.7}
+        assert agent.model.client._client is provider.get_http_client()
+    finally:
+        monkeypatch.undo()
+        importlib.reload(module)
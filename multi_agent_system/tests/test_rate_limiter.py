@@ -0,0 +1,126 @@
+import asyncio
+from dataclasses import dataclass, field
+
+import pytest
+
+from multi_agent_system.utils.rate_limiter import RateLimitedAgent, RateLimiter, retry_after_seconds
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+@dataclass
+class FakeResponse:
+    headers: dict = field(default_factory=dict)
+
+
+class ProviderError(Exception):
+    def __init__(self, headers):
+        super().__init__("rate limited")
+        self.response = FakeResponse(headers)
+
+
+class ModelHTTPError(Exception):
+    status_code = 429
+
+
+def rate_limit_error(headers):
+    try:
+        raise ModelHTTPError() from ProviderError(headers)
+    except ModelHTTPError as e:
+        return e
+
+
+@pytest.mark.asyncio
+async def test_requests_per_minute_budget():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=2, clock=clock, sleep=clock.sleep)
+
+    for _ in range(3):
+        await limiter.acquire()
+    # the bucket starts full with 2 requests and refills one every 30 seconds
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+
+@pytest.mark.asyncio
+async def test_tokens_charged_from_usage():
+    clock = FakeClock()
+    limiter = RateLimiter(tokens_per_minute=600, clock=clock, sleep=clock.sleep)
+
+    await limiter.acquire(estimated_tokens=100)
+    limiter.record(estimated_tokens=100, total_tokens=600)  # the call cost far more than estimated
+    await limiter.acquire(estimated_tokens=100)
+    assert clock.sleeps == [pytest.approx(10.0)]  # 100 tokens at 10 tokens per second
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_response_is_retried_after_server_hint():
+    clock = FakeClock()
+    limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+    responses = [rate_limit_error({"retry-after": "7"}), "diagnosis"]
+
+    async def call():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert await limiter.run(call) == "diagnosis"
+    assert clock.sleeps == [7.0]
+    assert limiter.rate_limited == 1
+
+
+@pytest.mark.asyncio
+async def test_other_errors_and_exhausted_retries_are_raised():
+    limiter = RateLimiter(max_retries=1, base_delay=0.0)
+
+    async def failing():
+        raise ValueError("bad output")
+
+    with pytest.raises(ValueError):
+        await limiter.run(failing)
+
+    async def limited():
+        raise rate_limit_error({})
+
+    with pytest.raises(ModelHTTPError):
+        await limiter.run(limited)
+    assert limiter.rate_limited == 1
+
+
+def test_retry_after_ms_takes_precedence():
+    assert retry_after_seconds(rate_limit_error({"retry-after-ms": "1500", "retry-after": "2"})) == 1.5
+    assert retry_after_seconds(ValueError()) is None
+
+
+@pytest.mark.asyncio
+async def test_queue_depth_and_agent_attributes():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=1, clock=clock, sleep=clock.sleep)
+
+    class Agent:
+        output_type = str
+
+        async def run(self, user_input):
+            return user_input
+
+    agent = RateLimitedAgent(Agent(), limiter, "system prompt")
+    assert agent.output_type is str
+
+    await limiter.acquire()
+    waiting = [asyncio.ensure_future(limiter.acquire()) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert limiter.queue_depth == 2
+    await asyncio.gather(*waiting)
+    assert limiter.queue_depth == 0
@@ -0,0 +1,66 @@
+import polars as pl
+
+from multi_agent_system.post_process.post_process import read_agent_result, tsv_to_polars
+from multi_agent_system.utils.result_tables import (
+    AGENT_RESULT_SCHEMA,
+    agent_result_path,
+    write_agent_result,
+    write_cohort_table,
+)
+
+RESULTS = [
+    {"disease_name": "Bardet-Biedl syndrome", "mondo_id": "MONDO:0015229", "score": 0.5},
+    {"disease_name": "unknown syndrome", "mondo_id": None, "score": 0.4},
+    {"disease_name": "Alstrom syndrome", "mondo_id": "MONDO:0008763", "score": 0.1},
+]
+
+
+def test_agent_result_is_written_in_the_pheval_schema(tmp_path):
+    path = agent_result_path(tmp_path, "PMID_1")
+    write_agent_result(RESULTS, path)
+
+    assert path.name == "PMID_1-agents.parquet"
+    table = pl.read_parquet(path)
+    assert table.schema == AGENT_RESULT_SCHEMA
+    assert table["rank"].to_list() == [1, 2, 3]
+    assert table["score"].to_list() == [1.0, 0.5, 0.3333]
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+
+def test_read_agent_result_selects_identified_diseases(tmp_path):
+    path = agent_result_path(tmp_path, "PMID_1")
+    write_agent_result(RESULTS, path)
+
+    result = read_agent_result(path)
+    assert result.schema == pl.Schema({"score": pl.Float64, "disease_identifier": pl.Utf8})
+    assert result["disease_identifier"].to_list() == ["MONDO:0015229", "MONDO:0008763"]
+
+
+def test_tsv_to_polars_reads_legacy_results(tmp_path):
+    path = tmp_path / "PMID_1-agents.tsv"
+    path.write_text("rank\tscore\tcandidate disease\tdisease_identifier\n"
+                    "1\t1.0\tBardet-Biedl syndrome\tMONDO:0015229\n"
+                    "2\t0.5\tAlstrom syndrome\tMONDO:0008763\n")
+
+    result = tsv_to_polars(path)
+    assert result["score"].to_list() == [1.0, 0.5]
+    assert result["disease_identifier"].to_list() == ["MONDO:0015229", "MONDO:0008763"]
+
+
+def test_unreadable_result_is_empty(tmp_path):
+    path = tmp_path / "PMID_1-agents.parquet"
+    path.write_text("not parquet")
+    assert read_agent_result(path).is_empty()
+
+
+def test_cohort_table_combines_cases(tmp_path):
+    write_agent_result(RESULTS, agent_result_path(tmp_path, "PMID_2"))
+    write_agent_result(RESULTS[:1], agent_result_path(tmp_path, "PMID_1"))
+
+    cohort_path = tmp_path / "cohort_results.parquet"
+    cases = write_cohort_table(sorted(tmp_path.glob("*-agents.parquet")), cohort_path)
+
+    cohort = pl.read_parquet(cohort_path)
+    assert cases == 2
+    assert cohort.columns == ["phenopacket_id", *AGENT_RESULT_SCHEMA.names()]
+    assert cohort["phenopacket_id"].to_list() == ["PMID_1", "PMID_2", "PMID_2", "PMID_2"]
@@ -0,0 +1,45 @@
+from multi_agent_system.utils.file_utils import atomic_write_text
+from multi_agent_system.utils.run_journal import RunJournal
+
+
+def test_completed_case_is_skipped_only_while_output_is_unchanged(tmp_path):
+    output = tmp_path / "case-agents.tsv"
+    atomic_write_text(output, "rank\tscore\n1\t1.0\n")
+
+    journal = RunJournal(tmp_path / "run_journal.jsonl")
+    journal.mark_started("case")
+    assert not journal.is_completed("case")
+    journal.mark_completed("case", output)
+
+    reloaded = RunJournal(tmp_path / "run_journal.jsonl")
+    assert reloaded.is_completed("case")
+
+    output.write_text("rank\tscore\n")
+    assert not reloaded.is_completed("case")
+
+
+def test_started_or_failed_cases_are_reprocessed(tmp_path):
+    journal = RunJournal(tmp_path / "run_journal.jsonl")
+    journal.mark_started("interrupted")
+    journal.mark_started("broken")
+    journal.mark_failed("broken", RuntimeError("boom"))
+
+    reloaded = RunJournal(tmp_path / "run_journal.jsonl")
+    assert reloaded.status("interrupted") == "started"
+    assert reloaded.status("broken") == "failed"
+    assert not reloaded.is_completed("interrupted")
+    assert not reloaded.is_completed("never-seen")
+
+
+def test_truncated_journal_line_is_ignored(tmp_path):
+    path = tmp_path / "run_journal.jsonl"
+    journal = RunJournal(path)
+    journal.mark_started("case")
+    with open(path, "a") as f:
+        f.write('{"case": "other", "sta')
+    assert RunJournal(path).status("case") == "started"
+
+
+def test_atomic_write_leaves_no_temporary_files(tmp_path):
+    atomic_write_text(tmp_path / "out" / "case-agents.tsv", "a\tb\n")
+    assert [p.name for p in (tmp_path / "out").iterdir()] == ["case-agents.tsv"]
@@ -0,0 +1,26 @@
+import os
+from pathlib import Path
+
+# the agents build their provider at import
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+
+from multi_agent_system.runner import AgentPhEvalRunner
+
+REPO_DIR = Path(__file__).parents[2]
+
+
+def runner(tmp_path, config_file=None):
+    return AgentPhEvalRunner(input_dir=REPO_DIR, testdata_dir=tmp_path, tmp_dir=tmp_path, output_dir=tmp_path,
+                             config_file=config_file, version="0.0.0")
+
+
+def test_settings_are_read_from_config_yaml(tmp_path):
+    config = runner(tmp_path)._pipeline_config()
+    assert config.candidate_source == "llm"
+    assert config.knowledge_backend is None
+
+
+def test_config_file_overrides_config_yaml(tmp_path):
+    config = runner(tmp_path, REPO_DIR / "config.catalogue.yaml")._pipeline_config()
+    assert config.candidate_source == "catalogue"
+    assert config.knowledge_backend == "hpoa"
@@ -0,0 +1,71 @@
+import math
+
+import pytest
+
+from multi_agent_system.utils.semantic_similarity import HpoSemanticSimilarity, build_ancestor_closure
+
+ROOT, ABNORMALITY = "HP:0000001", "HP:0000118"
+SEIZURE, FOCAL_SEIZURE, MICROCEPHALY = "HP:0001250", "HP:0007359", "HP:0000252"
+PARENTS = {
+    ABNORMALITY: [ROOT],
+    SEIZURE: [ABNORMALITY],
+    FOCAL_SEIZURE: [SEIZURE],
+    MICROCEPHALY: [ABNORMALITY],
+}
+ANNOTATIONS = [[SEIZURE], [FOCAL_SEIZURE], [MICROCEPHALY], [SEIZURE, MICROCEPHALY]]
+
+
+@pytest.fixture(scope="module")
+def similarity():
+    return HpoSemanticSimilarity.build(PARENTS, ANNOTATIONS)
+
+
+def reference_bma(similarity, patient, disease, measure):
+    """ Per-pair graph walk over the closure, for comparison with the vectorised scores """
+    closure = build_ancestor_closure(PARENTS)
+    ic = dict(zip(similarity.terms, similarity.information_content))
+
+    def term_similarity(a, b):
+        mica = max(ic[t] for t in closure[a] & closure[b])
+        if measure == "lin":
+            return 2 * mica / (ic[a] + ic[b]) if ic[a] + ic[b] else 0.0
+        return mica
+
+    patient_best = sum(max(term_similarity(p, d) for d in disease) for p in patient) / len(patient)
+    disease_best = sum(max(term_similarity(p, d) for p in patient) for d in disease) / len(disease)
+    return (patient_best + disease_best) / 2
+
+
+def test_information_content_from_annotations(similarity):
+    ic = dict(zip(similarity.terms, similarity.information_content))
+    assert ic[ROOT] == ic[ABNORMALITY] == 0.0
+    assert ic[SEIZURE] == pytest.approx(-math.log(3 / 4))
+    assert ic[FOCAL_SEIZURE] == pytest.approx(-math.log(1 / 4))
+
+
+@pytest.mark.parametrize("measure", ["resnik", "lin"])
+def test_matches_per_pair_reference(similarity, measure):
+    patient = [FOCAL_SEIZURE, MICROCEPHALY]
+    scores = similarity.best_match_average(patient, ANNOTATIONS, measure)
+    assert scores == pytest.approx([reference_bma(similarity, patient, d, measure) for d in ANNOTATIONS])
+
+
+def test_related_terms_score_without_exact_overlap(similarity):
+    seizure_only, microcephaly_only = similarity.best_match_average([FOCAL_SEIZURE], [[SEIZURE], [MICROCEPHALY]])
+    assert seizure_only > microcephaly_only == 0.0
+
+
+def test_unknown_and_empty_sets(similarity):
+    assert similarity.best_match_average(["HP:9999999"], [[SEIZURE]]) == [0.0]
+    assert similarity.best_match_average([SEIZURE], [[], ["HP:9999999"], [SEIZURE]])[:2] == [0.0, 0.0]
+    assert similarity.best_match_average([SEIZURE], []) == []
+    with pytest.raises(ValueError):
+        similarity.best_match_average([SEIZURE], [[SEIZURE]], measure="cosine")
+
+
+def test_save_and_load(similarity, tmp_path):
+    similarity.save(tmp_path / "hpo_closure.npz")
+    loaded = HpoSemanticSimilarity.load(tmp_path / "hpo_closure.npz")
+    assert loaded.terms == similarity.terms
+    assert loaded.best_match_average([FOCAL_SEIZURE], ANNOTATIONS) == similarity.best_match_average(
+        [FOCAL_SEIZURE], ANNOTATIONS)
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+# the similarity agent builds its provider at import
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+
+from multi_agent_system.agents.similarity_scoring.similarity_tools import compute_similarity_scores
+
+
+@pytest.mark.asyncio
+async def test_unusable_candidates_are_skipped(capsys):
+    candidates = [
+        {"disease_name": "Bardet-Biedl syndrome", "mondo_id": "MONDO:0015229", "phenotypes": ["HP:0000510"]},
+        {"mondo_id": "MONDO:0008763", "phenotypes": ["HP:0000510"]},
+        {"disease_name": "RERE disorder", "mondo_id": None, "phenotypes": None},
+        {"disease_name": "glutaric aciduria type 1", "mondo_id": "MONDO:0009281", "phenotypes": "HP:0001250"},
+    ]
+
+    output = await compute_similarity_scores(["HP:0000510", "HP:0001250"], candidates)
+
+    assert [r.mondo_id for r in output.results] == ["MONDO:0015229", "MONDO:0009281"]
+    assert [r.jaccard_similarity_score for r in output.results] == [0.5, 0.5]
+    assert "candidate 1 (MONDO:0008763): missing disease_name" in capsys.readouterr().out
@@ -0,0 +1,39 @@
+import numpy as np
+
+from multi_agent_system.utils.similarity_utils import jaccard_matrix, jaccard_scores
+
+
+def set_jaccard(patient, disease):
+    """ Reference: calculate_jaccard_index on Python sets """
+    patient, disease = set(patient), set(disease)
+    if not patient or not disease:
+        return 0.0
+    return len(patient & disease) / len(patient | disease)
+
+
+def test_matches_set_based_jaccard():
+    rng = np.random.default_rng(0)
+    terms = [f"HP:{i:07d}" for i in range(40)]
+    patients = [list(rng.choice(terms, size=rng.integers(0, 12))) for _ in range(5)]
+    diseases = [list(rng.choice(terms, size=rng.integers(0, 25))) for _ in range(30)]
+
+    scores = jaccard_matrix(patients, diseases)
+    assert scores.shape == (5, 30)
+    for p, patient in enumerate(patients):
+        assert scores[p].tolist() == [set_jaccard(patient, disease) for disease in diseases]
+
+
+def test_empty_sets_and_duplicates():
+    patient = ["HP:0001250", "HP:0001250", "HP:0000256"]
+    assert jaccard_scores(patient, [[], ["HP:0001250"], ["HP:0009999"]]) == [0.0, 0.5, 0.0]
+    assert jaccard_scores([], [["HP:0001250"]]) == [0.0]
+    assert jaccard_scores(patient, []) == []
+
+
+def test_top_k_orders_by_score_then_index():
+    from multi_agent_system.utils.similarity_utils import top_k
+
+    scores = np.array([0.2, 0.0, 0.5, 0.2, 0.2, 0.1])
+    assert top_k(scores, 3).tolist() == [2, 0, 3]
+    assert top_k(scores, 10).tolist() == [2, 0, 3, 4, 5]
+    assert top_k(scores, 0).tolist() == []
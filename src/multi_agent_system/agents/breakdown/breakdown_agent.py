@@ -3,12 +3,11 @@ AGENT 1: Breakdown Agent for diagnostic reasoning
 """
 
 
-from pydantic_ai.models.openai import OpenAIModel
-from pydantic_ai.providers.deepseek import DeepSeekProvider
 from pydantic_ai import Agent
 
 
 from multi_agent_system.agents.breakdown.breakdown_config import get_config
+from multi_agent_system.agents.provider import build_model, build_model_settings
 from multi_agent_system.agents.breakdown.breakdown_tools import (
    prepare_prompt,
    InitialDiagnosisResult,
@@ -17,11 +16,8 @@ from multi_agent_system.agents.breakdown.breakdown_tools import (
 config = get_config()
 
 
-#Define LLM model
-model = OpenAIModel(
-   "deepseek-chat",
-    provider=DeepSeekProvider(api_key=config.api_key),
-)
+#Define LLM model (shares the pooled provider client with the other agents)
+model = build_model(config.model_name)
 
 
 
@@ -50,6 +46,7 @@ IMPORTANT NOTES:
 # Create breakdown agent
 breakdown_agent = Agent(
    model= model,
+   model_settings=build_model_settings(config.temperature),
    system_prompt=BREAKDOWN_SYSTEM_PROMPT,
    retries=3,
    output_type=InitialDiagnosisResult,
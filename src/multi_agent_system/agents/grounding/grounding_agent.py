@@ -5,11 +5,8 @@ from typing import List
 
 #from oaklib.cli import settings
 from pydantic_ai import Agent, PromptedOutput
-from pydantic_ai.models.openai import OpenAIModel
-from pydantic_ai.providers.deepseek import DeepSeekProvider
-from pydantic_ai.providers.openai import OpenAIProvider
-from pydantic_ai.settings import ModelSettings
 
+from multi_agent_system.agents.provider import build_model, build_model_settings
 from multi_agent_system.agents.grounding.grounding_config import get_config
 from multi_agent_system.agents.grounding.grounding_tools import (
     find_mondo_id,
@@ -19,12 +16,7 @@ from multi_agent_system.agents.grounding.grounding_tools import (
 
 config = get_config()
 
-model = OpenAIModel(
-   "deepseek-chat",
-    provider=DeepSeekProvider(api_key=config.api_key),
-
-
-)
+model = build_model(config.model_name)
 
 GROUNDING_SYSTEM_PROMPT = (
     """
@@ -54,6 +46,7 @@ GROUNDING_SYSTEM_PROMPT = (
 # Create grounding agent
 grounding_agent = Agent(
     model= model,
+    model_settings=build_model_settings(config.temperature),
     system_prompt=GROUNDING_SYSTEM_PROMPT,
     retries=3,
     output_type=List[GroundedDiseaseResult], # prints complete list of results. do not remove
@@ -3,8 +3,10 @@
 """
 import os
 from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Optional
 from oaklib.implementations import MonarchImplementation
+from multi_agent_system.utils.grounding_utils import BASE_DIR
 
 
 @dataclass
@@ -22,6 +24,42 @@ class GroundingAgentConfig:
     # Monarch adapter for retrieving disease knowledge
     monarch_adapter: Optional[MonarchImplementation] = None
 
+    # Where disease knowledge comes from: "monarch" (live associations) or "hpoa" (local phenotype.hpoa)
+    knowledge_backend: str = field(default_factory=lambda: os.environ.get("KNOWLEDGE_BACKEND", "monarch"))
+
+    # HPO annotation file for the "hpoa" backend
+    hpoa_path: Path = field(default_factory=lambda: Path(os.environ.get("HPOA_PATH", BASE_DIR / "phenotype.hpoa")))
+
+    # MONDO SSSOM mapping table used to resolve MONDO IDs to OMIM/ORPHA (None = the table shipped with PhEval)
+    mondo_mapping_path: Optional[Path] = field(
+        default_factory=lambda: Path(os.environ["MONDO_MAPPING_PATH"]) if os.environ.get("MONDO_MAPPING_PATH") else None)
+
+    # Persistent disease -> phenotype association cache
+    knowledge_cache_path: Path = field(
+        default_factory=lambda: Path(os.environ.get("KNOWLEDGE_CACHE_PATH", BASE_DIR / "disease_knowledge.sqlite")))
+
+    # MONDO release the cached associations belong to
+    # (defaults to the knowledge bundle's manifest, then the mondo_download_date PhEval records)
+    mondo_version: Optional[str] = field(default_factory=lambda: os.environ.get("MONDO_VERSION"))
+
+    # seconds before a cached association expires (None = valid for the whole MONDO release)
+    knowledge_cache_ttl: Optional[float] = None
+
+    # number of MONDO IDs kept in memory in front of the cache file
+    knowledge_cache_memory_size: int = 4096
+
+    # threads of the executors grounding lookups run on, off the event loop
+    # (SQLite searches and cache, Monarch HTTP requests, embedding + FAISS search, catalogue scoring)
+    sqlite_workers: int = field(default_factory=lambda: int(os.environ.get("SQLITE_WORKERS", 4)))
+    http_workers: int = field(default_factory=lambda: int(os.environ.get("HTTP_WORKERS", 16)))
+    embedding_workers: int = field(default_factory=lambda: int(os.environ.get("EMBEDDING_WORKERS", 1)))
+    catalogue_workers: int = field(default_factory=lambda: int(os.environ.get("CATALOGUE_WORKERS", 2)))
+
+    # LLM model and sampling temperature (None = provider default)
+    model_name: str = field(default_factory=lambda: os.environ.get("GROUNDING_MODEL_NAME", "deepseek-chat"))
+    temperature: Optional[float] = field(
+        default_factory=lambda: float(os.environ["GROUNDING_TEMPERATURE"]) if os.environ.get("GROUNDING_TEMPERATURE") else None)
+
     #api key
     api_key: str = field(default_factory=lambda: os.environ.get("DEEPSEEK_API_KEY", ""))
     #api_key: str = field(default_factory=lambda: os.environ.get("OPEN_API_KEY", ""))
@@ -7,6 +7,7 @@ from mcp.server.fastmcp import FastMCP
 from multi_agent_system.agents.grounding.grounding_agent import GROUNDING_SYSTEM_PROMPT
 from multi_agent_system.agents.grounding.grounding_tools import (
     find_mondo_id,
+    find_mondo_ids,
     find_disease_knowledge,
 )
 
@@ -29,6 +30,20 @@ async def get_mondo_id(label:str) -> Dict[str, List[str]]:
     return await find_mondo_id(label)
 
 
+@mcp.tool()
+async def get_mondo_ids(labels: List[str]) -> List[dict]:
+    """
+    Search for MONDO IDs for a batch of patient disease labels
+
+    Args:
+        labels: The disease labels to search
+
+    Returns:
+        One dictionary per label that maps the disease label to a MONDO ID
+    """
+    return await find_mondo_ids(labels)
+
+
 @mcp.tool()
 async def get_disease_knowledge(mondo_id:str) -> List[dict]:
     """
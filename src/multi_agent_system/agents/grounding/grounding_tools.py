@@ -1,10 +1,28 @@
 """Tools for Grounding agent"""
 
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from typing import List, Any, Dict
 from oaklib import get_adapter
 from oaklib.implementations import MonarchImplementation
-from multi_agent_system.utils.grounding_utils import cosine_similarity
+from multi_agent_system.agents.grounding.grounding_config import get_config, GroundingAgentConfig
+from multi_agent_system.utils.grounding_utils import (
+    cosine_similarity,
+    batch_cosine_similarity,
+    lookup_normalized_label,
+    mondo_adapter_selector,
+    BASE_DIR,
+)
+from multi_agent_system.utils.hpo_annotations import (
+    HpoAnnotationIndex,
+    default_mondo_mapping_path,
+    read_mondo_mappings,
+)
+from multi_agent_system.utils.executors import get_executor, per_thread, run_in_executor
+from multi_agent_system.utils.knowledge_bundle import read_manifest
+from multi_agent_system.utils.knowledge_cache import DiseaseKnowledgeCache, resolve_mondo_version
 from oaklib.datamodels.search import SearchProperty, SearchConfiguration
 from pydantic_ai import ModelRetry
 from pydantic import BaseModel, Field
@@ -23,15 +41,123 @@ class GroundedDiseaseResult(BaseModel):
 HAS_PHENOTYPE = "biolink:has_phenotype"
 
 
-@lru_cache
+@per_thread
 def get_mondo_adapter():
-   """ Retrieve the MONARCH ontology adapter
+   """ Retrieve the MONDO ontology adapter of the calling thread
+
+   SQLite connections cannot be shared between the sqlite executor's threads, so each opens its own.
+
+
+   Returns:
+       The MONDO ontology adapter, backed by the knowledge bundle's mondo.db when it has one
+       """
+   return get_adapter(mondo_adapter_selector())
+
+
+@per_thread
+def get_monarch_adapter() -> MonarchImplementation:
+   """ Retrieve the Monarch adapter of the calling thread
+
+   Its HTTP session is not safe to share between the http executor's threads, so each creates its own.
+   """
+   return MonarchImplementation()
+
+
+@lru_cache
+def get_grounding_config() -> GroundingAgentConfig:
+   """ Grounding settings shared by every knowledge lookup in this process """
+   return get_config()
+
+
+def grounding_executor(workload: str) -> ThreadPoolExecutor:
+   """ Thread pool for one kind of blocking grounding work: "sqlite", "http", "embedding" or "catalogue" """
+   config = get_grounding_config()
+   workers = {
+       "sqlite": config.sqlite_workers,
+       "http": config.http_workers,
+       "embedding": config.embedding_workers,
+       "catalogue": config.catalogue_workers,
+   }
+   return get_executor(workload, workers[workload])
+
+
+@lru_cache
+def get_knowledge_cache() -> DiseaseKnowledgeCache:
+   """ Retrieve the persistent disease -> phenotype association cache
+
+
+   Returns:
+       The cache, scoped to the current MONDO release
+       """
+   config = get_grounding_config()
+   return DiseaseKnowledgeCache(
+       config.knowledge_cache_path,
+       version=resolve_mondo_version(config.mondo_version or read_manifest(BASE_DIR).get("mondo_version")),
+       ttl_seconds=config.knowledge_cache_ttl,
+       memory_size=config.knowledge_cache_memory_size,
+   )
+
+
+_hpo_index_lock = threading.Lock()
+
+
+def get_hpo_annotation_index() -> HpoAnnotationIndex:
+   """ Load the local phenotype.hpoa knowledge base (read once per process)
+
+   The first lookups arrive concurrently from the executor threads; the lock makes one of them
+   parse the files while the others wait for its result.
 
 
    Returns:
-       The MONDO ontology adapter
+       The disease -> HPO index, with MONDO IDs resolved through the MONDO SSSOM mappings
        """
-   return get_adapter("sqlite:obo:mondo")
+   with _hpo_index_lock:
+       return _load_hpo_annotation_index()
+
+
+@lru_cache
+def _load_hpo_annotation_index() -> HpoAnnotationIndex:
+   config = get_grounding_config()
+   mapping_path = config.mondo_mapping_path or default_mondo_mapping_path()
+   mondo_mappings = read_mondo_mappings(mapping_path) if mapping_path else {}
+   print(f"[INFO] Loading HPO annotations from {config.hpoa_path}")
+   return HpoAnnotationIndex.from_hpoa(config.hpoa_path, mondo_mappings)
+
+
+def retrieve_catalogue_candidates(hpo_ids: List[str], top_k: int = 20) -> List[GroundedDiseaseResult]:
+    """
+    Score the patient against every disease in the local HPO annotation catalogue and return the best.
+
+    The catalogue's OMIM/ORPHA IDs are resolved to MONDO through the SSSOM exact matches, so the
+    candidates are already grounded and need neither text grounding nor a knowledge lookup.
+
+
+    Args:
+       hpo_ids: patient HPO IDs
+       top_k: number of diseases to retrieve
+
+
+    Returns:
+       One GroundedDiseaseResult per MONDO ID (best first) with its phenotypes filled; diseases without a
+       MONDO exact match are left out
+    """
+    index = get_hpo_annotation_index()
+    results: Dict[str, GroundedDiseaseResult] = {}
+    for disease_id, score in index.rank_diseases(hpo_ids, top_k):
+        name = index.disease_name(disease_id)
+        mondo_ids = index.mondo_ids(disease_id)
+        print(f"[Catalogue Match] {disease_id} '{name}' with Jaccard index {score:.4f}")
+        if not mondo_ids:
+            print(f"[WARNING] No MONDO exact match for catalogue disease {disease_id}, skipping it")
+            continue
+        mondo_id = mondo_ids[0]
+        if mondo_id not in results:
+            results[mondo_id] = GroundedDiseaseResult(
+                disease_name=name or mondo_id,
+                mondo_id=mondo_id,
+                phenotypes=index.phenotypes(mondo_id),
+            )
+    return list(results.values())
 
 
 async def ground_diseases(labels: List[str]) -> list[GroundedDiseaseResult]:
@@ -48,10 +174,17 @@ async def ground_diseases(labels: List[str]) -> list[GroundedDiseaseResult]:
     """
 
     try:
+        try:
+            groundings = await find_mondo_ids(labels)
+        except Exception as e:
+            print(f"[WARNING] Batch grounding failed, grounding labels one at a time: {e}")
+            groundings = [None] * len(labels)
+
         results = []
-        for label in labels:
+        for label, grounding in zip(labels, groundings):
             try:
-                grounding = await find_mondo_id(label)
+                if grounding is None:
+                    grounding = await find_mondo_id(label)
                 print(f"\n[DEBUG] Grounding result for '{label}': {grounding}")
 
                 if "id" in grounding and grounding["id"]:
@@ -82,6 +215,77 @@ async def ground_diseases(labels: List[str]) -> list[GroundedDiseaseResult]:
         raise ModelRetry(error_msg) from e
 
 
+async def ground_and_retrieve_knowledge(labels: List[str]) -> List[GroundedDiseaseResult]:
+    """
+    Ground candidate diseases and attach their phenotypes without going through the grounding agent.
+
+    Runs the same steps the agent is asked to perform: exact match → cosine fallback
+    (ground_diseases), then phenotype retrieval (find_disease_knowledge) once per MONDO ID.
+
+
+    Args:
+       labels: list of disease names in candidate diseases
+
+
+    Returns:
+       A list of GroundedDiseaseResult entries, in input order, with their associated HPO IDs
+    """
+    grounded = await ground_diseases(labels)
+
+    async def phenotypes_of(mondo_id: str) -> List[str]:
+        try:
+            associations = await find_disease_knowledge(mondo_id)
+            # only keep phenotypes, as the agent is instructed to
+            return [a for a in associations if str(a).startswith("HP:")]
+        except Exception as e:
+            print(f"[ERROR] No disease knowledge for {mondo_id}: {e}")
+            return []
+
+    # all lookups at once; the sqlite and http executors bound how many actually run in parallel
+    mondo_ids = list(dict.fromkeys(result.mondo_id for result in grounded if result.mondo_id))
+    knowledge: Dict[str, List[str]] = dict(zip(mondo_ids, await asyncio.gather(*map(phenotypes_of, mondo_ids))))
+    for result in grounded:
+        if result.mondo_id:
+            result.phenotypes = list(knowledge[result.mondo_id])
+
+    return grounded
+
+
+def _exact_match(label: str) -> str | None:
+    """
+    Exact (label or synonym) search: the in-memory normalised label index first,
+    then the MONDO SQLite adapter.
+
+
+    Args:
+       label: The candidate disease label to search
+
+
+    Returns:
+       The first matching MONDO ID, or None if there is no exact match
+    """
+    hit = lookup_normalized_label(label)
+    if hit:
+        print(f"[Exact Match] Found MONDO ID in label index: {hit}")
+        return hit
+
+    adapter = get_mondo_adapter()
+
+    try:
+
+        config = SearchConfiguration(properties=[SearchProperty.ALIAS])
+        mondo_results = list(adapter.basic_search(label, config=config))
+
+
+        if mondo_results:
+            hit = mondo_results[0]
+            print(f"[Exact Match] Found MONDO ID: {hit}")
+            return hit
+    except Exception as e:
+        print(f"[WARNING] Exact search failed for '{label}': {e}")
+    return None
+
+
 async def find_mondo_id(label: str) -> Dict[str, Any]:
     """
     Search for MONDO ID for a given patient disease label and return the best match.
@@ -97,29 +301,73 @@ async def find_mondo_id(label: str) -> Dict[str, Any]:
 
     try:
         print(f"Searching for MONDO ID for label: {label}")
-        adapter = get_mondo_adapter()
+        hit = await run_in_executor(grounding_executor("sqlite"), _exact_match, label)
+        if hit:
+            return {"label": label, "id": hit}
 
-        try:
+        #Fallback to cosine similarity
+        return await run_in_executor(grounding_executor("embedding"), cosine_similarity, label)
+    except Exception as e:
+        error_msg = f"Failed to find MONDO ID for '{label}': {e}"
+        print(f"[ERROR] {error_msg}")
+        raise ModelRetry(error_msg) from e
 
-            config = SearchConfiguration(properties=[SearchProperty.ALIAS])
-            mondo_results = list(adapter.basic_search(label, config=config))
 
+async def find_mondo_ids(labels: List[str]) -> List[Dict[str, Any]]:
+    """
+    Search for MONDO IDs for a batch of disease labels.
 
-            if mondo_results:
-                hit = mondo_results[0]
-                print(f"[Exact Match] Found MONDO ID: {hit}")
-                return {"label": label, "id": hit}
-        except Exception as e:
-            print(f"[WARNING] Exact search failed for '{label}': {e}")
+    Exact matches are resolved per label; every label that misses is then embedded
+    in a single model call and searched in a single FAISS query.
 
-        #Fallback to cosine similarity
-        return cosine_similarity(label)
+
+    Args:
+       labels: The candidate disease labels to search
+
+
+    Returns:
+       One dictionary per label, in input order, identical to what find_mondo_id returns
+    """
+
+    try:
+        print(f"Searching for MONDO IDs for {len(labels)} labels")
+        sqlite_executor = grounding_executor("sqlite")
+        hits = await asyncio.gather(*(run_in_executor(sqlite_executor, _exact_match, label) for label in labels))
+
+        results: List[Dict[str, Any] | None] = []
+        misses = []
+        for position, (label, hit) in enumerate(zip(labels, hits)):
+            if hit:
+                results.append({"label": label, "id": hit})
+            else:
+                results.append(None)
+                misses.append(position)
+
+        #Fallback to cosine similarity for every label without an exact match
+        cosine_results = await run_in_executor(grounding_executor("embedding"), batch_cosine_similarity,
+                                               [labels[position] for position in misses])
+        for position, result in zip(misses, cosine_results):
+            results[position] = result
+        return results
     except Exception as e:
-        error_msg = f"Failed to find MONDO ID for '{label}': {e}"
+        error_msg = f"Failed to find MONDO IDs for {labels}: {e}"
         print(f"[ERROR] {error_msg}")
         raise ModelRetry(error_msg) from e
 
 
+def _fetch_associations(mondo_id: str, limit: int) -> List[str]:
+    """ Blocking Monarch request for the first `limit` association objects of a MONDO ID """
+    adapter = get_monarch_adapter()
+    results = []
+    disease_association = adapter.associations(subjects=[mondo_id])
+
+    for i, assoc in enumerate(disease_association):
+        if i >= limit:
+            break
+        if assoc.object:
+            results.append(assoc.object)
+    return results
+
 
 async def find_disease_knowledge(mondo_id: str, limit: int = 80) -> List[str]:
     """"
@@ -134,16 +382,20 @@ async def find_disease_knowledge(mondo_id: str, limit: int = 80) -> List[str]:
        List of dictionaries with HPO terms and other disease associated metadata
     """
     try:
-        print(f"Retrieve disease knowledge for {mondo_id}")
-        adapter = MonarchImplementation()
-        results = []
-        disease_association = adapter.associations(subjects=[mondo_id])
+        sqlite_executor = grounding_executor("sqlite")
+        if get_grounding_config().knowledge_backend == "hpoa":
+            # local annotations are complete, so they are not truncated to `limit`
+            return await run_in_executor(sqlite_executor, lambda: get_hpo_annotation_index().phenotypes(mondo_id))
+
+        cache = get_knowledge_cache()
+        cached = await run_in_executor(sqlite_executor, cache.get, mondo_id, limit)
+        if cached is not None:
+            print(f"[Cache Hit] Disease knowledge for {mondo_id}")
+            return cached
 
-        for i, assoc in enumerate(disease_association):
-            if i >= limit:
-                break
-            if assoc.object:
-                results.append(assoc.object)
+        print(f"Retrieve disease knowledge for {mondo_id}")
+        results = await run_in_executor(grounding_executor("http"), _fetch_associations, mondo_id, limit)
+        await run_in_executor(sqlite_executor, cache.put, mondo_id, results, limit)
         return results
     except Exception as e:
         error_msg = f"Failed to retrieve disease knowledge for {mondo_id}: {e}"
@@ -0,0 +1,96 @@
+"""
+Shared LLM provider for the breakdown, grounding and similarity agents.
+
+All agents send their requests through one DeepSeek provider and one pooled async HTTP client,
+so concurrent cases reuse warm (TLS) connections instead of each agent keeping its own pool.
+"""
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from pydantic import Field
+from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.providers.deepseek import DeepSeekProvider
+from pydantic_ai.settings import ModelSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class ProviderConfig(BaseSettings):
+    """Connection settings of the shared LLM HTTP client."""
+
+    api_key: str = Field(default="", alias="DEEPSEEK_API_KEY")
+
+    # HTTP/2 multiplexes concurrent requests over one connection (needs the h2 package)
+    http2: bool = Field(True, alias="LLM_HTTP2")
+
+    # connection pool: total connections, idle connections kept alive, and how long they are kept
+    max_connections: int = Field(100, ge=1, alias="LLM_MAX_CONNECTIONS")
+    max_keepalive_connections: int = Field(20, ge=0, alias="LLM_MAX_KEEPALIVE_CONNECTIONS")
+    keepalive_expiry: float = Field(60.0, ge=0, alias="LLM_KEEPALIVE_EXPIRY")
+
+    # seconds; the defaults pydantic_ai uses for its own clients
+    timeout: float = Field(600.0, alias="LLM_TIMEOUT")
+    connect_timeout: float = Field(5.0, alias="LLM_CONNECT_TIMEOUT")
+
+    # aliases only: generic field names such as TIMEOUT must not be read from the environment
+    model_config = SettingsConfigDict(
+        env_prefix="",
+        extra="ignore",
+    )
+
+
+def get_config() -> ProviderConfig:
+    """Returns the configured settings for the shared LLM provider."""
+    return ProviderConfig()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@lru_cache
+def get_http_client() -> httpx.AsyncClient:
+    """ The pooled async HTTP client shared by every agent in this process """
+    config = get_config()
+    http2 = config.http2 and _http2_available()
+    if config.http2 and not http2:
+        print("[WARNING] HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(timeout=config.timeout, connect=config.connect_timeout),
+    )
+
+
+@lru_cache
+def get_provider() -> DeepSeekProvider:
+    """ The DeepSeek provider shared by every agent in this process """
+    return DeepSeekProvider(api_key=get_config().api_key, http_client=get_http_client())
+
+
+def build_model(model_name: str) -> OpenAIModel:
+    """ Model for one agent, sending its requests through the shared provider
+
+    Args:
+        model_name (str): provider model name, e.g. deepseek-chat
+
+    Returns:
+        OpenAIModel
+    """
+    return OpenAIModel(model_name, provider=get_provider())
+
+
+def build_model_settings(temperature: Optional[float] = None) -> Optional[ModelSettings]:
+    """ Per-agent model settings; None leaves the provider defaults """
+    if temperature is None:
+        return None
+    return ModelSettings(temperature=temperature)
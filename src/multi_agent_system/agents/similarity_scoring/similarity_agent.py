@@ -3,10 +3,8 @@ Similarity Scoring Agent.
 """
 
 from pydantic_ai import Agent, PromptedOutput
-from pydantic_ai.models.openai import OpenAIModel
-from pydantic_ai.providers.deepseek import DeepSeekProvider
-from pydantic_ai.providers.openai import OpenAIProvider
 
+from multi_agent_system.agents.provider import build_model, build_model_settings
 from multi_agent_system.agents.similarity_scoring.similarity_config import get_config
 from multi_agent_system.agents.similarity_scoring.similarity_tools import (
     compute_similarity_scores,
@@ -17,10 +15,7 @@ from multi_agent_system.agents.similarity_scoring.similarity_tools import (
 config = get_config()
 
 # Load LLM model
-model = OpenAIModel(
-    model_name="deepseek-chat",
-    provider=DeepSeekProvider(api_key=config.api_key),
-)
+model = build_model(config.model_name)
 
 SIMILARITY_SYSTEM_PROMPT=(
     """
@@ -32,7 +27,7 @@ SIMILARITY_SYSTEM_PROMPT=(
     - Candidate diseases list (HPO terms)
     
     2. You must rank the candidate diseases based on similarity scores.
-    3. You must call the `save_agent_results` function to save the ranked list in TSV format
+    3. You must call the `save_agent_results` function to save the ranked list as a Parquet table
     
     
     IMPORTANT:
@@ -49,6 +44,7 @@ SIMILARITY_SYSTEM_PROMPT=(
 # Create the agent
 similarity_agent = Agent(
     model=model,
+    model_settings=build_model_settings(config.temperature),
     system_prompt=SIMILARITY_SYSTEM_PROMPT,
     retries=5,
     output_type= SimilarityAgentOutput,
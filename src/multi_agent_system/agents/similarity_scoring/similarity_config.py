@@ -2,9 +2,14 @@
 Configuration for Similarity Agent
 """
 
+from pathlib import Path
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
+from multi_agent_system.utils.grounding_utils import BASE_DIR
+
 
 class SimilarityAgentConfig(BaseSettings):
     """Configuration settings for the similarity scoring agent."""
@@ -15,13 +20,25 @@ class SimilarityAgentConfig(BaseSettings):
     # Limit on number of top diseases to return
     top_n_results: int = Field(5, description="Maximum number of top-scoring disease matches to return")
 
+    # Score used to rank candidates: exact-ID Jaccard, or ontology-aware best-match average of Resnik / Lin
+    similarity_measure: Literal["jaccard", "resnik", "lin"] = Field(
+        "jaccard", description="jaccard | resnik | lin (best-match average over HPO ancestor closures)")
+
+    # HPO ancestor closures and information content, built with `agents build_hpo_closure`
+    hpo_closure_path: Path = Field(default_factory=lambda: BASE_DIR / "hpo_closure.npz",
+                                   description="Precomputed HPO closures for the resnik and lin measures")
+
+    # LLM model and sampling temperature (None = provider default)
+    model_name: str = Field("deepseek-chat", alias="SIMILARITY_MODEL_NAME")
+    temperature: Optional[float] = Field(None, alias="SIMILARITY_TEMPERATURE")
+
     # API key
     api_key: str = Field(default="", alias="DEEPSEEK_API_KEY") #deepseek
     #api_key: str = Field(default="", alias="OPEN_API_KEY") #open ai
 
+    # aliased fields are read from their alias only, so the breakdown agent's MODEL_NAME does not apply here
     model_config = SettingsConfigDict(
         env_prefix="",
-        populate_by_name=True,
     )
 
 
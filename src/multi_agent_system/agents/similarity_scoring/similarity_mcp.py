@@ -43,7 +43,7 @@ async def save_final_results(results: List[dict], phenopacket_id: str, output_di
 
    Args:
        results: List of dicts representing similarity scores
-       phenopacket_id: patient identifier that is used to name the tsv file
+       phenopacket_id: patient identifier that is used to name the result file
        output_dir: Path to output (agent_results) folder
 
     """
@@ -1,11 +1,13 @@
 """Tools for Similarity Scoring Agent"""
-import csv
 from functools import lru_cache
 from pathlib import Path
 from typing import Set, List, Dict, Optional, Any
 from pydantic_ai import ModelRetry
 from pydantic import BaseModel
-from multi_agent_system.agents.similarity_scoring.similarity_config import get_config
+from multi_agent_system.agents.similarity_scoring.similarity_config import get_config, SimilarityAgentConfig
+from multi_agent_system.utils.semantic_similarity import HpoSemanticSimilarity
+from multi_agent_system.utils.similarity_utils import jaccard_scores
+from multi_agent_system.utils.result_tables import agent_result_path, write_agent_result
 
 
 class SimilarityScoreResult(BaseModel):
@@ -13,6 +15,8 @@ class SimilarityScoreResult(BaseModel):
     mondo_id: Optional[str]
     jaccard_similarity_score: float
     cosine_similarity_score: Optional[float]
+    # score candidates are ranked by (SimilarityAgentConfig.similarity_measure); None falls back to Jaccard
+    similarity_score: Optional[float] = None
 
 
 class SimilarityAgentOutput(BaseModel):
@@ -48,42 +52,74 @@ def calculate_jaccard_index(set1: Set[str], set2: Set[str]) -> float:
         raise ModelRetry(error_msg) from e
 
 
+@lru_cache
+def get_similarity_config() -> SimilarityAgentConfig:
+    """ Similarity settings shared by every scoring call in this process """
+    return get_config()
+
+
+@lru_cache
+def get_semantic_similarity() -> HpoSemanticSimilarity:
+    """ Load the precomputed HPO closures and information content (read once per process)
+
+
+    Returns:
+        HpoSemanticSimilarity
+        """
+    path = get_similarity_config().hpo_closure_path
+    if not path.exists():
+        raise FileNotFoundError(f"{path} not found, build it with `agents build_hpo_closure`")
+    print(f"[INFO] Loading HPO closures from {path}")
+    return HpoSemanticSimilarity.load(path)
+
+
+def _phenotype_list(raw_phenotypes: Any) -> List[str]:
+    """ Accept phenotypes as a list, set or a single HPO ID """
+    if isinstance(raw_phenotypes, set):
+        return list(raw_phenotypes)  # Convert set to list
+    if isinstance(raw_phenotypes, str):
+        return [raw_phenotypes]  # Wrap string in list
+    return raw_phenotypes  # Assume it's already a list
+
+
 async def compute_similarity_scores(
         patient_hpo_ids: List[str],
         candidate_diseases: List[Dict[str, Any]],
 ) -> SimilarityAgentOutput:
     try:
         print("[TOOL CALLED] Computing Jaccard Index!")
-        patient_set = set(patient_hpo_ids)
-        results = []
-
-        for disease in candidate_diseases:
+        # candidates without a name or a phenotype list (e.g. None) are skipped, as before
+        valid_diseases, disease_sets = [], []
+        for position, disease in enumerate(candidate_diseases):
+            if "disease_name" not in disease:
+                print(f"[ERROR] Failed to process candidate {position} ({disease.get('mondo_id')}): missing disease_name")
+                continue
             try:
-                disease_name = disease["disease_name"]
-                mondo_id = disease.get("mondo_id")
-                raw_phenotypes = disease.get("phenotypes", [])
-                cosine_score = disease.get("cosine_score")
-
-                # Handle different phenotype types
-                if isinstance(raw_phenotypes, set):
-                    phenotypes = list(raw_phenotypes)  # Convert set to list
-                elif isinstance(raw_phenotypes, str):
-                    phenotypes = [raw_phenotypes]  # Wrap string in list
-                else:
-                    phenotypes = raw_phenotypes  # Assume it's already a list
-
-                disease_set = set(phenotypes)  # Now safe
-                jaccard_score = calculate_jaccard_index(patient_set, disease_set)
-
-                results.append(SimilarityScoreResult(
-                    disease_name=disease_name,
-                    mondo_id=mondo_id,
-                    jaccard_similarity_score=jaccard_score,
-                    cosine_similarity_score=cosine_score,
-                ))
-            except Exception as e:
-                print(f"[ERROR] Failed to process disease '{disease.get('disease_name', 'unknown')}': {e}")
-
+                disease_sets.append(list(_phenotype_list(disease.get("phenotypes", []))))
+            except TypeError as e:
+                print(f"[ERROR] Failed to process disease '{disease['disease_name']}': {e}")
+                continue
+            valid_diseases.append(disease)
+
+        # one sparse matrix product for all candidates instead of a set intersection per disease
+        scores = jaccard_scores(patient_hpo_ids, disease_sets)
+
+        measure = get_similarity_config().similarity_measure
+        if measure == "jaccard":
+            similarity_scores = scores
+        else:
+            similarity_scores = get_semantic_similarity().best_match_average(patient_hpo_ids, disease_sets, measure)
+
+        results = [
+            SimilarityScoreResult(
+                disease_name=disease["disease_name"],
+                mondo_id=disease.get("mondo_id"),
+                jaccard_similarity_score=score,
+                cosine_similarity_score=disease.get("cosine_score"),
+                similarity_score=similarity_score,
+            )
+            for disease, score, similarity_score in zip(valid_diseases, scores, similarity_scores)
+        ]
 
         return SimilarityAgentOutput(results=results)
     except Exception as e:
@@ -101,25 +137,16 @@ async def save_agent_results(results: List[dict], phenopacket_id: str,
       Args:
           results: List of dicts representing similarity scores.
           output_dir: Path to output (agent_results)  folder
-          phenopacket_id: patient identifier that is used to name the tsv file.
+          phenopacket_id: patient identifier that is used to name the result file.
       """
 
     try:
         print("[TOOL CALLED] Saving agent results")
-        output_dir.mkdir(parents=True, exist_ok=True)
-        output_path = output_dir / f"{phenopacket_id}-agents.tsv"
+        output_path = agent_result_path(output_dir, phenopacket_id)
 
         try:
-            with output_path.open("w", newline='', encoding='utf-8') as f:
-                writer = csv.writer(f, delimiter='\t')
-                writer.writerow(["rank", "score", "candidate disease", "disease_identifier"])
-
-                for rank, result in enumerate(results, start=1):
-                    try:
-                        score = round(1 / rank, 4)
-                        writer.writerow([rank, score, result["disease_name"], result["mondo_id"]])
-                    except Exception as e:
-                        print(f"[ERROR] Failed to write result row {rank}: {e}")
+            # Parquet in the PhEval disease-result schema, swapped in atomically so a crash never leaves a partial file
+            write_agent_result(results, output_path)
 
         except Exception as e:
             error_msg = f"File operation failed for {output_path}: {e}"
@@ -1,18 +1,21 @@
 import asyncio
-import json
 import time
 import click
 from pathlib import Path
 from pheval.utils.file_utils import all_files
 from multi_agent_system.agents.breakdown.breakdown_agent import breakdown_agent
-from multi_agent_system.agents.grounding.grounding_agent import grounding_agent
-from multi_agent_system.agents.similarity_scoring.similarity_agent import similarity_agent
-from multi_agent_system.agents.similarity_scoring.similarity_tools import save_agent_results
-from multi_agent_system.utils.batching_utils import calculate_batch_size
+from multi_agent_system.pipeline import run_pipeline as run_phenopackets
+from multi_agent_system.pipeline_config import get_config as get_pipeline_config, PipelineConfig
+from multi_agent_system.scripts.hpo_closure import main as build_hpo_closure
+from multi_agent_system.scripts.mondo_index import main as build_index
+from multi_agent_system.utils.knowledge_bundle import bundle_dir as default_bundle_dir, check_bundle
 from multi_agent_system.utils.utils import extract_hpo_ids_and_sex
 
 
-#  poetry run agents run_pipeline --phenopacket-dir phenopackets
+#  poetry run agents run_pipeline --phenopacket-dir phenopackets --max-concurrent-cases 4
+#  poetry run agents build_index --index-type hnsw --workers 4
+#  poetry run agents build_hpo_closure --hpoa-path phenotype.hpoa
+#  poetry run agents verify_bundle --bundle-dir /data/mondo-bundle
 
 
 @click.group()
@@ -52,190 +55,80 @@ async def run_breakdown(phenopacket_dir: str):
 
 @cli.command(name="run_pipeline")
 @click.option('--phenopacket-dir', type=click.Path(exists=True), required=True, help='Directory with phenopacket JSON files')
-def run_pipeline(phenopacket_dir: str):
+@click.option('--output-dir', type=click.Path(), default="results/raw_results", show_default=True,
+              help='Directory the per-case Parquet results are written to')
+@click.option('--tmp-dir', type=click.Path(), default="tmp", show_default=True,
+              help='Directory for the run journal used by --resume')
+@click.option('--resume', is_flag=True, default=False,
+              help='Skip cases the run journal records as completed; re-run unfinished ones')
+@click.option('--max-concurrent-cases', type=click.IntRange(min=1), default=None,
+              help='Number of phenopackets processed at the same time (default: MAX_CONCURRENT_CASES or 1)')
+@click.option('--grounding-mode', type=click.Choice(["deterministic", "agent"]), default=None,
+              help='Ground candidates directly (deterministic) or through the grounding agent')
+@click.option('--similarity-mode', type=click.Choice(["deterministic", "agent"]), default=None,
+              help='Score candidates directly (deterministic) or through the similarity agent')
+@click.option('--candidate-source', type=click.Choice(["llm", "llm+catalogue", "catalogue"]), default=None,
+              help='Candidates from the breakdown agent, the HPO annotation catalogue, or both')
+@click.option('--catalogue-top-k', type=click.IntRange(min=1), default=None,
+              help='Number of diseases retrieved from the annotation catalogue per case')
+@click.option('--requests-per-minute', type=click.IntRange(min=1), default=None,
+              help='LLM requests per minute shared by all agents (default: no limit)')
+@click.option('--tokens-per-minute', type=click.IntRange(min=1), default=None,
+              help='LLM tokens per minute shared by all agents (default: no limit)')
+@click.option('--cohort-table', is_flag=True, default=False,
+              help='Also combine all case results into one cohort_results.parquet')
+@click.option('--agent-cache', 'agent_cache_mode', type=click.Choice(["off", "read_through", "record", "replay"]),
+              default=None, help='Record/replay cache for agent runs (replay fails on a cache miss)')
+@click.option('--agent-cache-dir', type=click.Path(), default=None, help='Directory recorded agent runs are stored in')
+def run_pipeline(phenopacket_dir: str, output_dir: str, tmp_dir: str, resume: bool,
+                 max_concurrent_cases: int | None,
+                 grounding_mode: str | None, similarity_mode: str | None, candidate_source: str | None,
+                 catalogue_top_k: int | None, requests_per_minute: int | None, tokens_per_minute: int | None,
+                 cohort_table: bool, agent_cache_mode: str | None, agent_cache_dir: str | None):
     """Run full pipeline: Breakdown → Grounding → Similarity"""
-    asyncio.run(run_pipeline_async(phenopacket_dir))
-
-async def run_pipeline_async(phenopacket_dir: str):
+    config = get_pipeline_config(
+        resume=resume or None,
+        max_concurrent_cases=max_concurrent_cases,
+        grounding_mode=grounding_mode,
+        similarity_mode=similarity_mode,
+        candidate_source=candidate_source,
+        catalogue_top_k=catalogue_top_k,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        cohort_table=cohort_table or None,
+        agent_cache_mode=agent_cache_mode,
+        agent_cache_dir=agent_cache_dir,
+    )
+    asyncio.run(run_pipeline_async(phenopacket_dir, output_dir, config, tmp_dir))
+
+async def run_pipeline_async(phenopacket_dir: str, output_dir: str = "results/raw_results",
+                             config: PipelineConfig | None = None, tmp_dir: str = "tmp"):
     phenopacket_dir = Path(phenopacket_dir)
-
-    for phenopacket_path in all_files(phenopacket_dir):
-        if not phenopacket_path.name.endswith(".json"):
-            continue
-
-        print(f"\n[INFO] Processing: {phenopacket_path.name}")
-        hpo_ids, sex = extract_hpo_ids_and_sex(phenopacket_path)
-
-        # BREAKDOWN AGENT
-        breakdown_input = f"""
-        Patient case: {phenopacket_path.stem}
-        HPO terms: {hpo_ids}
-        Patient sex: {sex}
-    
-        """
-
-        print(f"[INFO] Passing to input to breakdown agent: {breakdown_input}")
-        print("[RUNNING BREAKDOWN AGENT]")
-        breakdown_result = await breakdown_agent.run(breakdown_input)
-        print("Tokens used (if available):", breakdown_result.usage())
-        await asyncio.sleep(0.5)
-
-        print(f"[INFO] BREAKDOWN AGENT COMPLETE")
-        print(f"[BREAKDOWN RESULT]:\n{breakdown_result}\n") # breakdown_result.output = InitialDiagnosisResult
-
-
-        # GROUNDING AGENT
-        # extract candidate disease name from InitialDiagnosisResult
-        # breakdown_result.output is the InitialDiagnosisResult object
-
-        print("[RUNNING GROUNDING AGENT]")
-        candidate_disease_labels = [d.disease_name for d in breakdown_result.output.candidate_diseases]
-
-        # calculate batch size
-
-
-        grounding_batch_size = min(5, calculate_batch_size(
-            candidate_disease_labels,
-            max_tokens=3500,  # Leave room for response
-            per_item_overhead=80  # Account for agent prompt overhead
-        ))
-        print(f"Grounding batch size: {grounding_batch_size}, Total items: {len(candidate_disease_labels)}")
-
-        # Process in dynamically sized batches
-        grounding_results = []
-        for i in range(0, len(candidate_disease_labels), grounding_batch_size):
-            batch = candidate_disease_labels[i:i + grounding_batch_size]
-            print(f"Processing grounding batch {i // grounding_batch_size + 1} with {len(batch)} items")
-            results = await grounding_agent.run(batch)
-            print(f"Tokens used: {results.usage().total_tokens}")
-            grounding_results.extend(results.output)
-
-
-        print("[INFO] Number of grounded diseases", len(grounding_results))
-
-
-
-
-
-
-
-
-        # print("candidate_disease_labels:", candidate_disease_labels)
-        # print("Number of candidate disease:", len(candidate_disease_labels))
-        #
-        # grounding_results = await grounding_agent.run(candidate_disease_labels)
-        # print("Tokens used (if available):", grounding_results.usage())
-        # await asyncio.sleep(0.5)
-
-        print("[GROUNDING AGENT COMPLETE]:")
-        # for result in grounding_results.output[0]:
-        #     print(result)
-        # print()
-
-        # print(" Number of output diseases after grounding:", len(results.output))
-        #
-        # # SIMILARITY AGENT
-        #
-        # print("[PRE-PROCESSING FOR SIMILARITY SCORING AGENT]")
-        #
-        # # all grounded diseases, even partially grounded one proceed to jaccard similarity scoring
-        #
-        # print("Filtered grounded results")
-        # filter_groundings = grounding_results
-        #
-        # print("filter_groundings:", filter_groundings) # check filter_groundings
-
-        candidate_diseases = [
-            {
-                "disease_name":d.disease_name,
-                "mondo_id": d.mondo_id,
-                "phenotypes": list(d.phenotypes),
-                "cosine_score": d.cosine_score
-            }
-
-            for d in grounding_results
-        ]
-
-        # print("Formatted candidate_diseases:", candidate_diseases [:1]) #debug the first item
-
-        # Calculate safe batch size for similarity agent
-        similarity_batch_size = min(5,calculate_batch_size(
-            candidate_diseases,
-            max_tokens=3500,
-            per_item_overhead=100  # Higher overhead due to phenotype data
-        ))
-        print(f"Similarity batch size: {similarity_batch_size}, Total items: {len(candidate_diseases)}")
-
-        # Process in batches
-        all_similarity_results = []
-        for i in range(0, len(candidate_diseases), similarity_batch_size):
-            batch = candidate_diseases[i:i + similarity_batch_size]
-            print(f"Processing similarity batch {i // similarity_batch_size + 1} with {len(batch)} items")
-
-            similarity_input = (
-                f"### PATIENT HPO TERMS ###\n"
-                f"{', '.join(hpo_ids)}\n\n"
-                f"### CANDIDATE DISEASES ###\n"
-                f"{json.dumps(batch, separators=(',', ':'), ensure_ascii=False)}\n\n"
-                f"### PHENOPACKET ID ###\n"
-                f"{phenopacket_path.stem}"
-            )
-
-            print("[DEBUG] Prompt length (chars):", len(similarity_input))
-            print("[DEBUG] Estimated tokens:", len(similarity_input) // 4)
-
-            results = await similarity_agent.run(similarity_input)
-            all_similarity_results.extend(results.output.results)
-            print(f"Tokens used: {results.usage().total_tokens}")
-            await asyncio.sleep(0.5)
-
-        # print(f"[SIMILARITY RESULT]:\n{all_similarity_results}\n")
-        sorted_results = sorted(
-            all_similarity_results,
-            key=lambda x: x.jaccard_similarity_score,
-            reverse=True
-        )[:10]  # Top 10 diseases
-
-        print(f"[SIMILARITY RESULT - TOP 10]:\n{sorted_results}\n")
-
-        print("[INFO] SIMILARITY AGENT COMPLETE")
-
-        # convert similarity agent output which is an object into a dictionary
-        await save_agent_results(
-            results=[
-                {
-                    "disease_name": r.disease_name,
-                    "mondo_id": r.mondo_id,
-                    "score": r.jaccard_similarity_score
-                }
-                for r in sorted_results
-            ],
-            phenopacket_id=phenopacket_path.stem
-        )
-
-
-        #
-        # similarity_input = f"""
-        #
-        # Patient HPO IDs: {hpo_ids}
-        # Candidate Diseases: {
-        # json.dumps(candidate_diseases, indent=2)
-        # }
-        # "phenopacket_ids: {phenopacket_path.stem}
-        # """
-        #
-        # print(f"[INFO] Passed filtered grounded results as input to similarity scoring agent")
-        # # print(f"[INFO] Passing to similarity agent: {similarity_input}")
-        #
-        # print("[INFO] RUNNING SIMILARITY AGENT")
-        # similarity_results = await similarity_agent.run(similarity_input)
-        # print("Tokens used (if available):", similarity_results.usage())
-        # await asyncio.sleep(1.5)
-        #
-        # # print("Number of output diseases after grounding:", len(similarity_results.output))
-        # print("[INFO] SIMILARITY AGENT COMPLETE")
-        # # print(f"[SIMILARITY RESULT]:\n{similarity_results.output}\n")
-
+    phenopacket_paths = [path for path in all_files(phenopacket_dir) if path.name.endswith(".json")]
+
+    return await run_phenopackets(
+        phenopacket_paths,
+        Path(output_dir),
+        config or get_pipeline_config(),
+        journal_path=Path(tmp_dir) / "run_journal.jsonl",
+    )
+
+
+@cli.command(name="verify_bundle")
+@click.option('--bundle-dir', type=click.Path(exists=True, file_okay=False, path_type=Path), default=None,
+              help='Knowledge bundle to check (default: MONDO_BUNDLE_DIR)')
+def verify_bundle(bundle_dir: Path | None):
+    """Check every file of a knowledge bundle against the checksums in its manifest, e.g. after copying it"""
+    directory = bundle_dir or default_bundle_dir()
+    try:
+        check_bundle(directory, checksums=True)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+    print(f"[INFO] Knowledge bundle {directory} matches its manifest")
+
+
+cli.add_command(build_index, name="build_index")
+cli.add_command(build_hpo_closure, name="build_hpo_closure")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,365 @@
+"""
+Diagnostic pipeline shared by the PhEval runner and the CLI: Breakdown → Grounding → Similarity
+"""
+import asyncio
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from multi_agent_system.agents.breakdown.breakdown_agent import breakdown_agent, BREAKDOWN_SYSTEM_PROMPT
+from multi_agent_system.agents.grounding.grounding_agent import grounding_agent, GROUNDING_SYSTEM_PROMPT
+from multi_agent_system.agents.grounding.grounding_tools import (
+    get_grounding_config,
+    ground_and_retrieve_knowledge,
+    grounding_executor,
+    retrieve_catalogue_candidates,
+    GroundedDiseaseResult,
+)
+from multi_agent_system.agents.similarity_scoring.similarity_agent import similarity_agent, SIMILARITY_SYSTEM_PROMPT
+from multi_agent_system.agents.similarity_scoring.similarity_tools import (
+    compute_similarity_scores,
+    save_agent_results,
+    SimilarityScoreResult,
+)
+from multi_agent_system.pipeline_config import PipelineConfig
+from multi_agent_system.utils.agent_cache import CachedAgent
+from multi_agent_system.utils.batching_utils import count_tokens, pack_batches
+from multi_agent_system.utils.executors import run_in_executor
+from multi_agent_system.utils.rate_limiter import RateLimitedAgent, RateLimiter
+from multi_agent_system.utils.result_tables import (
+    AGENT_RESULT_SUFFIX,
+    COHORT_RESULT_NAME,
+    agent_result_path,
+    write_cohort_table,
+)
+from multi_agent_system.utils.run_journal import RunJournal
+from multi_agent_system.utils.utils import extract_hpo_ids_and_sex
+
+
+@dataclass
+class PipelineAgents:
+    """The agents a pipeline run calls, behind a shared rate limiter and optionally the record/replay cache."""
+    breakdown: Any
+    grounding: Any
+    similarity: Any
+    rate_limiter: Optional[RateLimiter] = None
+
+
+def build_agents(config: PipelineConfig) -> PipelineAgents:
+    """
+    Agents for a pipeline run.
+
+    Every agent goes through one RateLimiter; the agent cache (unless `agent_cache_mode` is "off")
+    sits in front of it, so replayed runs do not use up the budget.
+
+    Args:
+        config: Pipeline settings
+
+    Returns:
+        PipelineAgents
+    """
+    limiter = RateLimiter(
+        requests_per_minute=config.requests_per_minute,
+        tokens_per_minute=config.tokens_per_minute,
+        max_retries=config.rate_limit_max_retries,
+    )
+
+    def wrap(agent: Any, name: str, system_prompt: str) -> Any:
+        limited = RateLimitedAgent(agent, limiter, system_prompt)
+        if config.agent_cache_mode == "off":
+            return limited
+        return CachedAgent(limited, name, system_prompt, config.agent_cache_dir, config.agent_cache_mode)
+
+    if config.agent_cache_mode != "off":
+        print(f"[INFO] Agent cache: {config.agent_cache_mode} ({config.agent_cache_dir})")
+    return PipelineAgents(
+        breakdown=wrap(breakdown_agent, "breakdown", BREAKDOWN_SYSTEM_PROMPT),
+        grounding=wrap(grounding_agent, "grounding", GROUNDING_SYSTEM_PROMPT),
+        similarity=wrap(similarity_agent, "similarity", SIMILARITY_SYSTEM_PROMPT),
+        rate_limiter=limiter,
+    )
+
+
+async def gather_batches(batches: List[Any], run_batch: Callable[[Any], Awaitable[Any]], limit: int) -> List[Any]:
+    """
+    Run independent batches concurrently, with at most `limit` in flight.
+
+    Args:
+        batches: Batches to process
+        run_batch: Coroutine function processing one batch
+        limit: Maximum number of batches running at once
+
+    Returns:
+        The result of each batch, in the original batch order
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run_bounded(batch: Any) -> Any:
+        async with semaphore:
+            return await run_batch(batch)
+
+    return await asyncio.gather(*(run_bounded(batch) for batch in batches))
+
+
+async def run_grounding_agent(case_id: str, candidate_disease_labels: List[str], config: PipelineConfig,
+                              agents: PipelineAgents) -> List[GroundedDiseaseResult]:
+    """
+    Ground candidate disease labels with the grounding agent, in concurrent batches.
+
+    Args:
+        case_id: Phenopacket ID
+        candidate_disease_labels: Disease names from the breakdown agent
+        config: Pipeline settings
+        agents: Agents of this pipeline run
+
+    Returns:
+        Grounded diseases of all batches, in batch order
+    """
+    # Pack labels by their measured token cost, then process the batches concurrently
+    grounding_batches = pack_batches(
+        candidate_disease_labels,
+        max_tokens=3500,  # Leave room for response
+        per_item_overhead=80,  # Account for agent prompt overhead
+        max_items=5,
+    )
+
+    async def run_grounding_batch(batch: List[str]) -> list:
+        print(f"[{case_id}] Processing grounding batch with {len(batch)} items")
+        results = await agents.grounding.run(batch)
+        print(f"[{case_id}] Tokens used: {results.usage().total_tokens}")
+        return results.output
+
+    grounding_results = []
+    for batch_output in await gather_batches(grounding_batches, run_grounding_batch, config.max_concurrent_batches):
+        grounding_results.extend(batch_output)
+    return grounding_results
+
+
+async def run_similarity_agent(case_id: str, hpo_ids: List[str], candidate_diseases: List[dict],
+                               config: PipelineConfig, agents: PipelineAgents) -> List[SimilarityScoreResult]:
+    """
+    Score grounded candidate diseases with the similarity agent, in concurrent batches.
+
+    Args:
+        case_id: Phenopacket ID
+        hpo_ids: Patient HPO IDs
+        candidate_diseases: Grounded candidate diseases
+        config: Pipeline settings
+        agents: Agents of this pipeline run
+
+    Returns:
+        Similarity results of all batches, in candidate order
+    """
+    def similarity_prompt(batch: List[dict]) -> str:
+        return (
+            f"### PATIENT HPO TERMS ###\n"
+            f"{', '.join(hpo_ids)}\n\n"
+            f"### CANDIDATE DISEASES ###\n"
+            f"{json.dumps(batch, separators=(',', ':'), ensure_ascii=False)}\n\n"
+            f"### PHENOPACKET ID ###\n"
+            f"{case_id}"
+        )
+
+    # Every batch repeats the patient terms, so only the rest of the budget is left for candidates
+    similarity_batches = pack_batches(
+        candidate_diseases,
+        max_tokens=3500 - count_tokens(similarity_prompt([])),
+        per_item_overhead=100,  # Higher overhead due to phenotype data
+        max_items=5,
+    )
+
+    async def run_similarity_batch(batch: List[dict]) -> list:
+        print(f"[{case_id}] Processing similarity batch with {len(batch)} items")
+        results = await agents.similarity.run(similarity_prompt(batch))
+        return results.output.results
+
+    all_similarity_results = []
+    for batch_output in await gather_batches(similarity_batches, run_similarity_batch, config.max_concurrent_batches):
+        all_similarity_results.extend(batch_output)
+    return all_similarity_results
+
+
+def merge_grounded_results(*result_lists: List[GroundedDiseaseResult]) -> List[GroundedDiseaseResult]:
+    """
+    Merge grounded candidate diseases from several sources, keeping the first result for each MONDO ID.
+
+    Results that could not be grounded are kept as they are, so they still show up in the similarity step.
+
+    Args:
+        result_lists: Grounded candidates per source, in order of preference
+
+    Returns:
+        The merged results
+    """
+    merged, seen = [], set()
+    for results in result_lists:
+        for result in results:
+            if result.mondo_id is None:
+                merged.append(result)
+            elif result.mondo_id not in seen:
+                seen.add(result.mondo_id)
+                merged.append(result)
+    return merged
+
+
+async def process_phenopacket(phenopacket_path: Path, output_dir: Path, config: PipelineConfig,
+                              agents: PipelineAgents | None = None) -> Path:
+    """
+    Run the full pipeline for a single phenopacket and write its ranked diseases to a Parquet table.
+
+    Args:
+        phenopacket_path: Path to the phenopacket JSON file
+        output_dir: Directory the `<phenopacket>-agents.parquet` result is written to
+        config: Pipeline settings
+        agents: Agents to use (built from `config` if not given)
+
+    Returns:
+        Path to the written result
+    """
+    agents = agents or build_agents(config)
+    case_id = phenopacket_path.stem
+    print(f"\n[INFO] Processing: {phenopacket_path.name}")
+
+    hpo_ids, sex = extract_hpo_ids_and_sex(phenopacket_path)
+
+    llm_grounding_results: List[GroundedDiseaseResult] = []
+    if config.candidate_source != "catalogue":
+        # === BREAKDOWN AGENT ===
+        breakdown_input = f"""
+               Patient case: {case_id}
+               HPO terms: {hpo_ids}
+               Patient sex: {sex}
+               """
+        print(f"[INFO] [{case_id}] Passing to breakdown agent: {breakdown_input}")
+        breakdown_result = await agents.breakdown.run(breakdown_input)
+        print(f"[INFO] [{case_id}] BREAKDOWN AGENT COMPLETE\n[RESULT]: {breakdown_result}\n")
+
+        candidate_disease_labels = [
+            d.disease_name for d in breakdown_result.output.candidate_diseases
+        ]
+
+        if config.grounding_mode == "agent":
+            llm_grounding_results = await run_grounding_agent(case_id, candidate_disease_labels, config, agents)
+        else:
+            llm_grounding_results = await ground_and_retrieve_knowledge(candidate_disease_labels)
+        print(f"[{case_id}] [GROUNDING COMPLETE ({config.grounding_mode})]")
+
+    catalogue_results: List[GroundedDiseaseResult] = []
+    if config.candidate_source != "llm":
+        # === CATALOGUE RETRIEVAL === every annotated disease scored in one sparse product, already grounded
+        catalogue_results = await run_in_executor(grounding_executor("catalogue"), retrieve_catalogue_candidates,
+                                                  hpo_ids, config.catalogue_top_k)
+        print(f"[INFO] [{case_id}] Retrieved {len(catalogue_results)} candidates from the annotation catalogue")
+
+    grounding_results = merge_grounded_results(llm_grounding_results, catalogue_results)
+
+    print(f"[INFO] [{case_id}] Number of grounded diseases", len(grounding_results))
+
+    candidate_diseases = [
+        {
+            "disease_name": d.disease_name,
+            "mondo_id": d.mondo_id,
+            "phenotypes": list(d.phenotypes),
+            "cosine_score": d.cosine_score
+        }
+
+        for d in grounding_results
+    ]
+
+    if config.similarity_mode == "agent":
+        all_similarity_results = await run_similarity_agent(case_id, hpo_ids, candidate_diseases, config, agents)
+    else:
+        # the similarity agent only calls compute_similarity_scores, so call it directly
+        all_similarity_results = (await compute_similarity_scores(hpo_ids, candidate_diseases)).results
+
+    # rank by the configured similarity measure; results without one (e.g. from the agent) fall back to Jaccard
+    sorted_results = sorted(
+        all_similarity_results,
+        key=lambda x: x.jaccard_similarity_score if x.similarity_score is None else x.similarity_score,
+        reverse=True
+    )[:10]  # Top 10 diseases
+
+    print(f"[{case_id}] [SIMILARITY RESULT - TOP 10]:\n{sorted_results}\n")
+
+    print(f"[INFO] [{case_id}] SIMILARITY SCORING COMPLETE ({config.similarity_mode})")
+
+    # convert similarity agent output which is an object into a dictionary
+    await save_agent_results(
+        results=[
+            {
+                "disease_name": r.disease_name,
+                "mondo_id": r.mondo_id,
+                "score": r.jaccard_similarity_score if r.similarity_score is None else r.similarity_score
+            }
+            for r in sorted_results
+        ],
+        phenopacket_id=case_id,
+        output_dir=output_dir,
+    )
+    return agent_result_path(output_dir, case_id)
+
+
+async def run_pipeline(phenopacket_paths: List[Path], output_dir: Path, config: PipelineConfig,
+                       journal_path: Optional[Path] = None) -> Dict[str, Exception]:
+    """
+    Run the pipeline over a corpus, with up to `config.max_concurrent_cases` cases in flight at once.
+
+    Every case writes its own result table, so results do not depend on the order cases finish in.
+    With `config.cohort_table`, all results in `output_dir` are combined into cohort_results.parquet at the end.
+    A failing case is reported and skipped; it does not abort the other cases.
+
+    Args:
+        phenopacket_paths: Phenopacket JSON files to process
+        output_dir: Directory the per-case Parquet results are written to
+        config: Pipeline settings
+        journal_path: Run journal recording each case's state; with `config.resume`,
+            cases it records as completed are skipped
+
+    Returns:
+        Dictionary of failed phenopacket IDs to the exception that stopped them
+    """
+    journal = RunJournal(journal_path) if journal_path else None
+    if config.resume:
+        if journal is None:
+            raise ValueError("Resuming a run requires a run journal")
+        completed = [path for path in phenopacket_paths if journal.is_completed(path.stem)]
+        print(f"[INFO] Resuming: skipping {len(completed)} completed cases")
+        phenopacket_paths = [path for path in phenopacket_paths if path not in completed]
+
+    if config.knowledge_backend:
+        # the grounding tools read the backend from their process-wide settings
+        get_grounding_config().knowledge_backend = config.knowledge_backend
+
+    agents = build_agents(config)
+    semaphore = asyncio.Semaphore(config.max_concurrent_cases)
+    failures: Dict[str, Exception] = {}
+
+    async def run_case(phenopacket_path: Path) -> None:
+        async with semaphore:
+            case_id = phenopacket_path.stem
+            try:
+                if journal:
+                    journal.mark_started(case_id)
+                output_path = await process_phenopacket(phenopacket_path, output_dir, config, agents)
+                if journal:
+                    journal.mark_completed(case_id, output_path)
+            except Exception as e:
+                print(f"[ERROR] Case {case_id} failed: {e}")
+                failures[case_id] = e
+                if journal:
+                    journal.mark_failed(case_id, e)
+
+    print(f"[INFO] Running {len(phenopacket_paths)} cases, {config.max_concurrent_cases} at a time")
+    await asyncio.gather(*(run_case(path) for path in phenopacket_paths))
+
+    if agents.rate_limiter and agents.rate_limiter.rate_limited:
+        print(f"[INFO] Agent calls were rate limited {agents.rate_limiter.rate_limited} times")
+    if failures:
+        print(f"[WARNING] {len(failures)} of {len(phenopacket_paths)} cases failed: {sorted(failures)}")
+    if config.cohort_table:
+        # includes cases completed by an earlier run that this one resumed
+        cohort_path = Path(output_dir) / COHORT_RESULT_NAME
+        cases = write_cohort_table(sorted(Path(output_dir).glob(f"*{AGENT_RESULT_SUFFIX}")), cohort_path)
+        print(f"[INFO] Wrote {cases} cases to {cohort_path}")
+    return failures
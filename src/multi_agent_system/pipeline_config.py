@@ -0,0 +1,80 @@
+"""
+Configuration for the diagnostic pipeline
+"""
+
+from pathlib import Path
+from typing import Any, Literal, Optional
+
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class PipelineConfig(BaseSettings):
+    """Configuration settings for running the pipeline over a phenopacket corpus."""
+
+    # Number of phenopackets processed at the same time
+    max_concurrent_cases: int = Field(1, ge=1, description="Maximum number of cases in flight at once")
+
+    # Number of grounding / similarity batches of one case sent to the agents at the same time
+    max_concurrent_batches: int = Field(4, ge=1, description="Maximum number of batches in flight per case")
+
+    # "deterministic" grounds candidates with ground_and_retrieve_knowledge, "agent" goes through the grounding agent
+    grounding_mode: Literal["deterministic", "agent"] = Field(
+        "deterministic", description="How candidate diseases are mapped to MONDO IDs and phenotypes")
+
+    # "deterministic" scores candidates directly with compute_similarity_scores, "agent" goes through the similarity agent
+    similarity_mode: Literal["deterministic", "agent"] = Field(
+        "deterministic", description="How candidate diseases are scored against the patient phenotypes")
+
+    # Where candidate diseases come from: the breakdown agent, the local HPO annotation catalogue, or both merged.
+    # Catalogue candidates are already grounded, so "catalogue" with deterministic similarity runs without any LLM call.
+    candidate_source: Literal["llm", "llm+catalogue", "catalogue"] = Field(
+        "llm", description="llm | llm+catalogue | catalogue")
+
+    # Number of diseases retrieved from the catalogue per case
+    catalogue_top_k: int = Field(20, ge=1, description="Top-K diseases retrieved from the annotation catalogue")
+
+    # Where disease knowledge comes from: Monarch or the local phenotype.hpoa (None = KNOWLEDGE_BACKEND, default monarch)
+    knowledge_backend: Optional[Literal["monarch", "hpoa"]] = Field(
+        None, description="monarch | hpoa")
+
+    # Budgets of the rate limiter shared by all agent calls (None = no limit, 429 responses are still backed off)
+    requests_per_minute: Optional[int] = Field(None, ge=1, description="LLM requests per minute across all agents")
+    tokens_per_minute: Optional[int] = Field(None, ge=1, description="LLM tokens per minute across all agents")
+    rate_limit_max_retries: int = Field(5, ge=0, description="Retries of an agent call after 429 responses")
+
+    # Record/replay cache around the breakdown, grounding and similarity agent runs
+    agent_cache_mode: Literal["off", "read_through", "record", "replay"] = Field(
+        "off", description="off | read_through | record | replay (a cache miss is an error)")
+    agent_cache_dir: Path = Field(Path(".agent_cache"), description="Directory recorded agent runs are stored in")
+
+    # Also combine every case's result into one cohort_results.parquet (with a phenopacket_id column)
+    cohort_table: bool = Field(False, description="Write a cohort-level Parquet table of all cases")
+
+    # Processes converting agent results into PhEval results (None = one per CPU, 1 = serial)
+    post_process_workers: Optional[int] = Field(None, ge=1, description="Post-processing worker processes")
+
+    # Skip cases the run journal records as completed with an unchanged output
+    resume: bool = Field(False, description="Resume an interrupted run from its journal")
+
+    model_config = SettingsConfigDict(
+        env_prefix="",
+        populate_by_name=True,
+        extra="ignore",
+    )
+
+
+def get_config(options: Optional[dict[str, Any]] = None, **overrides: Any) -> PipelineConfig:
+    """
+    Returns the pipeline settings.
+
+    Args:
+        options: config.yaml `tool_specific_configuration_options` (may be None)
+        overrides: values set explicitly, e.g. from CLI flags; None values are ignored
+
+    Returns:
+        PipelineConfig
+    """
+    values = dict(options or {})
+    values.update({key: value for key, value in overrides.items() if value is not None})
+    return PipelineConfig(**values)
@@ -1,73 +1,155 @@
-# Post process to generate parquet files for Pheval runner (tsv --> parquet)
+# Post process to generate PhEval disease results from the per-case agent results (-agents.parquet)
 
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from pheval.post_processing.post_processing import generate_disease_result, SortOrder
+from typing import Dict, Optional
+
+from pheval.post_processing import post_processing
+from pheval.post_processing.post_processing import (
+    create_empty_pheval_result,
+    generate_disease_result,
+    ResultType,
+    SortOrder,
+)
 import polars as pl
 from pheval.utils.file_utils import all_files
 
+from multi_agent_system.utils.result_tables import (
+    LEGACY_AGENT_RESULT_SUFFIX,
+    AGENT_RESULT_SUFFIX,
+    is_agent_result,
+    scan_agent_result,
+)
 
-def tsv_to_polars(agent_result_path: Path) -> pl.DataFrame:
-    """ Convert agent results in tsv format to polar format and extract score and disease identifier
+EMPTY_RESULT_SCHEMA = {
+    "score": pl.Float64,
+    "disease_identifier": pl.Utf8,
+}
+
+
+def read_agent_result(agent_result_path: Path) -> pl.DataFrame:
+    """ Read the score and disease identifier of an agent result (Parquet, or TSV from earlier versions)
+
+    Only these two columns are read from the file.
 
     Args:
         agent_result_path (Path): Path to the agent results file
 
     Returns:
-        Polar DataFrame with score and disease identifier
+        Polars DataFrame with score (Float64) and disease identifier (String); empty if the file cannot be read
 
     """
     try:
-        # Read TSV file into a Polars DataFrame
-        df = pl.read_csv(agent_result_path, separator="\t")
+        return scan_agent_result(agent_result_path).collect()
+    except Exception as e:
+        print(f"[ERROR] Could not read agent result {agent_result_path.name}: {e}")
+        return pl.DataFrame(schema=EMPTY_RESULT_SCHEMA)
 
-        # Check if required columns exist
-        required_columns = {"score", "disease_identifier"}
-        if not required_columns.issubset(set(df.columns)):
-            raise ValueError(f"Missing one or more required columns: {required_columns}")
 
-        # Select only the required columns
-        return pl.DataFrame(schema={
-            "score": pl.Float64,
-            "disease_identifier": pl.Utf8,
+def tsv_to_polars(agent_result_path: Path) -> pl.DataFrame:
+    """ Convert agent results in tsv format to polar format and extract score and disease identifier
 
-        })
+    Args:
+        agent_result_path (Path): Path to the agent results file
+
+    Returns:
+        Polar DataFrame with score and disease identifier
 
-    except Exception as e:
-        # Return an error message inside a DataFrame
-        return pl.DataFrame(
-            {
-                "score": [],
-                "disease_identifier":[],
-            },
-            schema={
-                "score":pl.Float64,
-                "disease_identifier":pl.Utf8,
-            }
-        )
-
-
-def post_process_format(raw_results_dir = Path, output_dir = Path, phenopacket_dir = Path) -> None:
     """
-    Generate pheval results in parquet format from agent results in tsv format
+    return read_agent_result(agent_result_path)
 
-    Args:
-        raw_results_dir (Path): Path to the raw results directory
-        output_dir (Path): Path to the output directory
-        phenopacket_dir (Path): Path to the phenopacket directory
 
+def _phenopacket_id(result: Path) -> str:
+    """ Phenopacket ID of a per-case agent result, e.g. PMID_1 for PMID_1-agents.parquet """
+    suffix = AGENT_RESULT_SUFFIX if result.name.endswith(AGENT_RESULT_SUFFIX) else LEGACY_AGENT_RESULT_SUFFIX
+    return result.name[:-len(suffix)]
+
+
+def _skip_empty_results() -> None:
+    """ Worker initializer: the parent already wrote PhEval's empty (false negative) results
+
+    generate_disease_result writes them on its first call in a process, which would overwrite
+    results other workers have already finished.
     """
+    post_processing.executed_results.add(ResultType.DISEASE)
 
-    for result in all_files(raw_results_dir):
-        pheval_agent_result = tsv_to_polars(result)
-        generate_disease_result(
-            results=pheval_agent_result,
-            sort_order=SortOrder.DESCENDING,
-            output_dir=output_dir,
-            result_path=Path(str(result).replace("-agents", "")),
-            phenopacket_dir=phenopacket_dir,
 
-        )
+def _post_process_result(result: Path, output_dir: Path, phenopacket_dir: Path) -> None:
+    """ Rank, classify and write the PhEval disease result of one case """
+    generate_disease_result(
+        results=scan_agent_result(result).collect(),
+        sort_order=SortOrder.DESCENDING,
+        output_dir=output_dir,
+        # PhEval names its output after the stem, i.e. the phenopacket ID
+        result_path=result.with_name(f"{_phenopacket_id(result)}.parquet"),
+        phenopacket_dir=phenopacket_dir,
+    )
 
 
+def post_process_format(raw_results_dir = Path, output_dir = Path, phenopacket_dir = Path,
+                        workers: Optional[int] = None) -> Dict[str, Exception]:
+    """
+    Generate pheval results in parquet format from the per-case agent results
 
+    Every case is written by one call of its own, so the output is the same whether the cases
+    run serially or in a process pool. A case that fails is reported and keeps the empty
+    (false negative) result PhEval writes for every phenopacket.
 
+    Args:
+        raw_results_dir (Path): Path to the raw results directory
+        output_dir (Path): Path to the output directory
+        phenopacket_dir (Path): Path to the phenopacket directory
+        workers (int): Number of worker processes (default: one per CPU; 1 runs serially)
+
+    Returns:
+        Dictionary of failed result file names to the exception that stopped them
+    """
+    output_dir = Path(output_dir)
+    phenopacket_dir = Path(phenopacket_dir)
+    failures: Dict[str, Exception] = {}
+
+    # phenopackets are read once, here: for the ID lookup and PhEval's empty results
+    phenopacket_ids = {path.stem for path in all_files(phenopacket_dir) if path.suffix == ".json"}
+    disease_results_dir = output_dir.joinpath("pheval_disease_results")
+    disease_results_dir.mkdir(parents=True, exist_ok=True)
+    create_empty_pheval_result(phenopacket_dir, disease_results_dir, ResultType.DISEASE)
+
+    results = []
+    # skip anything that is not a finished result, e.g. a temporary file left by an interrupted write
+    # or the cohort table
+    for result in sorted(all_files(raw_results_dir)):
+        if not is_agent_result(result):
+            continue
+        phenopacket_id = _phenopacket_id(result)
+        if phenopacket_id not in phenopacket_ids:
+            failures[result.name] = FileNotFoundError(f"No phenopacket {phenopacket_id}.json in {phenopacket_dir}")
+            continue
+        results.append(result)
+
+    workers = min(workers or os.cpu_count() or 1, len(results))
+    print(f"[INFO] Post-processing {len(results)} agent results with {max(workers, 1)} worker(s)")
+    if workers <= 1:
+        for result in results:
+            try:
+                _post_process_result(result, output_dir, phenopacket_dir)
+            except Exception as e:
+                failures[result.name] = e
+    else:
+        # spawn: forking a process with Polars' thread pool running can deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_skip_empty_results) as executor:
+            futures = {executor.submit(_post_process_result, result, output_dir, phenopacket_dir): result
+                       for result in results}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failures[futures[future].name] = e
+
+    for name in sorted(failures):
+        print(f"[ERROR] Post-processing failed for {name}: {failures[name]}")
+    if failures:
+        print(f"[WARNING] {len(failures)} agent results could not be post-processed: {sorted(failures)}")
+    return failures
@@ -1,20 +1,18 @@
 """Runner."""
 # pheval run -i . -t phenopackets -r agentphevalrunner -o results
 from dataclasses import dataclass
+from pheval.config_parser import InputDirConfig
 from pheval.runners.runner import PhEvalRunner
+from serde.yaml import from_yaml
 import asyncio
-import json
 from pathlib import Path
 from dotenv import load_dotenv # api key
 load_dotenv()
-from pheval.utils.file_utils import all_files
-from multi_agent_system.agents.breakdown.breakdown_agent import breakdown_agent
-from multi_agent_system.agents.grounding.grounding_agent import grounding_agent
-from multi_agent_system.agents.similarity_scoring.similarity_agent import similarity_agent
-from multi_agent_system.agents.similarity_scoring.similarity_tools import save_agent_results
+from multi_agent_system.pipeline import run_pipeline
+from multi_agent_system.pipeline_config import get_config as get_pipeline_config, PipelineConfig
 from multi_agent_system.post_process.post_process import post_process_format
-from multi_agent_system.utils.batching_utils import calculate_batch_size
-from multi_agent_system.utils.utils import extract_hpo_ids_and_sex
+from multi_agent_system.utils.grounding_utils import warm_up_embedding_model
+from multi_agent_system.utils.knowledge_bundle import bundle_dir, check_bundle
 
 
 @dataclass
@@ -28,9 +26,20 @@ class AgentPhEvalRunner(PhEvalRunner):
     config_file: Path
     version: str
 
+    def __post_init__(self):
+        super().__post_init__()
+        # pheval run -c: settings from another file laid out like config.yaml, e.g. config.catalogue.yaml
+        if self.config_file:
+            with open(self.config_file, "r", encoding="utf-8") as f:
+                self.input_dir_config = from_yaml(InputDirConfig, f.read())
+
     def prepare(self):
         """Prepare."""
         print("preparing")
+        # fail before any case runs if the knowledge bundle is incomplete or stale (sizes only, see verify_bundle)
+        check_bundle(bundle_dir())
+        # load the embedding model up front rather than on the first grounding fallback
+        warm_up_embedding_model()
 
 
     def run(self):
@@ -40,6 +49,10 @@ class AgentPhEvalRunner(PhEvalRunner):
 
 
 
+    def _pipeline_config(self) -> PipelineConfig:
+        """Pipeline settings from config.yaml tool_specific_configuration_options"""
+        return get_pipeline_config(self.input_dir_config.tool_specific_configuration_options)
+
     async def _run_pipeline_async(self):
         """Full pipeline: Breakdown → Grounding → Similarity for all phenopackets"""
         print("[DEBUG] Entered _run_pipeline_async")
@@ -48,110 +61,12 @@ class AgentPhEvalRunner(PhEvalRunner):
         print(f"[DEBUG] Looking for files in: {phenopacket_dir}")
         print(f"[DEBUG] Directory exists: {phenopacket_dir.exists()}")
 
-        for phenopacket_path in phenopacket_dir.glob("*.json"):
-            print(f"\n[INFO] Processing: {phenopacket_path.name}")
-
-            hpo_ids, sex = extract_hpo_ids_and_sex(phenopacket_path)
-
-            # === BREAKDOWN AGENT ===
-            breakdown_input = f"""
-                   Patient case: {phenopacket_path.stem}
-                   HPO terms: {hpo_ids}
-                   Patient sex: {sex}
-                   """
-            print(f"[INFO] Passing to breakdown agent: {breakdown_input}")
-            breakdown_result = await breakdown_agent.run(breakdown_input)
-            #print("Tokens used (if available):", breakdown_result.usage())
-            await asyncio.sleep(0.5)
-            print(f"[INFO] BREAKDOWN AGENT COMPLETE\n[RESULT]: {breakdown_result}\n")
-
-            candidate_disease_labels = [
-                d.disease_name for d in breakdown_result.output.candidate_diseases
-            ]
-
-            grounding_batch_size = min(5, calculate_batch_size(
-                candidate_disease_labels,
-                max_tokens=3500,  # Leave room for response
-                per_item_overhead=80  # Account for agent prompt overhead
-            ))
-            #print(f"Grounding batch size: {grounding_batch_size}, Total items: {len(candidate_disease_labels)}")
-
-            # Process in dynamically sized batches
-            grounding_results = []
-            for i in range(0, len(candidate_disease_labels), grounding_batch_size):
-                batch = candidate_disease_labels[i:i + grounding_batch_size]
-                print(f"Processing grounding batch {i // grounding_batch_size + 1} with {len(batch)} items")
-                results = await grounding_agent.run(batch)
-                print(f"Tokens used: {results.usage().total_tokens}")
-                grounding_results.extend(results.output)
-
-            print("[INFO] Number of grounded diseases", len(grounding_results))
-            print("[GROUNDING AGENT COMPLETE]")
-
-            candidate_diseases = [
-                {
-                    "disease_name": d.disease_name,
-                    "mondo_id": d.mondo_id,
-                    "phenotypes": list(d.phenotypes),
-                    "cosine_score": d.cosine_score
-                }
-
-                for d in grounding_results
-            ]
-
-            similarity_batch_size = min(5, calculate_batch_size(
-                candidate_diseases,
-                max_tokens=3500,
-                per_item_overhead=100  # Higher overhead due to phenotype data_2
-            ))
-            #print(f"Similarity batch size: {similarity_batch_size}, Total items: {len(candidate_diseases)}")
-
-            # Process in batches
-            all_similarity_results = []
-            for i in range(0, len(candidate_diseases), similarity_batch_size):
-                batch = candidate_diseases[i:i + similarity_batch_size]
-                print(f"Processing similarity batch {i // similarity_batch_size + 1} with {len(batch)} items")
-
-                similarity_input = (
-                    f"### PATIENT HPO TERMS ###\n"
-                    f"{', '.join(hpo_ids)}\n\n"
-                    f"### CANDIDATE DISEASES ###\n"
-                    f"{json.dumps(batch, separators=(',', ':'), ensure_ascii=False)}\n\n"
-                    f"### PHENOPACKET ID ###\n"
-                    f"{phenopacket_path.stem}"
-                )
-
-                print("[DEBUG] Prompt length (chars):", len(similarity_input))
-                # print("[DEBUG] Estimated tokens:", len(similarity_input) // 4)
-
-                results = await similarity_agent.run(similarity_input)
-                all_similarity_results.extend(results.output.results)
-                # print(f"Tokens used: {results.usage().total_tokens}")
-                await asyncio.sleep(0.5)
-
-            sorted_results = sorted(
-                all_similarity_results,
-                key=lambda x: x.jaccard_similarity_score,
-                reverse=True
-            )[:10]  # Top 10 diseases
-
-            print(f"[SIMILARITY RESULT - TOP 10]:\n{sorted_results}\n")
-
-            print("[INFO] SIMILARITY AGENT COMPLETE")
-
-            # convert similarity agent output which is an object into a dictionary
-            await save_agent_results(
-                results=[
-                    {
-                        "disease_name": r.disease_name,
-                        "mondo_id": r.mondo_id,
-                        "score": r.jaccard_similarity_score
-                    }
-                    for r in sorted_results
-                ],
-                phenopacket_id=phenopacket_path.stem
-            )
-
+        await run_pipeline(
+            phenopacket_paths=sorted(phenopacket_dir.glob("*.json")),
+            output_dir=self.raw_results_dir,
+            config=self._pipeline_config(),
+            journal_path=Path(self.tmp_dir) / "run_journal.jsonl",
+        )
 
         print("PhEval Run step COMPLETE!")
 
@@ -162,6 +77,6 @@ class AgentPhEvalRunner(PhEvalRunner):
         post_process_format(
             raw_results_dir=self.raw_results_dir,
             output_dir=self.output_dir,
-            phenopacket_dir=self.testdata_dir
-
+            phenopacket_dir=self.testdata_dir,
+            workers=self._pipeline_config().post_process_workers,
         )
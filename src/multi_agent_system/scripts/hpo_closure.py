@@ -0,0 +1,69 @@
+# Precomputes the HPO ancestor closures and information content used by the
+# ontology-aware similarity measures (SimilarityAgentConfig.similarity_measure)
+#must be updated to reflect HPO and phenotype.hpoa releases
+#
+# poetry run agents build_hpo_closure --hpoa-path phenotype.hpoa
+
+from pathlib import Path
+from typing import Dict, List
+
+import click
+
+from multi_agent_system.utils.grounding_utils import BASE_DIR
+from multi_agent_system.utils.hpo_annotations import HpoAnnotationIndex
+from multi_agent_system.utils.knowledge_bundle import update_manifest
+from multi_agent_system.utils.semantic_similarity import HpoSemanticSimilarity
+
+HPO_PREFIX = "HP:"
+
+
+def read_hpo_parents(adapter) -> Dict[str, List[str]]:
+    """ Direct is_a parents of every HPO term, read in one pass over the ontology's edges
+
+    Args:
+        adapter: HPO ontology adapter
+
+    Returns:
+        Dictionary of HPO ID to its is_a parents
+    """
+    from oaklib.datamodels.vocabulary import IS_A
+
+    parents: Dict[str, List[str]] = {}
+    for subject, _, parent in adapter.relationships(predicates=[IS_A]):
+        if subject.startswith(HPO_PREFIX) and parent.startswith(HPO_PREFIX):
+            parents.setdefault(subject, []).append(parent)
+    return parents
+
+
+@click.command()
+@click.option("--hpoa-path", type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              default=BASE_DIR / "phenotype.hpoa", show_default=True,
+              help="HPO annotations the information content is computed from")
+@click.option("--output-dir", type=click.Path(file_okay=False, path_type=Path), default=BASE_DIR,
+              show_default=True, help="Knowledge bundle directory hpo_closure.npz is written to")
+def main(hpoa_path: Path, output_dir: Path):
+    """Build the HPO ancestor closures and information content for semantic similarity."""
+    from oaklib import get_adapter
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # load hpo db
+    adapter = get_adapter("sqlite:obo:hp")
+    parents = read_hpo_parents(adapter)
+    print(f"[INFO] Read is_a parents of {len(parents)} HPO terms")
+
+    annotations = HpoAnnotationIndex.from_hpoa(hpoa_path)
+    similarity = HpoSemanticSimilarity.build(
+        parents,
+        (annotations.phenotypes(disease_id) for disease_id in annotations.disease_ids),
+    )
+
+    output_path = output_dir / "hpo_closure.npz"
+    similarity.save(output_path)
+    update_manifest(output_dir, [output_path])
+    print(f"[INFO] Wrote closures and information content of {len(similarity)} HPO terms "
+          f"over {len(annotations)} diseases to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,71 +4,497 @@
 # Search FAISS index
 # Return best match
 # This file creates the mondo index, label
-#must be updated to reflect mondo database updates
+#must be updated to reflect mondo database updates; re-running after a MONDO release only
+#re-embeds labels that were added or changed (see EmbeddingStore)
+#
+# poetry run agents build_index --index-type hnsw --hnsw-m 32 --ef-search 128
+# poetry run agents build_index --encoding pq --pq-m 64 --dim 256 --report-all --workers 4
 
-from oaklib import get_adapter
-from oaklib.interfaces import BasicOntologyInterface
+import hashlib
+import json
+import os
+import shutil
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+import click
 import faiss
-import json
 import numpy as np
 
-# define output directory for index files
-output_dir = Path("../utils/data_2")
-output_dir.mkdir(parents=True, exist_ok=True)
+from multi_agent_system.utils.grounding_utils import (
+    BASE_DIR,
+    EMBEDDING_MODEL_NAME,
+    INDEX_META_PATH,
+    normalize_label,
+)
+from multi_agent_system.utils.knowledge_bundle import MODEL_DIR_NAME, MONDO_DB_NAME, write_manifest, write_string_table
+from multi_agent_system.utils.knowledge_cache import resolve_mondo_version
+
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+# how vectors are stored: float32, scalar-quantised to float16 / 8-bit, or product-quantised
+ENCODINGS = ("flat", "fp16", "int8", "pq")
+
+
+def collect_mondo_labels(adapter) -> Tuple[List[str], List[str], dict]:
+    """ Collect MONDO primary labels and synonyms
+
+    Args:
+        adapter: MONDO ontology adapter
+
+    Returns:
+        Tuple of (labels, ids, label_index) where label_index maps normalised labels to MONDO IDs
+    """
+    #retrieve MONDO entity IDs in MONDO ontology database
+    entities = list(adapter.entities())
+
+    # Filter and retrieve MONDO disease labels
+    mondo_labels = [] #i.e mondo terms
+    mondo_ids = []
+    synonym_labels = []
+    synonym_ids = []
+
+    for entity in entities:
+        #get primary label
+        primary_label = adapter.label(entity)
+        if primary_label:
+            mondo_labels.append(primary_label)
+            mondo_ids.append(entity)
+
+        # get synoymns (for every entity, not only the last one)
+        for syn in adapter.entity_aliases(entity) or []:
+            if syn != primary_label:
+                synonym_labels.append(syn)
+                synonym_ids.append(entity)
+
+    # Normalised label -> MONDO ID for O(1) exact lookups; primary labels win over synonyms
+    label_index = {}
+    for label, mondo_id in zip(mondo_labels + synonym_labels, mondo_ids + synonym_ids):
+        key = normalize_label(label)
+        if key and isinstance(mondo_id, str) and mondo_id.startswith("MONDO:"):
+            label_index.setdefault(key, mondo_id)
+
+    return mondo_labels + synonym_labels, mondo_ids + synonym_ids, label_index
+
+
+def normalise(embeddings: np.ndarray, dim: int | None = None) -> np.ndarray:
+    """ Truncate to `dim` (Matryoshka), normalise each vector and convert to float32 - a requirement for FAISS """
+    if dim is not None:
+        embeddings = embeddings[:, :dim]
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings.astype("float32")
+
+
+def index_factory_string(index_type: str, encoding: str = "flat", hnsw_m: int = 32, nlist: int = 1024,
+                         pq_m: int = 64) -> str:
+    """ FAISS index_factory description for an index type and vector encoding
+
+    Args:
+        index_type (str): flat (exact), hnsw (graph) or ivf (inverted lists)
+        encoding (str): flat (float32), fp16, int8 or pq (product quantization)
+        hnsw_m (int): HNSW neighbours per node
+        nlist (int): number of IVF clusters
+        pq_m (int): number of PQ sub-quantizers (bytes per vector); must divide the dimension
+
+    Returns:
+        The index_factory string
+    """
+    codes = {"flat": "Flat", "fp16": "SQfp16", "int8": "SQ8", "pq": f"PQ{pq_m}"}
+    if encoding not in codes:
+        raise ValueError(f"Unknown encoding '{encoding}', expected one of {ENCODINGS}")
+    if index_type == "flat":
+        return codes[encoding]
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m},{codes[encoding]}"
+    if index_type == "ivf":
+        return f"IVF{nlist},{codes[encoding]}"
+    raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+
+def search_parameters(index_type: str, ef_search: int = 128, nprobe: int = 16) -> dict:
+    """ Query-time parameters for an index type; these are not stored in the index file """
+    if index_type == "hnsw":
+        return {"efSearch": ef_search}
+    if index_type == "ivf":
+        return {"nprobe": nprobe}
+    return {}
+
+
+def label_key(label: str, model_name: str = EMBEDDING_MODEL_NAME) -> str:
+    """ Content hash of a label's embedding: the label text and the model that embeds it """
+    return hashlib.sha256(f"{model_name}\0{label}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """ On-disk checkpoint of label embeddings, keyed by label hash
+
+    Embeddings are stored as they come out of the model (before truncation and normalisation) in
+    numbered chunks: chunk-NNNNN.npy holds the vectors and chunk-NNNNN.keys.npy their label hashes.
+    The keys file is written last, so a chunk interrupted half-way is simply ignored. Vectors are
+    memory-mapped, never loaded as a whole.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._rows: Dict[str, Tuple[int, int]] = {}
+        self._chunks: Dict[int, np.ndarray] = {}
+        for keys_path in sorted(self.directory.glob("chunk-*.keys.npy")):
+            chunk_id = int(keys_path.name.split(".")[0].removeprefix("chunk-"))
+            vectors_path = self._vectors_path(chunk_id)
+            if not vectors_path.exists():
+                continue
+            self._chunks[chunk_id] = np.load(vectors_path, mmap_mode="r")
+            for row, key in enumerate(np.load(keys_path)):
+                self._rows[key.decode("ascii")] = (chunk_id, row)
+
+    def _vectors_path(self, chunk_id: int) -> Path:
+        return self.directory / f"chunk-{chunk_id:05d}.npy"
+
+    def _keys_path(self, chunk_id: int) -> Path:
+        return self.directory / f"chunk-{chunk_id:05d}.keys.npy"
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add_chunk(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        """ Persist one chunk of embeddings """
+        chunk_id = max(self._chunks, default=-1) + 1
+        for path, array in ((self._vectors_path(chunk_id), np.asarray(vectors, dtype="float32")),
+                            (self._keys_path(chunk_id), np.array(keys, dtype="S64"))):
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        self._chunks[chunk_id] = np.load(self._vectors_path(chunk_id), mmap_mode="r")
+        for row, key in enumerate(keys):
+            self._rows[key] = (chunk_id, row)
+
+    def vectors(self, keys: Sequence[str]) -> np.ndarray:
+        """ Stored embeddings for `keys`, in order """
+        return np.stack([self._chunks[chunk_id][row] for chunk_id, row in (self._rows[key] for key in keys)])
+
+    def prune(self, keep: set) -> int:
+        """ Delete chunks none of whose labels are in `keep` (e.g. after a MONDO release); returns the number deleted """
+        used = {self._rows[key][0] for key in keep if key in self._rows}
+        unused = [chunk_id for chunk_id in self._chunks if chunk_id not in used]
+        for chunk_id in unused:
+            del self._chunks[chunk_id]
+            self._keys_path(chunk_id).unlink()
+            self._vectors_path(chunk_id).unlink()
+        self._rows = {key: location for key, location in self._rows.items() if location[0] not in unused}
+        return len(unused)
+
+
+def embed_labels(labels: Sequence[str], store: EmbeddingStore, encode: Callable[[List[str]], np.ndarray],
+                 chunk_size: int = 4096) -> List[str]:
+    """ Embed the labels that are not in the store yet, one checkpointed chunk at a time
+
+    Args:
+        labels (Sequence[str]): labels to embed
+        store (EmbeddingStore): checkpoint of previously embedded labels
+        encode (Callable): embeds a list of labels
+        chunk_size (int): labels per model call and per checkpoint
+
+    Returns:
+        The label hash of every label, in input order
+    """
+    keys = [label_key(label) for label in labels]
+    missing = {}
+    for key, label in zip(keys, labels):
+        if key not in store and key not in missing:
+            missing[key] = label
+    print(f"[INFO] {len(set(keys)) - len(missing)} labels already embedded, {len(missing)} to embed")
+
+    missing_keys = list(missing)
+    for start in range(0, len(missing_keys), chunk_size):
+        chunk_keys = missing_keys[start:start + chunk_size]
+        store.add_chunk(chunk_keys, encode([missing[key] for key in chunk_keys]))
+        print(f"[INFO] Embedded {min(start + chunk_size, len(missing_keys))}/{len(missing_keys)} labels")
+    return keys
+
+
+def iter_embeddings(store: EmbeddingStore, keys: Sequence[str], dim: int | None = None,
+                    chunk_size: int = 4096) -> Iterator[np.ndarray]:
+    """ Yield normalised (and truncated) embeddings for `keys` in chunks """
+    for start in range(0, len(keys), chunk_size):
+        yield normalise(store.vectors(keys[start:start + chunk_size]), dim)
+
+
+def assemble_embeddings(store: EmbeddingStore, keys: Sequence[str], path: Path, dim: int | None = None,
+                        chunk_size: int = 4096) -> np.ndarray:
+    """ Write the normalised embeddings for `keys` to a memory-mapped .npy file, chunk by chunk """
+    width = dim or store.vectors(keys[:1]).shape[1]
+    embeddings = np.lib.format.open_memmap(path, mode="w+", dtype="float32", shape=(len(keys), width))
+    for start, chunk in zip(range(0, len(keys), chunk_size), iter_embeddings(store, keys, dim, chunk_size)):
+        embeddings[start:start + len(chunk)] = chunk
+    embeddings.flush()
+    return embeddings
+
+
+def build_index(embeddings: np.ndarray, factory: str, ef_construction: int = 200, train_size: int = 100_000,
+                chunk_size: int = 4096) -> faiss.Index:
+    """ Build and fill a (cosine similarity / inner product) FAISS index
+
+    Args:
+        embeddings (np.ndarray): normalised float32 embeddings, possibly memory-mapped
+        factory (str): index_factory string
+        ef_construction (int): HNSW build-time search depth
+        train_size (int): maximum number of vectors IVF / quantizer training is run on
+        chunk_size (int): vectors added per call
+
+    Returns:
+        The filled index
+    """
+    index = faiss.index_factory(embeddings.shape[1], factory, faiss.METRIC_INNER_PRODUCT)
+    hnsw = getattr(index, "hnsw", None)
+    if hnsw is not None:
+        hnsw.efConstruction = ef_construction
+    if not index.is_trained:
+        rows = np.arange(len(embeddings))
+        if len(rows) > train_size:
+            rows = np.sort(np.random.default_rng(0).choice(rows, size=train_size, replace=False))
+        index.train(np.ascontiguousarray(embeddings[rows]))
+    for start in range(0, len(embeddings), chunk_size):
+        index.add(np.ascontiguousarray(embeddings[start:start + chunk_size]))
+    return index
+
+
+def exact_top1(chunks: Iterator[np.ndarray], queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Exact inner-product nearest neighbour of each query and its score, computed chunk by chunk """
+    best_scores = np.full(len(queries), -np.inf, dtype="float32")
+    best_rows = np.full(len(queries), -1, dtype="int64")
+    offset = 0
+    for chunk in chunks:
+        scores = queries @ chunk.T
+        rows = scores.argmax(axis=1)
+        chunk_best = scores[np.arange(len(queries)), rows]
+        better = chunk_best > best_scores
+        best_scores[better] = chunk_best[better]
+        best_rows[better] = rows[better] + offset
+        offset += len(chunk)
+    return best_rows, best_scores
+
+
+def recall_at_1(hits: np.ndarray, exact_scores: np.ndarray, row_scores: Callable[[np.ndarray], np.ndarray]) -> float:
+    """ Fraction of queries whose top hit is an exact nearest neighbour
+
+    Hits are compared by their exact score rather than their row, so a duplicate label
+    (the same vector in another row) still counts as a hit.
+
+    Args:
+        hits (np.ndarray): row of each query's top hit (-1 if the index returned none)
+        exact_scores (np.ndarray): score of each query's exact nearest neighbour
+        row_scores (Callable): exact score of each query against the given row
+
+    Returns:
+        recall@1
+    """
+    scores = np.where(hits >= 0, row_scores(np.maximum(hits, 0)), -np.inf)
+    return float(np.mean(scores >= exact_scores - 1e-5))
+
+
+def index_size(index: faiss.Index) -> int:
+    """ Serialized (and therefore resident, once memory-mapped) size of an index in bytes """
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def write_index(index: faiss.Index, path: Path) -> None:
+    """ Write a FAISS index atomically: running processes memory-map the old file, so it must not be truncated """
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    faiss.write_index(index, str(tmp_path))
+    os.replace(tmp_path, path)
+
+
+def write_json(data, path: Path) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def report(name: str, index: faiss.Index, queries: np.ndarray | None,
+           recall_of: Callable[[np.ndarray], float] | None) -> float:
+    """ Print the size of an index and its recall@1 against exact search (`recall_of` the top hits) """
+    recall = float("nan")
+    if recall_of is not None:
+        _, hits = index.search(queries, 1)
+        recall = recall_of(hits[:, 0])
+    print(f"[INFO] {name:<24} {index_size(index) / 2**20:9.1f} MiB  recall@1 {recall:.4f}")
+    return recall
+
+
+def make_encoder(model, workers: int) -> Tuple[Callable[[List[str]], np.ndarray], Callable[[], None]]:
+    """ Label encoder using one process, or a pool of `workers` processes
+
+    Returns:
+        Tuple of (encode, close)
+    """
+    if workers <= 1:
+        return (lambda labels: model.encode(labels, show_progress_bar=False)), (lambda: None)
+
+    pool = model.start_multi_process_pool(["cpu"] * workers)
+    return (lambda labels: model.encode_multi_process(labels, pool)), (lambda: model.stop_multi_process_pool(pool))
+
+
+@click.command()
+@click.option("--output-dir", type=click.Path(file_okay=False, path_type=Path), default=BASE_DIR,
+              show_default=True, help="Knowledge bundle directory the index files are written to (MONDO_BUNDLE_DIR)")
+@click.option("--mondo-version", type=str, default=None,
+              help="MONDO release recorded in the bundle manifest [default: MONDO_VERSION or the PhEval MONDO timestamp]")
+@click.option("--include-mondo-db", is_flag=True, default=False,
+              help="Copy the MONDO SQLite database into the bundle, so workers do not download it")
+@click.option("--include-model", is_flag=True, default=False,
+              help="Save the embedding model into the bundle, so workers do not download it")
+@click.option("--checkpoint-dir", type=click.Path(file_okay=False, path_type=Path), default=None,
+              help="Directory label embeddings are checkpointed in [default: OUTPUT_DIR/embedding_cache]")
+@click.option("--chunk-size", type=click.IntRange(min=1), default=4096, show_default=True,
+              help="Labels embedded (and checkpointed) per chunk")
+@click.option("--workers", type=click.IntRange(min=1), default=1, show_default=True,
+              help="Embedding worker processes")
+@click.option("--index-type", type=click.Choice(INDEX_TYPES), default="flat", show_default=True,
+              help="flat (exact search), hnsw or ivf (approximate search)")
+@click.option("--encoding", type=click.Choice(ENCODINGS), default="flat", show_default=True,
+              help="Vector storage: flat (float32), fp16 / int8 (scalar quantization) or pq (product quantization)")
+@click.option("--dim", type=int, default=None,
+              help="Truncate embeddings to this dimension (Matryoshka); only for models trained for it")
+@click.option("--hnsw-m", type=int, default=32, show_default=True, help="HNSW neighbours per node")
+@click.option("--ef-construction", type=int, default=200, show_default=True, help="HNSW build-time search depth")
+@click.option("--ef-search", type=int, default=128, show_default=True, help="HNSW query-time search depth")
+@click.option("--nlist", type=int, default=1024, show_default=True, help="Number of IVF clusters")
+@click.option("--nprobe", type=int, default=16, show_default=True, help="IVF clusters visited per query")
+@click.option("--pq-m", type=int, default=64, show_default=True,
+              help="PQ sub-quantizers (bytes per vector); must divide the dimension")
+@click.option("--recall-sample", type=int, default=2000, show_default=True,
+              help="Number of labels used as queries for the recall@1 report against exact search")
+@click.option("--report-all", is_flag=True, default=False,
+              help="Also report size and recall@1 of every encoding for the chosen index type and dimension")
+def main(output_dir: Path, mondo_version: str | None, include_mondo_db: bool, include_model: bool,
+         checkpoint_dir: Path | None, chunk_size: int, workers: int, index_type: str,
+         encoding: str, dim: int | None, hnsw_m: int, ef_construction: int, ef_search: int, nlist: int,
+         nprobe: int, pq_m: int, recall_sample: int, report_all: bool):
+    """Build the knowledge bundle: MONDO vector index, label tables and label index used for grounding."""
+    from oaklib import get_adapter
+    from sentence_transformers import SentenceTransformer
+
+    # define output directory for index files
+    output_dir.mkdir(parents=True, exist_ok=True)
+    store = EmbeddingStore(checkpoint_dir or output_dir / "embedding_cache")
 
+    # embedding model
+    # for mac users remove trust_remote_code = True to run script
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, trust_remote_code=True) #nomic
+    model_dim = model.get_sentence_embedding_dimension()
+    if dim is not None and not 0 < dim <= model_dim:
+        raise click.BadParameter(f"must be between 1 and {model_dim}", param_hint="--dim")
 
-# embedding model
-# for mac users remove trust_remote_code = True to run script
-model = SentenceTransformer("nomic-ai/nomic-embed-text-v1", trust_remote_code=True) #nomic
+    # load mondo db
+    adapter = get_adapter("sqlite:obo:mondo")
+    mondo_labels, mondo_ids, label_index = collect_mondo_labels(adapter)
 
-# load mondo db
-adapter = get_adapter("sqlite:obo:mondo")
+    # Produce embeddings for new or changed MONDO labels, reusing checkpointed ones
+    encode, close = make_encoder(model, workers)
+    try:
+        keys = embed_labels(mondo_labels, store, encode, chunk_size=chunk_size)
+    finally:
+        close()
+    pruned = store.prune(set(keys))
+    if pruned:
+        print(f"[INFO] Removed {pruned} checkpoint chunks no longer used by this MONDO release")
 
-#retrieve MONDO entity IDs in MONDO ontology database
-entities = list(adapter.entities())
+    # Normalised (and truncated) embeddings, memory-mapped rather than held in memory
+    embeddings_path = store.directory / "embeddings.tmp.npy"
+    embeddings = assemble_embeddings(store, keys, embeddings_path, dim, chunk_size=chunk_size)
 
-# Filter and retrieve MONDO disease labels
+    # Create FAISS index and store vectors
+    factory = index_factory_string(index_type, encoding, hnsw_m=hnsw_m, nlist=nlist, pq_m=pq_m)
+    index = build_index(embeddings, factory, ef_construction=ef_construction, chunk_size=chunk_size)
+    parameters = search_parameters(index_type, ef_search=ef_search, nprobe=nprobe)
+    for name, value in parameters.items():
+        faiss.ParameterSpace().set_index_parameter(index, name, value)
 
-mondo_labels = [] #i.e mondo terms
-mondo_ids = []
+    # Size and recall@1 against exact float32 search over the full embeddings,
+    # using real (query-prefixed) label queries
+    queries = recall_of = None
+    if recall_sample > 0:
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(mondo_labels), size=min(recall_sample, len(mondo_labels)), replace=False)
+        raw_queries = model.encode([f"search_query: {mondo_labels[i]}" for i in sample])
+        queries = normalise(raw_queries, dim)
+        full_queries = normalise(raw_queries)
+        _, exact_scores = exact_top1(iter_embeddings(store, keys, chunk_size=chunk_size), full_queries)
 
-#get primary label
-for entity in entities:
-    primary_label = adapter.label(entity)
-    if primary_label:
-        mondo_labels.append(primary_label)
-        mondo_ids.append(entity)
+        def row_scores(rows: np.ndarray) -> np.ndarray:
+            vectors = normalise(store.vectors([keys[row] for row in rows]))
+            return np.einsum("ij,ij->i", full_queries, vectors)
 
-# get synoymns
+        def recall_of(hits: np.ndarray) -> float:
+            return recall_at_1(hits, exact_scores, row_scores)
 
-for syn in adapter.entity_aliases(entity) or []:
-    if syn != primary_label:
-        mondo_labels.append(syn)
-        mondo_ids.append(entity)
-# Produce embeddings for MONDO labels
+        print(f"[INFO] recall@1 over {len(sample)} queries")
 
-embeddings = model.encode(mondo_labels, show_progress_bar=True)
+    # exact search at the dimension the indexes are built at; below 1.0 only from truncation (--dim)
+    exact_recall = 1.0
+    if recall_of is not None and dim is not None:
+        exact_hits, _ = exact_top1(iter_embeddings(store, keys, dim, chunk_size=chunk_size), queries)
+        exact_recall = recall_of(exact_hits)
+    exact_size = len(keys) * embeddings.shape[1] * 4
+    print(f"[INFO] {'exact (Flat)':<24} {exact_size / 2**20:9.1f} MiB  recall@1 {exact_recall:.4f}")
+    if report_all:
+        for option in ENCODINGS:
+            candidate_factory = index_factory_string(index_type, option, hnsw_m=hnsw_m, nlist=nlist, pq_m=pq_m)
+            if candidate_factory == factory:
+                continue
+            candidate = build_index(embeddings, candidate_factory, ef_construction=ef_construction,
+                                    chunk_size=chunk_size)
+            for name, value in parameters.items():
+                faiss.ParameterSpace().set_index_parameter(candidate, name, value)
+            report(candidate_factory, candidate, queries, recall_of)
+    recall = report(f"{factory} (selected)", index, queries, recall_of)
 
-# Normalise each vector
-embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    # Save index and metadata
+    write_index(index, output_dir / "mondo_faiss.index")
+    del embeddings
+    embeddings_path.unlink()
 
-# Convert embeddings to float32 - a requirement for FAISS
-embeddings = embeddings.astype("float32")
+    # Save disease labels and MONDO ids to output_dir as memory-mappable string tables
+    bundle_files = [output_dir / "mondo_faiss.index", output_dir / "mondo_label_index.json", output_dir / INDEX_META_PATH.name]
+    bundle_files += write_string_table(mondo_labels, output_dir / "mondo_labels.json")
+    bundle_files += write_string_table(mondo_ids, output_dir / "mondo_ids.json")
+    write_json(label_index, output_dir / "mondo_label_index.json")
 
-# Create FAISS index and store vectors
-index = faiss.IndexFlatIP(embeddings.shape[1])
-index.add(embeddings)
+    # keep separately built bundle files (see build_hpo_closure) in the manifest
+    if (output_dir / "hpo_closure.npz").exists():
+        bundle_files.append(output_dir / "hpo_closure.npz")
+    if include_mondo_db:
+        tmp_path = output_dir / f".{MONDO_DB_NAME}.tmp"
+        shutil.copyfile(adapter.engine.url.database, tmp_path)
+        os.replace(tmp_path, output_dir / MONDO_DB_NAME)
+        bundle_files.append(output_dir / MONDO_DB_NAME)
+    if include_model:
+        model.save(str(output_dir / MODEL_DIR_NAME))
+        bundle_files.append(output_dir / MODEL_DIR_NAME)
 
-# Save index and metadata
-    # Save FAISS index
-faiss.write_index(index, str(output_dir / "mondo_faiss.index"))
+    write_json({
+        "index_type": index_type,
+        "encoding": encoding,
+        "factory": factory,
+        "metric": "inner_product",
+        "model": EMBEDDING_MODEL_NAME,
+        "dim": int(index.d),
+        "count": int(index.ntotal),
+        "size_bytes": index_size(index),
+        "build_parameters": {"hnsw_m": hnsw_m, "ef_construction": ef_construction, "nlist": nlist, "pq_m": pq_m},
+        "search_parameters": parameters,
+        "recall_at_1": recall,
+    }, output_dir / INDEX_META_PATH.name)
 
-# Save disease label and MONDO id to output_dir
-with open(output_dir / "mondo_labels.json", "w") as f:
-    json.dump(mondo_labels, f)
+    version = resolve_mondo_version(mondo_version or os.environ.get("MONDO_VERSION"))
+    write_manifest(output_dir, bundle_files, mondo_version=version, model=EMBEDDING_MODEL_NAME)
+    print(f"[INFO] Wrote knowledge bundle for MONDO {version} to {output_dir}")
 
-with open(output_dir / "mondo_ids.json", "w") as f:
-    json.dump(mondo_ids, f)
 
+if __name__ == "__main__":
+    main()
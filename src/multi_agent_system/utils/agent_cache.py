@@ -0,0 +1,123 @@
+# Record/replay cache for LLM agent runs
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from pydantic import TypeAdapter
+
+# off: no caching, read_through: replay hits and record misses,
+# record: always call the model and (re-)record, replay: never call the model, a miss is an error
+CACHE_MODES = ("off", "read_through", "record", "replay")
+
+
+class AgentCacheMiss(KeyError):
+    """ Raised in replay mode when an agent run has not been recorded """
+
+
+@dataclass
+class CachedUsage:
+    """ Usage of a replayed run: no requests were made and no tokens were spent """
+    requests: int = 0
+    request_tokens: int = 0
+    response_tokens: int = 0
+    total_tokens: int = 0
+
+
+@dataclass
+class CachedRunResult:
+    """ The parts of an agent run result the pipeline uses, rebuilt from the cache """
+    output: Any
+
+    def usage(self) -> CachedUsage:
+        return CachedUsage()
+
+
+class CachedAgent:
+    """ Wraps an agent so `run()` goes through a content-addressed cache on disk
+
+    Runs are keyed by the system prompt, user input, model name, temperature and output schema,
+    so changing any of them records a new entry instead of replaying a stale one.
+    """
+
+    def __init__(self, agent: Any, name: str, system_prompt: str, cache_dir: Path, mode: str = "read_through"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown agent cache mode '{mode}', expected one of {CACHE_MODES}")
+        self.agent = agent
+        self.name = name
+        self.system_prompt = system_prompt
+        self.cache_dir = Path(cache_dir) / name
+        self.mode = mode
+        self._output_adapter = TypeAdapter(agent.output_type)
+        self._output_schema = self._output_adapter.json_schema()
+
+    def _model_settings(self) -> dict:
+        model = self.agent.model
+        settings = self.agent.model_settings or {}
+        return {
+            "model": getattr(model, "model_name", str(model)),
+            "temperature": settings.get("temperature"),
+        }
+
+    def cache_key(self, user_input: Any) -> str:
+        """ Content hash identifying one agent run """
+        payload = {
+            "agent": self.name,
+            "system_prompt": self.system_prompt,
+            "user_input": user_input,
+            "output_schema": self._output_schema,
+            **self._model_settings(),
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load(self, key: str) -> CachedRunResult | None:
+        path = self._entry_path(key)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        return CachedRunResult(output=self._output_adapter.validate_python(entry["output"]))
+
+    def _store(self, key: str, user_input: Any, output: Any) -> None:
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "agent": self.name,
+            **self._model_settings(),
+            "user_input": user_input,
+            "output": self._output_adapter.dump_python(output, mode="json"),
+        }
+        # write to a temporary file and rename, so concurrent runs never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    async def run(self, user_input: Any, **kwargs: Any) -> Any:
+        """ Run the agent, replaying or recording the result according to the cache mode """
+        if self.mode == "off":
+            return await self.agent.run(user_input, **kwargs)
+
+        key = self.cache_key(user_input)
+        if self.mode in ("read_through", "replay"):
+            cached = self._load(key)
+            if cached is not None:
+                print(f"[Agent Cache] Replaying {self.name} run {key[:12]}")
+                return cached
+            if self.mode == "replay":
+                raise AgentCacheMiss(f"No recorded {self.name} run for key {key} in {self.cache_dir}")
+
+        result = await self.agent.run(user_input, **kwargs)
+        self._store(key, user_input, result.output)
+        return result
@@ -1,13 +1,71 @@
 # Code for optimisation of token size per agent
 import json
+import math
+from functools import lru_cache
+from typing import Any, Callable, List, Optional
 
+# characters per token when no tokenizer is installed; JSON of HPO IDs and disease names
+# tokenizes at roughly this rate, and rounding each item up keeps the estimate on the safe side
+CHARS_PER_TOKEN = 4
 
-# Add to batch_utils.py
-def calculate_batch_size(items: list, max_tokens: int, per_item_overhead: int = 50) -> int:
-    """Calculate safe batch size based on token estimates"""
-    if not items:
-        return 10
 
-    sample = items[0]
-    item_tokens = len(json.dumps(sample)) // 4
-    return max(1, min(50, max_tokens // (item_tokens + per_item_overhead)))
\ No newline at end of file
+@lru_cache
+def _tokenizer():
+    """ tiktoken encoding if tiktoken is installed, otherwise None """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    """ Token count of a prompt fragment: exact with tiktoken, otherwise a characters-per-token estimate """
+    tokenizer = _tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def serialize_item(item: Any) -> str:
+    """ An item as it appears in an agent prompt: strings as-is, everything else as compact JSON """
+    if isinstance(item, str):
+        return item
+    return json.dumps(item, separators=(',', ':'), ensure_ascii=False)
+
+
+def pack_batches(items: List[Any], max_tokens: int, per_item_overhead: int = 0, max_items: Optional[int] = None,
+                 token_counter: Callable[[str], int] = count_tokens) -> List[List[Any]]:
+    """ Pack items into as few batches as possible under a token budget (first-fit decreasing)
+
+    Every item is measured on its own, so one large phenotype list no longer decides the size
+    of all batches. An item that exceeds the budget by itself gets a batch of its own.
+
+    Args:
+        items: Items to batch, e.g. disease labels or candidate disease dicts
+        max_tokens: Token budget of one batch
+        per_item_overhead: Tokens added per item, e.g. for the agent's per-item output
+        max_items: Maximum number of items per batch
+        token_counter: Counts the tokens of a serialized item
+
+    Returns:
+        Batches of items. Items keep their input order within a batch, and batches are ordered
+        by their first item, so the result only depends on the input.
+    """
+    costs = [token_counter(serialize_item(item)) + per_item_overhead for item in items]
+    bins: List[List[int]] = []
+    remaining: List[int] = []
+
+    # largest first; equal costs keep input order
+    for index in sorted(range(len(items)), key=lambda i: (-costs[i], i)):
+        for b, members in enumerate(bins):
+            if costs[index] <= remaining[b] and (max_items is None or len(members) < max_items):
+                members.append(index)
+                remaining[b] -= costs[index]
+                break
+        else:
+            bins.append([index])
+            remaining.append(max_tokens - costs[index])
+
+    ordered = sorted((sorted(members) for members in bins), key=lambda members: members[0])
+    return [[items[i] for i in members] for members in ordered]
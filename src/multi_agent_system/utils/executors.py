@@ -0,0 +1,73 @@
+# Dedicated thread pools that keep blocking grounding work off the event loop
+#
+# sqlite     MONDO SQLite searches, the disease knowledge cache and local annotation lookups
+# http       Monarch association requests (mostly waiting on the network, so many threads)
+# embedding  sentence-transformer encoding and FAISS search (torch and FAISS release the GIL and
+#            parallelise internally, so a small pool avoids oversubscribing the cores)
+# catalogue  scoring a patient against the whole HPO annotation catalogue (a CPU-bound sparse product,
+#            kept apart so it does not hold up the SQLite lookups)
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+WORKLOADS = ("sqlite", "http", "embedding", "catalogue")
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(workload: str, max_workers: int) -> ThreadPoolExecutor:
+    """ The process-wide thread pool of a workload, created with `max_workers` threads on first use
+
+    Args:
+        workload (str): one of WORKLOADS
+        max_workers (int): pool size; ignored once the pool exists
+
+    Returns:
+        ThreadPoolExecutor
+    """
+    if workload not in WORKLOADS:
+        raise ValueError(f"Unknown executor workload '{workload}', expected one of {WORKLOADS}")
+    with _executors_lock:
+        executor = _executors.get(workload)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"grounding-{workload}")
+            _executors[workload] = executor
+        return executor
+
+
+async def run_in_executor(executor: ThreadPoolExecutor, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """ Await a blocking call on `executor` instead of running it on the event loop """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """ Stop every workload pool; the next get_executor call creates a new one """
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+
+def per_thread(factory: Callable[[], T]) -> Callable[[], T]:
+    """ Like lru_cache on a zero-argument factory, but one instance per thread
+
+    For resources that must not be shared between threads, e.g. SQLite connections.
+    """
+    local = threading.local()
+
+    @functools.wraps(factory)
+    def get() -> T:
+        try:
+            return local.value
+        except AttributeError:
+            local.value = factory()
+            return local.value
+
+    return get
@@ -1,56 +1,246 @@
 import numpy as np
 import faiss
 import json
+import re
+import threading
+import unicodedata
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+from typing import Dict, List, Optional
 
-# Define paths
-BASE_DIR = Path(__file__).parent / "data_2"
+from multi_agent_system.utils.knowledge_bundle import (
+    MODEL_DIR_NAME,
+    MONDO_DB_NAME,
+    bundle_dir,
+    check_bundle,
+    read_manifest,
+    read_strings,
+    string_files,
+)
+
+# Define paths: everything is read from the knowledge bundle (MONDO_BUNDLE_DIR, see knowledge_bundle.py)
+BASE_DIR = bundle_dir()
 INDEX_PATH = BASE_DIR / "mondo_faiss.index"
 LABELS_PATH = BASE_DIR / "mondo_labels.json"
 IDS_PATH = BASE_DIR / "mondo_ids.json"
+LABEL_INDEX_PATH = BASE_DIR / "mondo_label_index.json"
+INDEX_META_PATH = BASE_DIR / "mondo_index_meta.json"
+MONDO_DB_PATH = BASE_DIR / MONDO_DB_NAME
+MODEL_DIR = BASE_DIR / MODEL_DIR_NAME
+
+# Embedding model, loaded on the first real embedding request (see get_embedding_model)
+EMBEDDING_MODEL_NAME = "nomic-ai/nomic-embed-text-v1"
+_model_lock = threading.Lock()
+_model = None
+
+
+def get_embedding_model():
+    """ Load the embedding model and its tokenizer on first use
+
+    Importing this module stays cheap: sentence-transformers (and torch) are only
+    imported once a label actually needs to be embedded.
+    """
+    global _model
+
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+
+                # a model saved in the bundle avoids the download on a fresh node
+                source = str(MODEL_DIR) if MODEL_DIR.is_dir() else EMBEDDING_MODEL_NAME
+                print(f"[INFO] Loading embedding model {source}")
+                _model = SentenceTransformer(source, trust_remote_code=True)
+    return _model
+
+
+def warm_up_embedding_model() -> None:
+    """ Load the embedding model ahead of time and run one encode, so the first lookup is not slowed down """
+    get_embedding_model().encode(["search_query: warm-up"])
+
+
+def mondo_adapter_selector() -> str:
+    """ oaklib selector for MONDO: the bundle's mondo.db if present, otherwise the oaklib download """
+    return f"sqlite:{MONDO_DB_PATH}" if MONDO_DB_PATH.exists() else "sqlite:obo:mondo"
+
+# Process-wide index handle, shared by every lookup in this process
+_index_lock = threading.Lock()
+_index_handle = None
+_index_signature = None
+
+
+def _read_index(path: Path):
+    """ Read a FAISS index memory-mapped, so worker processes on a node share the same pages """
+    try:
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError as e:
+        # not every index type can be memory-mapped, fall back to a regular read
+        print(f"[WARNING] Could not memory-map {path.name}, reading it into memory: {e}")
+        return faiss.read_index(str(path))
+
+
+def _files_signature(*paths: Path) -> tuple:
+    """ Modification time and size of each file, used to detect when the index files change on disk """
+    signature = []
+    for path in paths:
+        stat = path.stat()
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def load_index_metadata() -> dict:
+    """ Index type and search parameters written by scripts/mondo_index.py
+
+    Returns:
+        The metadata, or an empty dictionary for indexes built before the metadata file existed (flat)
+    """
+    if not INDEX_META_PATH.exists():
+        return {}
+    with open(INDEX_META_PATH, "r") as f:
+        return json.load(f)
+
+
+def apply_search_parameters(index, parameters: dict) -> None:
+    """ Set query-time parameters (efSearch for HNSW, nprobe for IVF), which FAISS does not persist """
+    space = faiss.ParameterSpace()
+    for name, value in parameters.items():
+        try:
+            space.set_index_parameter(index, name, value)
+        except RuntimeError as e:
+            print(f"[WARNING] Could not set index parameter {name}={value}: {e}")
 
-# Load embedding model
-model = SentenceTransformer("nomic-ai/nomic-embed-text-v1", trust_remote_code=True)
 
 def load_faiss_index():
-    """ Load faiss index """
-    index = faiss.read_index(str(INDEX_PATH))
-    with open(LABELS_PATH, "r") as f:
-        labels = json.load(f)
-    with open(IDS_PATH, "r") as f:
-        ids = json.load(f)
+    """ Load faiss index
+
+    Raises:
+        ValueError: if the index files do not match the sizes recorded in the bundle manifest
+    """
+    check_bundle(INDEX_PATH.parent, [INDEX_PATH, INDEX_META_PATH, *string_files(LABELS_PATH), *string_files(IDS_PATH)])
+    index = _read_index(INDEX_PATH)
+    metadata = load_index_metadata()
+    apply_search_parameters(index, metadata.get("search_parameters", {}))
+    if metadata:
+        print(f"[INFO] Loaded {metadata.get('factory', 'Flat')} MONDO index with {index.ntotal} vectors")
+    manifest_model = read_manifest(INDEX_PATH.parent).get("model")
+    if manifest_model and manifest_model != EMBEDDING_MODEL_NAME:
+        print(f"[WARNING] MONDO index was built with {manifest_model}, but queries are embedded with {EMBEDDING_MODEL_NAME}")
+    labels = read_strings(LABELS_PATH)
+    ids = read_strings(IDS_PATH)
     return index, labels, ids
 
+
+def get_faiss_index():
+    """ Return the process-wide FAISS index, labels and IDs
+
+    The files are loaded lazily on first use and only reloaded when they change on disk.
+    Index files must be replaced atomically (write + rename), never rewritten in place,
+    since a memory-mapped index that is truncated under a running process will crash it.
+
+    Returns:
+        Tuple of (index, labels, ids)
+    """
+    global _index_handle, _index_signature
+
+    paths = [INDEX_PATH, *string_files(LABELS_PATH), *string_files(IDS_PATH)]
+    if INDEX_META_PATH.exists():
+        paths.append(INDEX_META_PATH)
+    signature = _files_signature(*paths)
+    with _index_lock:
+        if _index_handle is None or signature != _index_signature:
+            if _index_handle is not None:
+                print("[INFO] MONDO index files changed on disk, reloading")
+            _index_handle = load_faiss_index()
+            _index_signature = signature
+        return _index_handle
+
+
+# Normalised label -> MONDO ID lookup, consulted before SQLite and vector search
+_label_index_lock = threading.Lock()
+_label_index: Optional[Dict[str, str]] = None
+_label_index_signature = None
+
+# trailing acronym in brackets, e.g. "Bardet-Biedl syndrome (BBS)" or "Cornelia de Lange syndrome (CdLS)"
+_ACRONYM_PATTERN = re.compile(r"\(\s*[A-Za-z0-9-]*[A-Z0-9][A-Za-z0-9-]*[A-Z0-9][A-Za-z0-9-]*\s*\)")
+_NON_ALPHANUMERIC_PATTERN = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_label(label: str) -> str:
+    """ Normalise a disease label for exact lookup
+
+    Strips bracketed acronyms, folds case and unicode variants, and collapses punctuation
+    and whitespace, so "Bardet-Biedl syndrome (BBS)" and "bardet biedl  syndrome" match.
+
+    Args:
+        label (str): disease label
+
+    Returns:
+        The normalised label
+    """
+    text = _ACRONYM_PATTERN.sub(" ", unicodedata.normalize("NFKC", label))
+    return _NON_ALPHANUMERIC_PATTERN.sub(" ", text.casefold()).strip()
+
+
+def get_label_index() -> Dict[str, str]:
+    """ Return the process-wide normalised label -> MONDO ID dictionary
+
+    Built by scripts/mondo_index.py next to the FAISS index; loaded once and reloaded only
+    when the file changes. Returns an empty dictionary if the file has not been built.
+    """
+    global _label_index, _label_index_signature
+
+    if not LABEL_INDEX_PATH.exists():
+        return {}
+    signature = _files_signature(LABEL_INDEX_PATH)
+    with _label_index_lock:
+        if _label_index is None or signature != _label_index_signature:
+            with open(LABEL_INDEX_PATH, "r") as f:
+                _label_index = json.load(f)
+            _label_index_signature = signature
+        return _label_index
+
+
+def lookup_normalized_label(label: str) -> Optional[str]:
+    """ O(1) lookup of a disease label (or synonym) after normalisation
+
+    Args:
+        label (str): disease label
+
+    Returns:
+        The MONDO ID, or None if the normalised label is not a known MONDO label or synonym
+    """
+    return get_label_index().get(normalize_label(label))
+
+
 # Encode query (disease label) into a vector
-def get_embedding(label: str) -> np.ndarray:
-    prompt = f"search_query: {label}"
-    embedding = model.encode([prompt])
-    embedding = embedding / np.linalg.norm(embedding, axis=1, keepdims=True)
-    return embedding.astype("float32")
+def get_embedding(label: str, dim: Optional[int] = None) -> np.ndarray:
+    return get_embeddings([label], dim=dim)
 
-# Use cosine similarity to find most likely MONDO ID match
-def cosine_similarity(label: str, k: int = 1, threshold: float = 0.899) -> dict:
-    """ Similarity search using FAISS with cosine similarity
+
+def get_embeddings(labels: List[str], dim: Optional[int] = None) -> np.ndarray:
+    """ Encode a batch of query labels in a single model call
 
     Args:
-        label (str): label (i.e. disease name) associated with the mondo
-        k (int): number of nearest neighbors
-        threshold (float): threshold of similarity
+        labels (List[str]): labels to encode
+        dim (int): embedding dimension of the index; defaults to the dimension of the loaded index.
+            Embeddings are truncated to it (Matryoshka) before normalising, as at build time.
 
     Returns:
-        A dictionary with the MONDO disease label and ID if the best match
-        is above the threshold.
+        Normalised float32 embeddings, one row per label
     """
+    if dim is None:
+        dim = get_faiss_index()[0].d
+    prompts = [f"search_query: {label}" for label in labels]
+    embeddings = get_embedding_model().encode(prompts)[:, :dim]
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings.astype("float32")
 
-    index, labels, ids = load_faiss_index()
-    embedding = get_embedding(label)
-    D, I = index.search(embedding, k)
 
-    cosine_score = D[0][0]
-    if cosine_score >= threshold and I[0][0] < len(labels): # check if cosine score above threshold + checks if FAISS index is valid
-        match_label = labels[I[0][0]] # retrieve matched label (best matching MONDO disease name) from the labels list using FAISS index
-        match_id = ids[I[0][0]] # retrieve the associated MONDO ID
+def _match_result(label: str, cosine_score: float, match_index: int, labels: list, ids: list,
+                  threshold: float) -> dict:
+    """ Turn the best FAISS hit for a label into a grounding result """
+    if cosine_score >= threshold and match_index < len(labels): # check if cosine score above threshold + checks if FAISS index is valid
+        match_label = labels[match_index] # retrieve matched label (best matching MONDO disease name) from the labels list using FAISS index
+        match_id = ids[match_index] # retrieve the associated MONDO ID
 
         if isinstance(match_id, str) and match_id.startswith("MONDO:"):
             print(f"[Cosine Similarity Match] '{label}' → '{match_label}' ({match_id}) with score {cosine_score:.4f}")
@@ -72,6 +262,48 @@ def cosine_similarity(label: str, k: int = 1, threshold: float = 0.899) -> dict:
         "cosine_score": float(cosine_score)
     }
 
+
+# Use cosine similarity to find most likely MONDO ID match
+def cosine_similarity(label: str, k: int = 1, threshold: float = 0.899) -> dict:
+    """ Similarity search using FAISS with cosine similarity
+
+    Args:
+        label (str): label (i.e. disease name) associated with the mondo
+        k (int): number of nearest neighbors
+        threshold (float): threshold of similarity
+
+    Returns:
+        A dictionary with the MONDO disease label and ID if the best match
+        is above the threshold.
+    """
+
+    return batch_cosine_similarity([label], k=k, threshold=threshold)[0]
+
+
+def batch_cosine_similarity(query_labels: List[str], k: int = 1, threshold: float = 0.899) -> List[dict]:
+    """ Batched similarity search: one encode call and one multi-query FAISS search
+
+    Args:
+        query_labels (List[str]): labels (i.e. disease names) to match
+        k (int): number of nearest neighbors
+        threshold (float): threshold of similarity
+
+    Returns:
+        A list with one result per query label, in input order, each identical
+        to what cosine_similarity returns for that label.
+    """
+    if not query_labels:
+        return []
+
+    index, labels, ids = get_faiss_index()
+    embeddings = get_embeddings(query_labels, dim=index.d)
+    D, I = index.search(embeddings, k)
+
+    return [
+        _match_result(label, D[row][0], I[row][0], labels, ids, threshold)
+        for row, label in enumerate(query_labels)
+    ]
+
 #TEST
 
 # if __name__ == "__main__":
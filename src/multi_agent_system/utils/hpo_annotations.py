@@ -0,0 +1,194 @@
+# Offline disease -> phenotype knowledge base built from HPO annotation files (phenotype.hpoa)
+import csv
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from multi_agent_system.utils.similarity_utils import jaccard_against_matrix, top_k
+
+MONDO_PREFIX = "MONDO:"
+
+# SSSOM object prefixes that differ from the ones used in phenotype.hpoa
+_PREFIX_ALIASES = {"Orphanet:": "ORPHA:"}
+
+# Only xrefs to these sources can have HPO annotations
+_ANNOTATED_PREFIXES = ("OMIM:", "ORPHA:", "DECIPHER:")
+
+
+def default_mondo_mapping_path() -> Optional[Path]:
+    """ Path to the MONDO SSSOM mapping table shipped with PhEval, if it is installed """
+    try:
+        import pheval
+    except ImportError:
+        return None
+    path = Path(pheval.__file__).parent / "resources" / "mondo.sssom.tsv"
+    return path if path.exists() else None
+
+
+def _normalise_prefix(identifier: str) -> str:
+    for alias, prefix in _PREFIX_ALIASES.items():
+        if identifier.startswith(alias):
+            return prefix + identifier[len(alias):]
+    return identifier
+
+
+def read_mondo_mappings(sssom_path: Path) -> Dict[str, List[str]]:
+    """ Read MONDO -> OMIM/ORPHA/DECIPHER exact matches from a SSSOM mapping table
+
+    Args:
+        sssom_path (Path): SSSOM TSV with subject_id, predicate_id and object_id columns
+
+    Returns:
+        Dictionary of MONDO ID to the annotated disease IDs it is an exact match for
+    """
+    mappings: Dict[str, List[str]] = {}
+    with open(sssom_path, "r", encoding="utf-8") as f:
+        rows = csv.DictReader((line for line in f if not line.startswith("#")), delimiter="\t")
+        for row in rows:
+            if row.get("predicate_id") != "skos:exactMatch":
+                continue
+            subject_id = row.get("subject_id") or ""
+            object_id = _normalise_prefix(row.get("object_id") or "")
+            if subject_id.startswith(MONDO_PREFIX) and object_id.startswith(_ANNOTATED_PREFIXES):
+                mappings.setdefault(subject_id, []).append(object_id)
+    return mappings
+
+
+class HpoAnnotationIndex:
+    """ Compact, read-only index of disease -> HPO terms
+
+    HPO IDs are interned to integer codes and each disease's terms are stored as one slice
+    of a single flat array (CSR layout), so the whole of phenotype.hpoa fits in a few MB and
+    a lookup is a dictionary hit plus an array slice.
+    """
+
+    def __init__(self, hpo_terms: List[str], disease_ids: List[str], disease_names: List[str],
+                 offsets: array, codes: array, mondo_mappings: Optional[Dict[str, List[str]]] = None):
+        self.hpo_terms = hpo_terms
+        self.disease_ids = disease_ids
+        self.disease_names = disease_names
+        self.offsets = offsets
+        self.codes = codes
+        self.mondo_mappings = mondo_mappings or {}
+        self._rows = {disease_id: row for row, disease_id in enumerate(disease_ids)}
+        self._mondo_ids: Dict[str, List[str]] = {}
+        for mondo_id, xrefs in sorted(self.mondo_mappings.items()):
+            for xref in xrefs:
+                self._mondo_ids.setdefault(xref, []).append(mondo_id)
+        self._term_codes = {term: code for code, term in enumerate(hpo_terms)}
+        self._matrix: Optional[sparse.csr_matrix] = None
+        # the index is shared by the catalogue executor's threads, which may all ask for the matrix at once
+        self._matrix_lock = threading.Lock()
+
+    @classmethod
+    def from_hpoa(cls, hpoa_path: Path, mondo_mappings: Optional[Dict[str, List[str]]] = None) \
+            -> "HpoAnnotationIndex":
+        """ Build the index from a phenotype.hpoa file
+
+        Only phenotypic abnormality annotations (aspect P) are kept; negated (NOT) annotations are skipped.
+
+        Args:
+            hpoa_path (Path): Path to phenotype.hpoa
+            mondo_mappings (dict): MONDO ID -> annotated disease IDs, used to resolve MONDO lookups
+
+        Returns:
+            HpoAnnotationIndex
+        """
+        term_codes: Dict[str, int] = {}
+        diseases: Dict[str, Tuple[str, set]] = {}
+
+        with open(hpoa_path, "r", encoding="utf-8") as f:
+            rows = csv.DictReader((line for line in f if not line.startswith("#")), delimiter="\t")
+            for row in rows:
+                if row.get("aspect") != "P" or row.get("qualifier") == "NOT":
+                    continue
+                disease_id, hpo_id = row["database_id"], row["hpo_id"]
+                code = term_codes.setdefault(hpo_id, len(term_codes))
+                diseases.setdefault(disease_id, (row.get("disease_name", ""), set()))[1].add(code)
+
+        offsets = array("I", [0])
+        codes = array("I")
+        disease_ids, disease_names = [], []
+        for disease_id, (name, disease_codes) in diseases.items():
+            disease_ids.append(disease_id)
+            disease_names.append(name)
+            codes.extend(sorted(disease_codes))
+            offsets.append(len(codes))
+
+        return cls(list(term_codes), disease_ids, disease_names, offsets, codes, mondo_mappings)
+
+    def __len__(self) -> int:
+        return len(self.disease_ids)
+
+    def __contains__(self, disease_id: str) -> bool:
+        return disease_id in self._rows
+
+    def _codes(self, disease_id: str) -> array:
+        row = self._rows.get(disease_id)
+        if row is None:
+            return array("I")
+        return self.codes[self.offsets[row]:self.offsets[row + 1]]
+
+    def annotated_ids(self, disease_id: str) -> List[str]:
+        """ Annotated disease IDs a (MONDO, OMIM, ORPHA...) ID resolves to """
+        if disease_id.startswith(MONDO_PREFIX):
+            return [xref for xref in self.mondo_mappings.get(disease_id, []) if xref in self._rows]
+        return [disease_id] if disease_id in self._rows else []
+
+    def mondo_ids(self, disease_id: str) -> List[str]:
+        """ MONDO IDs an annotated (OMIM, ORPHA...) ID is an exact match for, the reverse of `annotated_ids` """
+        if disease_id.startswith(MONDO_PREFIX):
+            return [disease_id]
+        return list(self._mondo_ids.get(disease_id, []))
+
+    def phenotypes(self, disease_id: str) -> List[str]:
+        """ Full set of HPO IDs annotated to a disease
+
+        MONDO IDs are resolved through their exact-match xrefs and the annotations of all of them are combined.
+
+        Args:
+            disease_id (str): MONDO, OMIM, ORPHA or DECIPHER ID
+
+        Returns:
+            Sorted list of HPO IDs, empty if the disease has no annotations
+        """
+        codes = set()
+        for annotated_id in self.annotated_ids(disease_id):
+            codes.update(self._codes(annotated_id))
+        return sorted(self.hpo_terms[code] for code in codes)
+
+    def disease_name(self, disease_id: str) -> Optional[str]:
+        row = self._rows.get(disease_id)
+        return self.disease_names[row] if row is not None else None
+
+    def matrix(self) -> sparse.csr_matrix:
+        """ Binary disease x HPO term matrix over every annotated disease, sharing the index's arrays """
+        with self._matrix_lock:
+            if self._matrix is None:
+                codes = np.frombuffer(self.codes, dtype=np.uint32) if len(self.codes) else np.empty(0, dtype=np.uint32)
+                offsets = np.frombuffer(self.offsets, dtype=np.uint32)
+                self._matrix = sparse.csr_matrix(
+                    (np.ones(len(codes), dtype=np.float64), codes, offsets),
+                    shape=(len(self.disease_ids), len(self.hpo_terms)),
+                )
+            return self._matrix
+
+    def rank_diseases(self, hpo_ids: Iterable[str], k: int) -> List[Tuple[str, float]]:
+        """ Top-k annotated diseases by Jaccard index against a patient's HPO terms, in one sparse product
+
+        Args:
+            hpo_ids (Iterable[str]): patient HPO IDs
+            k (int): number of diseases to return
+
+        Returns:
+            List of (annotated disease ID, Jaccard index), best first; diseases sharing no term are left out
+        """
+        patient_terms = set(hpo_ids)
+        columns = [self._term_codes[term] for term in patient_terms if term in self._term_codes]
+        scores = jaccard_against_matrix(columns, len(patient_terms), self.matrix())
+        return [(self.disease_ids[row], float(scores[row])) for row in top_k(scores, k)]
+
@@ -0,0 +1,220 @@
+# Versioned bundle of the MONDO artifacts a worker needs to ground diseases
+#
+# <bundle>/
+#   manifest.json                  MONDO version, embedding model and a checksum and size per file
+#   mondo_faiss.index              FAISS index (memory-mapped)
+#   mondo_index_meta.json          index type and search parameters
+#   mondo_labels.offsets.npy       string tables: int64 offsets into a UTF-8 blob (both memory-mapped)
+#   mondo_labels.utf8
+#   mondo_ids.offsets.npy
+#   mondo_ids.utf8
+#   mondo_label_index.json         normalised label -> MONDO ID
+#   hpo_closure.npz                optional: HPO ancestor bitsets and information content (build_hpo_closure)
+#   mondo.db                       optional: MONDO SQLite database (instead of the oaklib download)
+#   embedding_model/               optional: saved embedding model (instead of the Hugging Face download)
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from multi_agent_system.utils.file_utils import atomic_write_text, file_checksum
+
+BUNDLE_DIR_ENV = "MONDO_BUNDLE_DIR"
+MANIFEST_NAME = "manifest.json"
+MONDO_DB_NAME = "mondo.db"
+MODEL_DIR_NAME = "embedding_model"
+
+
+def bundle_dir() -> Path:
+    """ The knowledge bundle directory: MONDO_BUNDLE_DIR, or utils/data_2 in the source tree """
+    return Path(os.environ.get(BUNDLE_DIR_ENV, Path(__file__).parent / "data_2"))
+
+
+def string_table_paths(path: Path) -> tuple[Path, Path]:
+    """ Offsets and blob files of the string table stored in place of a JSON list, e.g. mondo_labels.json """
+    return path.with_suffix(".offsets.npy"), path.with_suffix(".utf8")
+
+
+class StringTable(Sequence[str]):
+    """ Read-only list of strings backed by memory-mapped offsets and a UTF-8 blob
+
+    Loading costs two mmap calls regardless of size; strings are decoded on access.
+    """
+
+    def __init__(self, offsets_path: Path, blob_path: Path):
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        # np.memmap cannot map an empty file
+        if blob_path.stat().st_size:
+            self.blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            self.blob = np.empty(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+def write_string_table(strings: Sequence[str], path: Path) -> List[Path]:
+    """ Write strings as a string table next to `path` (e.g. mondo_labels.json -> mondo_labels.utf8)
+
+    Args:
+        strings (Sequence[str]): strings to store
+        path (Path): the JSON path the table replaces
+
+    Returns:
+        The written files
+    """
+    offsets_path, blob_path = string_table_paths(path)
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    # blob first, offsets last: readers only pick up a table once its offsets file exists
+    for target, write in ((blob_path, lambda f: f.write(b"".join(encoded))),
+                          (offsets_path, lambda f: np.save(f, offsets))):
+        tmp_path = target.with_name(f".{target.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, target)
+    return [offsets_path, blob_path]
+
+
+def read_strings(path: Path) -> Sequence[str]:
+    """ Load a list of strings from its string table if present, otherwise from the JSON file at `path` """
+    offsets_path, blob_path = string_table_paths(path)
+    if offsets_path.exists() and blob_path.exists():
+        return StringTable(offsets_path, blob_path)
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def string_files(path: Path) -> List[Path]:
+    """ Files a list of strings is loaded from (see read_strings) """
+    offsets_path, blob_path = string_table_paths(path)
+    if offsets_path.exists() and blob_path.exists():
+        return [offsets_path, blob_path]
+    return [path]
+
+
+def write_manifest(directory: Path, files: Sequence[Path], mondo_version: Optional[str], model: str) -> dict:
+    """ Record the bundle's MONDO version, embedding model and file checksums and sizes in manifest.json
+
+    Args:
+        directory (Path): bundle directory
+        files (Sequence[Path]): bundle files; directories (a saved model) are checksummed file by file
+        mondo_version (str): MONDO release the bundle was built from
+        model (str): embedding model name
+
+    Returns:
+        The manifest
+    """
+    checksums, sizes = {}, {}
+    for path in files:
+        members = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+        for member in members:
+            name = member.relative_to(directory).as_posix()
+            checksums[name] = file_checksum(member)
+            sizes[name] = member.stat().st_size
+
+    manifest = {
+        "mondo_version": mondo_version,
+        "model": model,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": checksums,
+        "sizes": sizes,
+    }
+    atomic_write_text(directory / MANIFEST_NAME, json.dumps(manifest, indent=2))
+    return manifest
+
+
+def update_manifest(directory: Path, files: Sequence[Path]) -> dict:
+    """ Add (or refresh) the checksums and sizes of files built separately from the index, e.g. hpo_closure.npz
+
+    Args:
+        directory (Path): bundle directory
+        files (Sequence[Path]): bundle files to record
+
+    Returns:
+        The updated manifest
+    """
+    manifest = read_manifest(directory)
+    if not manifest:
+        print(f"[WARNING] No manifest in {directory}, run build_index first to record the MONDO version")
+        manifest = {"mondo_version": None, "model": None, "files": {}}
+    for path in files:
+        name = path.relative_to(directory).as_posix()
+        manifest["files"][name] = file_checksum(path)
+        manifest.setdefault("sizes", {})[name] = path.stat().st_size
+    atomic_write_text(Path(directory) / MANIFEST_NAME, json.dumps(manifest, indent=2))
+    return manifest
+
+
+def read_manifest(directory: Path) -> dict:
+    """ The bundle manifest, or an empty dictionary for a directory without one """
+    path = Path(directory) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def verify_bundle(directory: Path, files: Optional[Sequence[Path]] = None, checksums: bool = False) -> List[str]:
+    """ Check the files listed in the manifest against their recorded size, and optionally their checksum
+
+    Comparing sizes only needs a stat per file, so it is cheap enough for every load and catches
+    partial copies and files from another build. Checksums read every byte of every file.
+
+    Args:
+        directory (Path): bundle directory
+        files (Sequence[Path]): only check these bundle files (default: every file in the manifest)
+        checksums (bool): also compare SHA-256 checksums
+
+    Returns:
+        The files that are missing or changed (empty if the bundle is intact or has no manifest)
+    """
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    sizes = manifest.get("sizes", {})
+    selected = None if files is None else {Path(path).resolve() for path in files}
+    problems = []
+    for name, checksum in manifest.get("files", {}).items():
+        path = directory / name
+        if selected is not None and path.resolve() not in selected:
+            continue
+        if (not path.exists()
+                or (name in sizes and path.stat().st_size != sizes[name])
+                or (checksums and file_checksum(path) != checksum)):
+            problems.append(name)
+    return problems
+
+
+def check_bundle(directory: Path, files: Optional[Sequence[Path]] = None, checksums: bool = False) -> None:
+    """ Raise if bundle files do not match the manifest, e.g. a partial copy or files from another build
+
+    Args:
+        directory (Path): bundle directory
+        files (Sequence[Path]): only check these bundle files (default: every file in the manifest)
+        checksums (bool): also compare SHA-256 checksums (see verify_bundle)
+
+    Raises:
+        ValueError: listing the missing or changed files
+    """
+    problems = verify_bundle(directory, files, checksums)
+    if problems:
+        raise ValueError(f"Knowledge bundle {directory} does not match its manifest, rebuild or copy it again "
+                         f"(missing or changed: {', '.join(problems)})")
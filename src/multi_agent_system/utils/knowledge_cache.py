@@ -0,0 +1,120 @@
+# Persistent cache of MONDO disease -> phenotype associations
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+UNVERSIONED = "unversioned"
+
+
+def resolve_mondo_version(mondo_version: Optional[str] = None) -> str:
+    """ Work out which MONDO release cached associations belong to
+
+    An explicit version, otherwise the timestamp of PhEval's MONDO mapping table. That is the
+    mondo_download_date PhEval records in results.yml, which it only writes once the run has finished.
+    """
+    if mondo_version:
+        return mondo_version
+    try:
+        from pheval.utils.utils import get_resource_timestamp
+
+        return get_resource_timestamp("mondo.sssom.tsv") or UNVERSIONED
+    except ImportError:
+        return UNVERSIONED
+
+
+class DiseaseKnowledgeCache:
+    """ SQLite-backed cache of disease -> phenotype associations keyed by MONDO ID, with an in-memory LRU front
+
+    Entries are only valid for the MONDO version they were fetched under, and optionally for `ttl_seconds`.
+    """
+
+    def __init__(self, path: Path, version: str = UNVERSIONED, ttl_seconds: Optional[float] = None,
+                 memory_size: int = 4096):
+        self.path = Path(path)
+        self.version = version
+        self.ttl_seconds = ttl_seconds
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[str, Tuple[float, int, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS disease_knowledge (
+                mondo_id TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                fetch_limit INTEGER NOT NULL,
+                phenotypes TEXT NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def _is_valid(self, fetched_at: float, fetch_limit: int, phenotypes: List[str], limit: int) -> bool:
+        if self.ttl_seconds is not None and time.time() - fetched_at > self.ttl_seconds:
+            return False
+        # a shorter fetch is only reusable if it was not truncated
+        return fetch_limit >= limit or len(phenotypes) < fetch_limit
+
+    def _remember(self, mondo_id: str, entry: Tuple[float, int, List[str]]) -> None:
+        self._memory[mondo_id] = entry
+        self._memory.move_to_end(mondo_id)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, mondo_id: str, limit: int) -> Optional[List[str]]:
+        """ Cached associations for a MONDO ID, or None on a miss
+
+        Args:
+            mondo_id (str): MONDO ID
+            limit (int): Maximum number of associations the caller wants
+
+        Returns:
+            Up to `limit` cached associations, or None if there is no valid entry
+        """
+        with self._lock:
+            entry = self._memory.get(mondo_id)
+            if entry is None:
+                row = self._connection.execute(
+                    "SELECT fetched_at, fetch_limit, phenotypes FROM disease_knowledge "
+                    "WHERE mondo_id = ? AND version = ?",
+                    (mondo_id, self.version),
+                ).fetchone()
+                if row is None:
+                    return None
+                entry = (row[0], row[1], json.loads(row[2]))
+
+            if not self._is_valid(*entry, limit):
+                self._memory.pop(mondo_id, None)
+                return None
+
+            self._remember(mondo_id, entry)
+            return list(entry[2][:limit])
+
+    def put(self, mondo_id: str, phenotypes: List[str], limit: int) -> None:
+        """ Store the associations fetched for a MONDO ID
+
+        Args:
+            mondo_id (str): MONDO ID
+            phenotypes (List[str]): Associations that were fetched
+            limit (int): The limit they were fetched with
+        """
+        entry = (time.time(), limit, list(phenotypes))
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO disease_knowledge (mondo_id, version, fetched_at, fetch_limit, phenotypes) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (mondo_id, self.version, entry[0], limit, json.dumps(entry[2])),
+            )
+            self._connection.commit()
+            self._remember(mondo_id, entry)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,183 @@
+# Shared request / token budget in front of the LLM agents, with 429-aware backoff
+import asyncio
+import email.utils
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from multi_agent_system.utils.batching_utils import count_tokens, serialize_item
+
+RATE_LIMIT_STATUS = 429
+
+
+class TokenBucket:
+    """ Budget that refills continuously at `per_minute / 60` units per second, up to `per_minute` """
+
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """ Seconds until `amount` can be taken (amounts above capacity wait for a full bucket) """
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        # may go negative when a call turns out to cost more than estimated; later callers wait for it
+        self.level -= amount
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """ Server retry hint of a rate-limit error, from retry-after-ms / retry-after response headers
+
+    pydantic_ai raises ModelHTTPError from the provider error, which carries the HTTP response.
+    """
+    for candidate in (error, error.__cause__):
+        response = getattr(candidate, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            continue
+        if headers.get("retry-after-ms"):
+            try:
+                return float(headers["retry-after-ms"]) / 1000.0
+            except ValueError:
+                pass
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                retry_at = email.utils.parsedate_to_datetime(retry_after)
+                return max(0.0, retry_at.timestamp() - time.time())
+    return None
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """ True for HTTP 429 responses (pydantic_ai ModelHTTPError or the provider's own error) """
+    return any(getattr(candidate, "status_code", None) == RATE_LIMIT_STATUS
+               for candidate in (error, error.__cause__))
+
+
+class RateLimiter:
+    """ Scheduler shared by every agent call of a run
+
+    Calls wait (first come, first served) until both the requests-per-minute and tokens-per-minute
+    budgets allow them, and the actual usage of each run is charged afterwards. A 429 response pauses
+    every caller for the server's retry hint (or an exponential backoff) before the call is retried.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        now = clock()
+        self.requests = TokenBucket(requests_per_minute, now) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, now) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self._waiting = 0
+        self.rate_limited = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """ Number of calls waiting for budget """
+        return self._waiting
+
+    def _buckets(self):
+        return [bucket for bucket in (self.requests, self.tokens) if bucket is not None]
+
+    async def acquire(self, estimated_tokens: int = 0) -> None:
+        """ Wait until one request of `estimated_tokens` fits in the budget, then take it """
+        self._waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = self._clock()
+                    for bucket in self._buckets():
+                        bucket.refill(now)
+                    wait = max(self._paused_until - now,
+                               self.requests.wait_time(1) if self.requests else 0.0,
+                               self.tokens.wait_time(estimated_tokens) if self.tokens else 0.0)
+                    if wait <= 0:
+                        break
+                    print(f"[Rate Limiter] Waiting {wait:.1f}s (queue depth {self._waiting})")
+                    await self._sleep(wait)
+                if self.requests:
+                    self.requests.take(1)
+                if self.tokens:
+                    self.tokens.take(estimated_tokens)
+        finally:
+            self._waiting -= 1
+
+    def record(self, estimated_tokens: int, total_tokens: int, requests: int = 1) -> None:
+        """ Charge the difference between a call's estimate and its reported usage """
+        now = self._clock()
+        if self.requests and requests > 1:
+            self.requests.refill(now)
+            self.requests.take(requests - 1)
+        if self.tokens:
+            self.tokens.refill(now)
+            self.tokens.take(total_tokens - estimated_tokens)
+
+    def _backoff(self, error: BaseException, attempt: int) -> float:
+        hint = retry_after_seconds(error)
+        if hint is not None:
+            return min(hint, self.max_delay)
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def run(self, call: Callable[[], Awaitable[Any]], estimated_tokens: int = 0) -> Any:
+        """ Run `call` within the budget, retrying it after rate-limit responses
+
+        Args:
+            call: Starts one agent run
+            estimated_tokens: Expected token cost, charged up front
+
+        Returns:
+            The result of `call`
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(estimated_tokens)
+            try:
+                return await call()
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == self.max_retries:
+                    raise
+                self.rate_limited += 1
+                delay = self._backoff(e, attempt)
+                # every caller pauses, not just this one: the provider is over its limit for all of them
+                self._paused_until = max(self._paused_until, self._clock() + delay)
+                print(f"[Rate Limiter] Rate limited (attempt {attempt + 1}), retrying in {delay:.1f}s "
+                      f"(queue depth {self._waiting})")
+
+
+class RateLimitedAgent:
+    """ Sends an agent's runs through a shared RateLimiter; other attributes are the agent's own """
+
+    def __init__(self, agent: Any, limiter: RateLimiter, system_prompt: str = ""):
+        self.agent = agent
+        self.limiter = limiter
+        self._system_prompt_tokens = count_tokens(system_prompt)
+
+    def __getattr__(self, name: str) -> Any:
+        # output_type, model, model_settings... (only called for attributes not set in __init__)
+        if name == "agent":
+            raise AttributeError(name)
+        return getattr(self.agent, name)
+
+    async def run(self, user_input: Any, **kwargs: Any) -> Any:
+        estimated_tokens = self._system_prompt_tokens + count_tokens(serialize_item(user_input))
+        result = await self.limiter.run(lambda: self.agent.run(user_input, **kwargs), estimated_tokens)
+        usage = result.usage()
+        self.limiter.record(estimated_tokens, usage.total_tokens or estimated_tokens, usage.requests or 1)
+        return result
@@ -0,0 +1,129 @@
+# Ranked agent results as Parquet tables in the PhEval disease-result schema
+#
+# <raw_results>/
+#   <phenopacket>-agents.parquet   rank, score, disease_name, disease_identifier (one file per case)
+#   cohort_results.parquet         optional: every case, plus a phenopacket_id column
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, List, Mapping
+
+import polars as pl
+
+AGENT_RESULT_SUFFIX = "-agents.parquet"
+LEGACY_AGENT_RESULT_SUFFIX = "-agents.tsv"
+COHORT_RESULT_NAME = "cohort_results.parquet"
+
+# PhEval reads score (Float64) and disease_identifier (String); rank and the agent's disease name are kept alongside
+AGENT_RESULT_SCHEMA = pl.Schema({
+    "rank": pl.Int64,
+    "score": pl.Float64,
+    "disease_name": pl.Utf8,
+    "disease_identifier": pl.Utf8,
+})
+
+
+def agent_result_path(output_dir: Path, phenopacket_id: str) -> Path:
+    """ Path of a case's ranked result in the raw results directory """
+    return Path(output_dir) / f"{phenopacket_id}{AGENT_RESULT_SUFFIX}"
+
+
+def is_agent_result(path: Path) -> bool:
+    """ True for finished per-case results (Parquet, or TSV written by earlier versions) """
+    return path.name.endswith(AGENT_RESULT_SUFFIX) or path.name.endswith(LEGACY_AGENT_RESULT_SUFFIX)
+
+
+def agent_result_frame(results: Iterable[Mapping]) -> pl.DataFrame:
+    """ Ranked results as a table; the score is 1 / rank, so PhEval keeps the agents' order
+
+    Args:
+        results (Iterable[Mapping]): ranked diseases, best first, with disease_name and mondo_id
+
+    Returns:
+        DataFrame in AGENT_RESULT_SCHEMA
+    """
+    rows = list(results)
+    ranks = list(range(1, len(rows) + 1))
+    return pl.DataFrame(
+        {
+            "rank": ranks,
+            "score": [round(1 / rank, 4) for rank in ranks],
+            "disease_name": [row["disease_name"] for row in rows],
+            "disease_identifier": [row.get("mondo_id") for row in rows],
+        },
+        schema=AGENT_RESULT_SCHEMA,
+    )
+
+
+def write_parquet(frame: pl.DataFrame | pl.LazyFrame, path: Path) -> None:
+    """ Write a zstd-compressed Parquet file via a temporary file and rename, so readers never see a partial file """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        if isinstance(frame, pl.LazyFrame):
+            frame.sink_parquet(tmp_path, compression="zstd")
+        else:
+            frame.write_parquet(tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def write_agent_result(results: Iterable[Mapping], path: Path) -> None:
+    """ Write a case's ranked diseases to `path` (see agent_result_frame) """
+    write_parquet(agent_result_frame(results), path)
+
+
+def scan_agent_result(path: Path) -> pl.LazyFrame:
+    """ Lazily read the columns PhEval needs from a per-case result
+
+    Diseases without a MONDO ID cannot be matched to the truth set, so they are left out.
+
+    Args:
+        path (Path): a -agents.parquet result, or a -agents.tsv from earlier versions
+
+    Returns:
+        LazyFrame with score (Float64) and disease_identifier (String)
+    """
+    if path.name.endswith(LEGACY_AGENT_RESULT_SUFFIX):
+        frame = pl.scan_csv(path, separator="\t", schema_overrides={"disease_identifier": pl.Utf8})
+    else:
+        frame = pl.scan_parquet(path)
+    return (
+        frame.select(
+            pl.col("score").cast(pl.Float64),
+            pl.col("disease_identifier").cast(pl.Utf8),
+        )
+        .filter(pl.col("disease_identifier").is_not_null())
+    )
+
+
+def write_cohort_table(result_paths: List[Path], path: Path) -> int:
+    """ Combine per-case results into one table with a phenopacket_id column
+
+    Args:
+        result_paths (List[Path]): -agents.parquet results
+        path (Path): cohort table to write
+
+    Returns:
+        Number of cases in the table
+    """
+    result_paths = sorted(result_paths)
+    if not result_paths:
+        write_parquet(pl.DataFrame(schema={"phenopacket_id": pl.Utf8, **AGENT_RESULT_SCHEMA}), path)
+        return 0
+    cohort = pl.concat(
+        [
+            pl.scan_parquet(result).select(
+                pl.lit(result.name[:-len(AGENT_RESULT_SUFFIX)]).alias("phenopacket_id"),
+                pl.all(),
+            )
+            for result in result_paths
+        ],
+        how="vertical",
+    )
+    write_parquet(cohort, path)
+    return len(result_paths)
@@ -0,0 +1,83 @@
+# Per-case journal so an interrupted corpus run can be resumed
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from multi_agent_system.utils.file_utils import file_checksum
+
+STARTED = "started"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class RunJournal:
+    """ Append-only JSON-lines journal of each phenopacket's state in a corpus run
+
+    Every state change is one line ({"case", "status", "output", "checksum", "time"}), so a crash
+    can at worst lose the last, partially written line. The latest line per case wins.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = self._read()
+
+    def _read(self) -> Dict[str, dict]:
+        entries: Dict[str, dict] = {}
+        if not self.path.exists():
+            return entries
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a line cut short by a crash
+                    continue
+                entries[entry["case"]] = entry
+        return entries
+
+    def _append(self, entry: dict) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries[entry["case"]] = entry
+
+    def mark_started(self, case_id: str) -> None:
+        self._append({"case": case_id, "status": STARTED, "time": time.time()})
+
+    def mark_completed(self, case_id: str, output_path: Path) -> None:
+        self._append({
+            "case": case_id,
+            "status": COMPLETED,
+            "output": str(output_path),
+            "checksum": file_checksum(output_path),
+            "time": time.time(),
+        })
+
+    def mark_failed(self, case_id: str, error: Exception) -> None:
+        self._append({"case": case_id, "status": FAILED, "error": str(error), "time": time.time()})
+
+    def status(self, case_id: str) -> Optional[str]:
+        entry = self._entries.get(case_id)
+        return entry["status"] if entry else None
+
+    def is_completed(self, case_id: str) -> bool:
+        """ True if the case completed and its output is still on disk, unchanged
+
+        Args:
+            case_id (str): Phenopacket ID
+
+        Returns:
+            Whether the case can be skipped on resume
+        """
+        entry = self._entries.get(case_id)
+        if not entry or entry["status"] != COMPLETED:
+            return False
+        output_path = Path(entry["output"])
+        return output_path.exists() and file_checksum(output_path) == entry["checksum"]
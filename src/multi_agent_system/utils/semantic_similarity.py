@@ -0,0 +1,175 @@
+# Ontology-aware phenotype similarity (Resnik / Lin, best-match average) over precomputed HPO closures
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+MEASURES = ("resnik", "lin")
+
+# disease terms scored per block, bounding the (patient terms x disease terms x ancestors) intermediate
+_BLOCK_SIZE = 512
+
+
+def build_ancestor_closure(parents: Dict[str, Iterable[str]]) -> Dict[str, set]:
+    """ Reflexive is_a ancestor closure of every term
+
+    Args:
+        parents (dict): term -> direct is_a parents
+
+    Returns:
+        Dictionary of term to the set of the term and all its ancestors
+    """
+    closure: Dict[str, set] = {}
+    terms = set(parents) | {parent for ps in parents.values() for parent in ps}
+    for term in terms:
+        if term in closure:
+            continue
+        # iterative post-order walk, HPO is too deep for comfortable recursion
+        stack = [(term, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in closure:
+                continue
+            node_parents = parents.get(node, ())
+            if expanded:
+                ancestors = {node}
+                for parent in node_parents:
+                    ancestors |= closure[parent]
+                closure[node] = ancestors
+            else:
+                stack.append((node, True))
+                stack.extend((parent, False) for parent in node_parents if parent not in closure)
+    return closure
+
+
+class HpoSemanticSimilarity:
+    """ HPO ancestor closures as packed bitsets plus annotation-based information content
+
+    Row i of `ancestors` is a bitset over `terms` marking term i and all of its ancestors, so the
+    common ancestors of two terms are one bitwise AND. `information_content[i]` is -log of the
+    fraction of annotated diseases carrying term i or one of its descendants.
+    """
+
+    def __init__(self, terms: Sequence[str], ancestors: np.ndarray, information_content: np.ndarray):
+        self.terms = list(terms)
+        self.ancestors = ancestors
+        self.information_content = information_content
+        self._rows = {term: row for row, term in enumerate(self.terms)}
+
+    @classmethod
+    def build(cls, parents: Dict[str, Iterable[str]], annotations: Iterable[Iterable[str]]) -> "HpoSemanticSimilarity":
+        """ Precompute the closures and information content
+
+        Args:
+            parents (dict): HPO term -> direct is_a parents
+            annotations (Iterable[Iterable[str]]): HPO terms of each annotated disease
+
+        Returns:
+            HpoSemanticSimilarity
+        """
+        closure = build_ancestor_closure(parents)
+        terms = sorted(closure)
+        rows = {term: row for row, term in enumerate(terms)}
+        # packed row by row: the unpacked terms x terms matrix would not fit in memory for HPO
+        packed = np.zeros((len(terms), (len(terms) + 7) // 8), dtype=np.uint8)
+        row_bits = np.zeros(len(terms), dtype=bool)
+        for term, term_ancestors in closure.items():
+            row_bits[:] = False
+            row_bits[[rows[ancestor] for ancestor in term_ancestors]] = True
+            packed[rows[term]] = np.packbits(row_bits)
+
+        # a disease counts once for every term it is annotated with, directly or through a descendant
+        counts = np.zeros(len(terms), dtype=np.int64)
+        diseases = 0
+        for disease_terms in annotations:
+            disease_rows = [rows[term] for term in set(disease_terms) if term in rows]
+            diseases += 1
+            if disease_rows:
+                counts += np.unpackbits(np.bitwise_or.reduce(packed[disease_rows], axis=0), count=len(terms))
+
+        # terms no disease is annotated with get the IC of a single annotation
+        frequency = np.maximum(counts, 1) / max(diseases, 1)
+        information_content = -np.log(frequency)
+        return cls(terms, packed, information_content)
+
+    @classmethod
+    def load(cls, path: Path) -> "HpoSemanticSimilarity":
+        with np.load(path) as data:
+            return cls(data["terms"].tolist(), data["ancestors"], data["information_content"])
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, terms=np.array(self.terms), ancestors=self.ancestors,
+                                information_content=self.information_content)
+        tmp_path.replace(path)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _term_rows(self, terms: Iterable[str]) -> np.ndarray:
+        """ Rows of the known terms, deduplicated; terms missing from the ontology (e.g. obsolete) are skipped """
+        return np.array(sorted({self._rows[term] for term in terms if term in self._rows}), dtype=np.int64)
+
+    def _ancestor_bits(self, rows: np.ndarray) -> np.ndarray:
+        return np.unpackbits(self.ancestors[rows], axis=1, count=len(self.terms)).astype(bool)
+
+    def best_match_average(self, patient_terms: Iterable[str], disease_sets: Sequence[Iterable[str]],
+                           measure: str = "resnik") -> List[float]:
+        """ Symmetric best-match-average similarity of a patient against each candidate disease
+
+        Term similarity is the IC of the most informative common ancestor (Resnik), or that IC
+        divided by the mean IC of the two terms (Lin). Each side's terms are matched to their best
+        counterpart, and the two averages are averaged.
+
+        Args:
+            patient_terms (Iterable[str]): patient HPO IDs
+            disease_sets (Sequence[Iterable[str]]): HPO IDs of each candidate disease
+            measure (str): resnik or lin
+
+        Returns:
+            One score per disease, in input order; 0.0 when either side has no known terms
+        """
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown similarity measure '{measure}', expected one of {MEASURES}")
+        scores = [0.0] * len(disease_sets)
+        patient_rows = self._term_rows(patient_terms)
+        if not len(patient_rows) or not disease_sets:
+            return scores
+
+        disease_rows = [self._term_rows(terms) for terms in disease_sets]
+        lengths = np.array([len(rows) for rows in disease_rows])
+        if not lengths.any():
+            return scores
+        flat_rows = np.concatenate([rows for rows in disease_rows if len(rows)])
+
+        # only ancestors of patient terms can be common ancestors
+        patient_bits = self._ancestor_bits(patient_rows)
+        columns = patient_bits.any(axis=0)
+        patient_bits = patient_bits[:, columns]
+        ic = self.information_content[columns]
+
+        # MICA information content of every (patient term, disease term) pair
+        mica = np.empty((len(patient_rows), len(flat_rows)), dtype=np.float64)
+        for start in range(0, len(flat_rows), _BLOCK_SIZE):
+            block = self._ancestor_bits(flat_rows[start:start + _BLOCK_SIZE])[:, columns]
+            common = patient_bits[:, None, :] & block[None, :, :]
+            mica[:, start:start + len(block)] = np.where(common, ic, 0.0).max(axis=2, initial=0.0)
+
+        if measure == "lin":
+            pair_ic = self.information_content[patient_rows][:, None] + self.information_content[flat_rows][None, :]
+            similarity = np.zeros_like(mica)
+            np.divide(2 * mica, pair_ic, out=similarity, where=pair_ic > 0)
+        else:
+            similarity = mica
+
+        # per-disease segments of the flattened disease terms
+        nonempty = np.flatnonzero(lengths)
+        starts = np.concatenate(([0], np.cumsum(lengths[nonempty])[:-1]))
+        patient_best = np.maximum.reduceat(similarity, starts, axis=1).mean(axis=0)
+        disease_best = np.add.reduceat(similarity.max(axis=0), starts) / lengths[nonempty]
+        for disease, score in zip(nonempty, (patient_best + disease_best) / 2):
+            scores[disease] = float(score)
+        return scores
+
@@ -0,0 +1,111 @@
+# Vectorised phenotype set similarity over sparse patient x disease matrices
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+from scipy import sparse
+
+
+class PhenotypeVocabulary:
+    """ Interns HPO IDs to integer codes, so phenotype sets become rows of a sparse matrix """
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def intern(self, term: str) -> int:
+        code = self.codes.get(term)
+        if code is None:
+            code = self.codes[term] = len(self.codes)
+        return code
+
+    def matrix(self, phenotype_sets: Sequence[Iterable[str]]) -> sparse.csr_matrix:
+        """ Binary CSR matrix with one row per phenotype set and one column per interned HPO ID
+
+        Duplicate terms within a set count once, as they would in a Python set.
+        Must be called for every side before the columns are used, so all matrices share the vocabulary.
+        """
+        indptr = [0]
+        indices: List[int] = []
+        for terms in phenotype_sets:
+            row = sorted({self.intern(term) for term in terms})
+            indices.extend(row)
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.int32)
+        return sparse.csr_matrix((data, np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+                                 shape=(len(phenotype_sets), len(self)))
+
+
+def jaccard_matrix(patient_sets: Sequence[Iterable[str]], disease_sets: Sequence[Iterable[str]]) -> np.ndarray:
+    """ Jaccard index of every patient against every disease
+
+    intersection = P @ D.T, union = |p| + |d| - intersection; 0.0 when either set is empty,
+    matching calculate_jaccard_index.
+
+    Args:
+        patient_sets (Sequence[Iterable[str]]): HPO IDs per patient
+        disease_sets (Sequence[Iterable[str]]): HPO IDs per candidate disease
+
+    Returns:
+        A float64 array of shape (patients, diseases)
+    """
+    vocabulary = PhenotypeVocabulary()
+    patients = vocabulary.matrix(patient_sets)
+    diseases = vocabulary.matrix(disease_sets)
+    # both matrices must span the full vocabulary
+    patients.resize((patients.shape[0], len(vocabulary)))
+    diseases.resize((diseases.shape[0], len(vocabulary)))
+
+    intersection = (patients @ diseases.T).toarray().astype(np.float64)
+    patient_sizes = np.diff(patients.indptr)[:, None]
+    disease_sizes = np.diff(diseases.indptr)[None, :]
+    union = patient_sizes + disease_sizes - intersection
+
+    scores = np.zeros_like(intersection)
+    np.divide(intersection, union, out=scores, where=(patient_sizes > 0) & (disease_sizes > 0) & (union > 0))
+    return scores
+
+
+def jaccard_scores(patient_hpo_ids: Iterable[str], disease_sets: Sequence[Iterable[str]]) -> List[float]:
+    """ Jaccard index of one patient against each candidate disease, in candidate order """
+    if not disease_sets:
+        return []
+    return jaccard_matrix([patient_hpo_ids], disease_sets)[0].tolist()
+
+
+def jaccard_against_matrix(patient_columns: Iterable[int], patient_size: int,
+                           matrix: sparse.csr_matrix) -> np.ndarray:
+    """ Jaccard index of one patient against every row of a binary disease x term matrix
+
+    Args:
+        patient_columns (Iterable[int]): columns of the patient's terms that occur in the matrix vocabulary
+        patient_size (int): number of distinct patient terms, including those the matrix has never seen
+        matrix (sparse.csr_matrix): binary disease x term matrix
+
+    Returns:
+        A float64 array with one score per matrix row
+    """
+    patient = np.zeros(matrix.shape[1], dtype=np.float64)
+    patient[list(patient_columns)] = 1.0
+    intersection = matrix @ patient
+    row_sizes = np.diff(matrix.indptr).astype(np.float64)
+    union = patient_size + row_sizes - intersection
+
+    scores = np.zeros(matrix.shape[0], dtype=np.float64)
+    if patient_size:
+        np.divide(intersection, union, out=scores, where=(row_sizes > 0) & (union > 0))
+    return scores
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """ Indices of the k highest non-zero scores, best first; ties keep index order """
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        # the k-th best score, then everything at least as good, so ties at the cut-off are ordered by index
+        threshold = np.partition(scores[candidates], -k)[-k]
+        candidates = candidates[scores[candidates] >= threshold]
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]